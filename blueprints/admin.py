@@ -3,7 +3,7 @@ from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, make_response, current_app, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from models import User, Household, Resident, TemporaryResidence, Feedback, Announcement, BenefitCategory, Beneficiary, BenefitPayment, DocumentType, DocumentRequest
+from models import User, Household, Resident, TemporaryResidence, Feedback, Announcement, BenefitCategory, Beneficiary, BenefitPayment, DocumentType, DocumentRequest, SeverityJob
 from forms import HouseholdForm, ResidentForm, TemporaryResidenceForm, AnnouncementForm, BenefitCategoryForm, BeneficiaryForm, DocumentTypeForm, AdminUserForm
 from utils import save_uploaded_file, export_residents_to_csv, export_residents_to_xml, get_age_from_birth_date, send_email
 from utils import chatbot_answer, admin_required, viewer_allowed, admin_or_self
@@ -15,9 +15,12 @@ admin_bp = Blueprint('admin', __name__)
 @login_required
 @viewer_allowed
 def dashboard():
-    # Statistics
-    total_households = Household.query.count()
-    total_residents = Resident.query.count()
+    # Statistics - đọc từ bảng tổng hợp hamlet_stats (services.hamlet_stats)
+    from services.hamlet_stats import get_stats, totals
+    stats_rows = get_stats()
+    stats_totals = totals(stats_rows)
+    total_households = stats_totals['households']
+    total_residents = stats_totals['residents']
     pending_feedbacks = Feedback.query.filter_by(status='pending').count()
     published_announcements = Announcement.query.filter_by(is_published=True).count()
     
@@ -25,38 +28,13 @@ def dashboard():
     recent_feedbacks = Feedback.query.order_by(Feedback.created_at.desc()).limit(5).all()
     
     # Demographics by hamlet (count residents including head of household)
-    households = Household.query.all()
-    residents = Resident.query.all()
-    # Build map household_id -> {count, has_head}
-    hh_residents_count = {}
-    hh_has_head = {}
-    for r in residents:
-        hh_residents_count[r.household_id] = hh_residents_count.get(r.household_id, 0) + 1
-        if r.relationship == 'Chủ hộ':
-            hh_has_head[r.household_id] = True
-    # Aggregate per hamlet
-    stats_map = {}
-    for h in households:
-        if h.hamlet not in stats_map:
-            stats_map[h.hamlet] = { 'hamlet': h.hamlet, 'households': 0, 'residents': 0 }
-        s = stats_map[h.hamlet]
-        s['households'] += 1
-        count = hh_residents_count.get(h.id, 0)
-        # If no resident marked as head, add the head_of_household as a person
-        if not hh_has_head.get(h.id, False):
-            count += 1
-        s['residents'] += count
-    hamlets_stats = list(stats_map.values())
-    
+    hamlets_stats = [{'hamlet': row.hamlet, 'households': row.households, 'residents': row.people}
+                     for row in stats_rows]
     # Total people = residents + households that do not have a resident flagged as 'Chủ hộ'
-    households_without_head = 0
-    for h in households:
-        if not hh_has_head.get(h.id, False):
-            households_without_head += 1
-    total_people = len(residents) + households_without_head
+    total_people = stats_totals['people']
     
-    # Temporary residence counts (active in-date)
-    active_temp_residents = TemporaryResidence.query.filter(TemporaryResidence.is_active.is_(True)).count()
+    # Temporary residence counts (active)
+    active_temp_residents = stats_totals['temp_residents'] + stats_totals['temp_absent']
 
     return render_template('admin/dashboard.html',
                          total_households=total_households,
@@ -77,8 +55,12 @@ def population():
     hamlet = request.args.get('hamlet', '')
     age_group = request.args.get('age_group', '')
     
-    # Base query
-    households_query = Household.query
+    # Base query - số nhân khẩu mỗi hộ lấy bằng một subquery GROUP BY (không nạp household.residents từng dòng)
+    from services.population_stats import household_residents
+    per_household = household_residents()
+    households_query = (db.session.query(Household, db.func.coalesce(per_household.c.n, 0))
+                        .outerjoin(per_household, per_household.c.household_id == Household.id)
+                        .order_by(Household.id))
     
     # Apply filters
     if search:
@@ -103,15 +85,9 @@ def population():
     hamlets = [h[0] for h in hamlets]
     # Active temporary residence count (for quick stats on population page)
     temporary_residents = TemporaryResidence.query.filter(TemporaryResidence.is_active.is_(True)).count()
-    # Children under 18 (based on birth_date)
+    # Children under 18 (tuổi = năm hiện tại - năm sinh) - đếm theo khoảng birth_date
     from datetime import date
-    current_year = date.today().year
-    children_count = 0
-    for r in Resident.query.all():
-        if getattr(r, 'birth_date', None):
-            age = current_year - r.birth_date.year
-            if age < 18:
-                children_count += 1
+    children_count = Resident.query.filter(Resident.birth_date >= date(date.today().year - 17, 1, 1)).count()
 
     return render_template('admin/population.html',
                          households=households,
@@ -198,10 +174,16 @@ def edit_household(id):
 def delete_household(id):
     household = Household.query.get_or_404(id)
     
-    # Delete all residents in the household
-    Resident.query.filter_by(household_id=id).delete()
-    
-    # Delete household
+    # Xóa tạm trú/tạm vắng, trợ cấp của hộ và nhân khẩu trước; nhân khẩu bị xóa theo cascade
+    # (xóa từng dòng qua ORM để bảng hamlet_stats được cập nhật)
+    resident_ids = [r.id for r in household.residents]
+    for record in TemporaryResidence.query.filter(db.or_(TemporaryResidence.resident_id.in_(resident_ids),
+                                                         TemporaryResidence.head_household_id == id)).all():
+        db.session.delete(record)
+    for record in Beneficiary.query.filter(db.or_(Beneficiary.resident_id.in_(resident_ids),
+                                                  Beneficiary.household_id == id)).all():
+        BenefitPayment.query.filter_by(beneficiary_id=record.id).delete(synchronize_session=False)
+        db.session.delete(record)
     db.session.delete(household)
     
     try:
@@ -308,14 +290,12 @@ def delete_resident(id):
     resident = Resident.query.get_or_404(id)
     household_id = resident.household_id
     # Xóa các bản ghi liên quan để tránh lỗi khóa ngoại
-    try:
-        TemporaryResidence.query.filter_by(resident_id=id).delete(synchronize_session=False)
-    except Exception:
-        pass
-    try:
-        Beneficiary.query.filter_by(resident_id=id).delete(synchronize_session=False)
-    except Exception:
-        pass
+    # (xóa từng dòng qua ORM để bảng hamlet_stats được cập nhật)
+    for record in TemporaryResidence.query.filter_by(resident_id=id).all():
+        db.session.delete(record)
+    for record in Beneficiary.query.filter_by(resident_id=id).all():
+        BenefitPayment.query.filter_by(beneficiary_id=record.id).delete(synchronize_session=False)
+        db.session.delete(record)
     db.session.delete(resident)
     db.session.commit()
     flash('Đã xóa nhân khẩu.', 'success')
@@ -897,18 +877,20 @@ def feedback_management():
         except Exception:
             attachments_map[f.id] = []
 
-    # AI classify info (for display: confidence + reasons)
+    # AI classify info (for display: confidence + reasons) - đọc từ kết quả đã lưu
+    from services.classifier_registry import get_classifier
+    from services.classify_jobs import active_job
+    current_version = get_classifier().model_version
     classify_info_map = {}
     for f in feedbacks.items:
-        try:
-            label, conf, reasons = _classify_feedback_text(f.title or '', f.description or '')
+        if f.classify_label:
             classify_info_map[f.id] = {
-                'label': label,
-                'confidence': conf,
-                'reasons': reasons,
+                'label': f.classify_label,
+                'confidence': f.classify_confidence or 0.0,
+                'method': f.classify_method,
+                'reasons': f.classify_terms_list,
+                'stale': f.model_version != current_version,
             }
-        except Exception:
-            classify_info_map[f.id] = {'label': f.kind or 'phan_anh', 'confidence': 0.6, 'reasons': []}
 
     return render_template('admin/feedback_management.html',
                          feedbacks=feedbacks,
@@ -916,7 +898,21 @@ def feedback_management():
                          category=category,
                          kind=kind,
                          attachments_map=attachments_map,
-                         classify_info_map=classify_info_map)
+                         classify_info_map=classify_info_map,
+                         classify_job=active_job())
+
+@admin_bp.route('/feedback/<int:id>/explain', methods=['POST'])
+@login_required
+@admin_required
+def explain_feedback(id):
+    """Tính lại phần giải thích AI (độ tin cậy, từ khóa) cho một phản ánh."""
+    fb = Feedback.query.get_or_404(id)
+    from services.classifier_registry import get_classifier
+    # Chỉ làm mới giải thích (loại/mức độ không đổi) nên không đánh dấu dòng là đã phân loại lại
+    fb.store_classification(get_classifier().explain(fb.title or '', fb.description or ''), explanation_only=True)
+    db.session.commit()
+    flash('Đã cập nhật giải thích phân loại AI.', 'success')
+    return redirect(request.referrer or url_for('admin.feedback_management'))
 
 @admin_bp.route('/feedback/<int:id>/classify', methods=['POST'])
 @login_required
@@ -924,13 +920,18 @@ def feedback_management():
 def classify_feedback(id):
     """Phân loại phản ánh sử dụng AI."""
     fb = Feedback.query.get_or_404(id)
-    from services.feedback_classifier import FeedbackClassifier
-    classifier = FeedbackClassifier()
-    result = classifier.classify(fb.title or '', fb.description or '')
+    from services.classifier_registry import get_classifier
+    from services.severity_queue import enqueue_refinement
+    result = get_classifier().classify(fb.title or '', fb.description or '', use_llm=False)
     
     fb.kind = result['label']
+    fb.kind_source = None
     fb.severity = result['severity']
     fb.severity_confidence = result['severity_confidence']
+    fb.severity_source = result['severity_tier']
+    fb.store_classification(result)
+    if result['severity_ambiguous']:
+        enqueue_refinement(fb.id)
     
     db.session.commit()
     severity_confidence = int(result["severity_confidence"]*100)
@@ -952,108 +953,37 @@ def classify_feedback(id):
     )
     return redirect(url_for('admin.feedback_management'))
 
-@admin_bp.route('/feedback/classify-all')
+@admin_bp.route('/feedback/classify-all', methods=['POST'])
 @login_required
 @admin_required
 def classify_all_feedbacks():
-    import logging
-    from services.feedback_classifier import FeedbackClassifier
-    classifier = FeedbackClassifier()
-    
-    count = 0
-    updated_kind = 0
-    updated_severity = 0
-    
-    for fb in Feedback.query.all():
-        result = classifier.classify(fb.title or '', fb.description or '')
-        
-        # Cập nhật phân loại phản ánh/khiếu nại
-        if result['confidence'] >= 0.7 and (fb.kind != result['label']):
-            old_kind = fb.kind
-            fb.kind = result['label']
-            updated_kind += 1
-            logging.info(f"Cập nhật phân loại ID {fb.id}: {old_kind} -> {result['label']} (tin cậy: {result['confidence']:.0%})")
-        
-        # Cập nhật mức độ nghiêm trọng (không hạ bậc)
-        severity_confidence = result['severity_confidence']
-        actual_severity = result['severity']
-        
-        if fb.severity != actual_severity or (fb.severity_confidence != severity_confidence):
-            old_severity = fb.severity
-            fb.severity = actual_severity
-            fb.severity_confidence = severity_confidence
-            updated_severity += 1
-            logging.info(f"Cập nhật mức độ ID {fb.id}: {old_severity} -> {actual_severity} (tin cậy: {severity_confidence:.0%})")
-        
-        count += 1
-    
-    db.session.commit()
-    
-    if updated_kind > 0 or updated_severity > 0:
-        flash(f'AI đã kiểm tra {count} mục: cập nhật {updated_kind} phân loại và {updated_severity} mức độ nghiêm trọng.', 'success')
-    else:
-        flash(f'AI đã kiểm tra {count} mục. Các phân loại hiện tại đều đã chính xác.', 'info')
-    
+    """Bắt đầu job phân loại lại ở nền; trang quản trị theo dõi qua classify_job_status"""
+    from services.classify_jobs import start_job
+
+    # Mặc định chỉ xử lý các phản ánh mới/đã sửa hoặc được phân loại bởi phiên bản mô hình cũ
+    full = request.form.get('full') == '1' or bool((request.get_json(silent=True) or {}).get('full'))
+    job = start_job(current_app._get_current_object(), current_user.id, full=full)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict()), 202
+    flash(f'Đã bắt đầu phân loại lại {job.total} phản ánh ở nền.', 'info')
     return redirect(url_for('admin.feedback_management'))
 
-def _classify_feedback_text(title: str, description: str):
-    """Phân loại phản ánh/khiếu nại sử dụng FeedbackClassifier."""
-    from services.feedback_classifier import FeedbackClassifier
-    
-    try:
-        classifier = FeedbackClassifier()
-        result = classifier.classify(title, description)
-        
-        return (
-            result['label'],
-            result['confidence'],
-            result['important_terms']
-        )
-    except Exception as e:
-        # Log error
-        import logging
-        logging.error(f"Classification error: {str(e)}")
-        
-        # Return safe default
-        return 'phan_anh', 0.6, []
-
-    # Weighted heuristic: title keywords x2, description x1; more coverage -> higher confidence
-    complaint_keywords = [
-        'khiếu nại','khieu nai','tố cáo','to cao','không đồng ý','khong dong y',
-        'đề nghị giải quyết','de nghi giai quyet','yêu cầu xử lý','yeu cau xu ly',
-        'quyết định','quyet dinh','bồi thường','boi thuong','kỷ luật','ky luat'
-    ]
-    report_keywords = [
-        'phản ánh','phan anh','phản hồi','phan hoi','phản ánh hiện trường','hien truong',
-        'ổ gà','o ga','rác thải','rac thai','mất điện','mat dien','an ninh','còi kéo','coi keo'
-    ]
-    reasons = []
-    score_complaint = 0
-    score_report = 0
-    t = (title or '').lower()
-    d = (description or '').lower()
-    for k in complaint_keywords:
-        if k in t:
-            score_complaint += 2
-            reasons.append(k)
-        if k in d:
-            score_complaint += 1
-            if k not in reasons:
-                reasons.append(k)
-    for k in report_keywords:
-        if k in t:
-            score_report += 2
-        if k in d:
-            score_report += 1
-    if score_complaint > score_report:
-        # confidence from normalized margin
-        margin = max(1, score_complaint - score_report)
-        conf = min(0.95, 0.6 + 0.08 * min(5, margin))
-        return 'khieu_nai', conf, reasons[:3]
-    else:
-        margin = max(1, score_report - score_complaint)
-        conf = min(0.95, 0.6 + 0.08 * min(5, margin))
-        return 'phan_anh', conf, reasons[:3]
+@admin_bp.route('/feedback/classify-jobs/<int:job_id>')
+@login_required
+@admin_required
+def classify_job_status(job_id):
+    from models import ClassifyJob
+    job = ClassifyJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@admin_bp.route('/feedback/classify-jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+@admin_required
+def cancel_classify_job(job_id):
+    from models import ClassifyJob
+    from services.classify_jobs import cancel_job
+    job = cancel_job(ClassifyJob.query.get_or_404(job_id))
+    return jsonify(job.to_dict())
 
 @admin_bp.route('/feedback/<int:id>/delete', methods=['POST'])
 @login_required
@@ -1075,6 +1005,7 @@ def delete_feedback(id):
                         pass
     except Exception:
         pass
+    SeverityJob.query.filter_by(feedback_id=fb.id).delete()
     db.session.delete(fb)
     db.session.commit()
     flash('Đã xoá phản ánh/khiếu nại.', 'success')
@@ -1096,6 +1027,11 @@ def update_feedback(id):
     
     if admin_response:
         feedback.admin_response = admin_response
+
+    # Sửa tay loại/mức độ: ghi lại để mô hình học trực tuyến (flask learn-corrections)
+    from services.online_learning import record_correction
+    for field in ('kind', 'severity'):
+        record_correction(feedback, field, request.form.get(field), current_user.id)
     
     feedback.updated_at = datetime.utcnow()
     db.session.commit()
@@ -1,6 +1,7 @@
 import json
 import os
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+import time
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
 from models import Feedback, Announcement, DocumentType, DocumentRequest
 from forms import FeedbackForm, DocumentRequestForm
@@ -61,10 +62,19 @@ def submit_feedback():
                         resize_image(full_path)
         
         # Phân loại tự động bằng AI
-        from services.feedback_classifier import FeedbackClassifier
-        classifier = FeedbackClassifier()
-        result = classifier.classify(form.title.data, form.description.data)
-        
+        # Mức độ tính cục bộ ngay; trường hợp mơ hồ được LLM tinh chỉnh ở nền (services.severity_queue)
+        from services.classifier_registry import get_classifier
+        from services.shadow import get_shadow
+        started = time.perf_counter()
+        result = get_classifier().classify(form.title.data, form.description.data, use_llm=False)
+        shadow = get_shadow()
+        if shadow is not None:
+            # Mô hình ứng viên chấm ở nền, không ảnh hưởng kết quả lưu
+            try:
+                shadow.observe([(form.title.data, form.description.data)], [result], time.perf_counter() - started)
+            except Exception as e:
+                current_app.logger.error(f"Shadow observe failed: {e}")
+
         feedback = Feedback(
             title=form.title.data,
             description=form.description.data,
@@ -74,10 +84,16 @@ def submit_feedback():
             user_id=current_user.id,
             kind=result['label'],
             severity=result['severity'],
-            severity_confidence=result['severity_confidence']
+            severity_confidence=result['severity_confidence'],
+            severity_source=result['severity_tier']
         )
+        feedback.store_classification(result)
         
         db.session.add(feedback)
+        db.session.flush()
+        if result['severity_ambiguous']:
+            from services.severity_queue import enqueue_refinement
+            enqueue_refinement(feedback.id)
         db.session.commit()
 
         # Notify admins via email (if configured)
@@ -101,6 +117,24 @@ def submit_feedback():
     
     return render_template('citizen/feedback.html', form=form)
 
+@citizen_bp.route('/feedback/suggest-category', methods=['POST'])
+@login_required
+def suggest_feedback_category():
+    """Gợi ý loại phản ánh từ tiêu đề/mô tả để điền sẵn trên form (người dân vẫn tự chọn lại được)"""
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()[:200]
+    description = (data.get('description') or '').strip()[:2000]
+    if len(title) + len(description) < 10:
+        return jsonify({'category': None})
+
+    from services.classifier_registry import get_classifier
+    clf = get_classifier()
+    suggestion = clf.suggest_category(title, description)
+    if not suggestion or suggestion[1] < clf.config['category_suggest_threshold']:
+        return jsonify({'category': None})
+    category, confidence = suggestion
+    return jsonify({'category': category, 'confidence': round(confidence, 3)})
+
 
 
 @citizen_bp.route('/feedback/history')
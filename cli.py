@@ -0,0 +1,188 @@
+import time
+import click
+
+
+def register_commands(app):
+    """Đăng ký các lệnh `flask ...` của ứng dụng"""
+
+    @app.cli.command('severity-worker')
+    @click.option('--once', is_flag=True, help='Xử lý các job đến hạn rồi thoát.')
+    @click.option('--max-jobs', type=int, default=None, help='Số job tối đa mỗi lượt.')
+    @click.option('--poll', type=float, default=5.0, show_default=True, help='Số giây chờ giữa các lượt.')
+    def severity_worker(once, max_jobs, poll):
+        """Chạy worker tinh chỉnh mức độ nghiêm trọng bằng LLM."""
+        from services.severity_queue import run_pending
+        while True:
+            processed = run_pending(max_jobs)
+            if processed:
+                click.echo(f'Đã xử lý {processed} job.')
+            if once:
+                break
+            time.sleep(poll)
+
+    @app.cli.command('learn-corrections')
+    @click.option('--batch-size', type=int, default=None, help='Số chỉnh sửa mỗi lô cập nhật.')
+    @click.option('--limit', type=int, default=None, help='Số chỉnh sửa tối đa học trong lần chạy.')
+    def learn_corrections(batch_size, limit):
+        """Cập nhật mô hình từ các chỉnh sửa loại/mức độ của cán bộ (không huấn luyện lại)."""
+        from services.online_learning import learn_pending, count_pending, BATCH_SIZE
+        pending = count_pending()
+        if not pending:
+            click.echo('Không có chỉnh sửa mới.')
+            return
+        stats = learn_pending(batch_size=batch_size or BATCH_SIZE, limit=limit)
+        click.echo(f"Đã học {stats['learned']}/{pending} chỉnh sửa trong {stats['batches']} lô "
+                   f"(bỏ qua {stats['skipped']}); mô hình phiên bản {stats['version']}.")
+
+    @app.cli.command('reclassify')
+    @click.option('--workers', type=int, default=None, help='Số tiến trình phân loại (mặc định: mọi lõi CPU).')
+    @click.option('--chunk-size', type=int, default=None, help='Số phản ánh mỗi chunk / mỗi UPDATE hàng loạt.')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M']), default=None,
+                  help='Chỉ phản ánh gửi từ thời điểm này.')
+    @click.option('--full', is_flag=True, help='Phân loại lại tất cả, kể cả dòng đã theo phiên bản mô hình hiện tại.')
+    @click.option('--dry-run', is_flag=True, help='Chỉ đếm số dòng sẽ thay đổi, không ghi CSDL.')
+    def reclassify(workers, chunk_size, since, full, dry_run):
+        """Phân loại lại phản ánh song song trên nhiều tiến trình."""
+        import os
+        from services.reclassifier import reclassify_parallel, CHUNK_SIZE
+        from services.text_preprocessing import DEFAULT_DISK_CACHE_PATH
+
+        started = time.perf_counter()
+
+        def progress(stats):
+            click.echo(f"\r{stats['checked']} phản ánh, {stats['checked'] / (time.perf_counter() - started):.0f}/s",
+                       nl=False, err=True)
+
+        stats = reclassify_parallel(workers=workers, chunk_size=chunk_size or CHUNK_SIZE, full=full, since=since,
+                                    dry_run=dry_run, progress=progress,
+                                    token_cache_path=os.environ.get('TOKEN_CACHE_PATH', DEFAULT_DISK_CACHE_PATH))
+        click.echo('', err=True)
+        verb = 'Sẽ cập nhật' if dry_run else 'Đã cập nhật'
+        click.echo(f"Kiểm tra {stats['checked']} phản ánh trong {time.perf_counter() - started:.1f} s "
+                   f"({stats['workers']} tiến trình, {stats['chunks']} chunk). "
+                   f"{verb} {stats['updated_kind']} phân loại và {stats['updated_severity']} mức độ"
+                   f" (bỏ qua {stats['skipped_edited']} phản ánh vừa bị sửa nội dung).")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """Tính lại toàn bộ bảng thống kê dân cư theo thôn/xóm (hamlet_stats)."""
+        from services.hamlet_stats import rebuild
+        started = time.perf_counter()
+        count = rebuild()
+        click.echo(f'Đã tính lại {count} thôn/xóm trong {time.perf_counter() - started:.2f} s.')
+
+    @app.cli.command('check-stats')
+    @click.option('--fix', is_flag=True, help='Tính lại toàn bộ nếu phát hiện sai lệch.')
+    def check_stats(fix):
+        """So bảng hamlet_stats với số liệu tính trực tiếp từ các bảng gốc."""
+        from services.hamlet_stats import check, rebuild
+        mismatches = check()
+        if not mismatches:
+            click.echo('Bảng hamlet_stats khớp với dữ liệu.')
+            return
+        for m in mismatches:
+            click.echo(f"  {m['hamlet']}.{m['column']}: lưu {m['stored']}, thực tế {m['actual']}")
+        if fix:
+            rebuild()
+            click.echo(f'Đã sửa {len(mismatches)} ô sai lệch.')
+            return
+        raise click.ClickException(f'{len(mismatches)} ô sai lệch; chạy lại với --fix hoặc `flask rebuild-stats`.')
+
+    @app.cli.group('db')
+    def db_group():
+        """Migration lược đồ CSDL (services.migrations)."""
+
+    @db_group.command('upgrade')
+    @click.option('--to', 'target', type=int, default=None, help='Chỉ nâng tới phiên bản này.')
+    def db_upgrade(target):
+        """Chạy các migration còn thiếu."""
+        from services.migrations import upgrade, current_version
+        done = upgrade(target)
+        if done:
+            click.echo(f"Đã chạy migration {', '.join(map(str, done))}; phiên bản hiện tại {current_version()}.")
+        else:
+            click.echo(f'CSDL đã ở phiên bản {current_version()}.')
+
+    @db_group.command('status')
+    def db_status():
+        """Phiên bản lược đồ hiện tại và các migration đang chờ."""
+        from services.migrations import applied, pending, LATEST
+        for row in applied():
+            click.echo(f'  {row.version:>3}  {row.name}  ({row.applied_at:%Y-%m-%d %H:%M})')
+        waiting = pending()
+        for version, name in waiting:
+            click.echo(f'  {version:>3}  {name}  (chưa chạy)')
+        click.echo(f'{len(waiting)} migration đang chờ (mới nhất: {LATEST}).')
+
+    @app.cli.group('models')
+    def models_group():
+        """Quản lý phiên bản mô hình (models/registry)."""
+
+    @models_group.command('list')
+    @click.argument('bundle', required=False)
+    def models_list(bundle):
+        """Liệt kê các phiên bản đã đăng ký; * là phiên bản đang chạy."""
+        from services.model_registry import ModelRegistry
+        registry = ModelRegistry()
+        for name in [bundle] if bundle else registry.bundles():
+            active = registry.active_version(name)
+            click.echo(f'{name} (đang chạy: {active})')
+            for card in registry.versions(name):
+                marker = '*' if card['version'] == active else ' '
+                metrics = ' '.join(f'{k}={v}' for k, v in (card.get('metrics') or {}).items())
+                click.echo(f"  {marker} {card['version']}  {card.get('created_at')}  {card.get('source', '')}"
+                           f"  data={card.get('data_hash', '-')}  {metrics}")
+
+    @models_group.command('promote')
+    @click.argument('bundle')
+    @click.argument('version')
+    def models_promote(bundle, version):
+        """Đưa một phiên bản đã đăng ký vào chạy."""
+        from services.model_registry import ModelRegistry
+        try:
+            ModelRegistry().promote(bundle, version)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'{bundle}: đang chạy phiên bản {version}.')
+
+    @models_group.command('rollback')
+    @click.argument('bundle')
+    def models_rollback(bundle):
+        """Quay về phiên bản chạy trước đó."""
+        from services.model_registry import ModelRegistry
+        try:
+            version = ModelRegistry().rollback(bundle)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if version is None:
+            click.echo(f'{bundle}: đã gỡ, dùng lại head tương ứng của multihead_bundle.')
+        else:
+            click.echo(f'{bundle}: đã quay về phiên bản {version}.')
+
+    @models_group.command('shadow-report')
+    @click.option('--candidate', default=None, help='Chỉ tính bản ghi của phiên bản ứng viên này.')
+    @click.option('--replay', type=int, default=0, help='Chấm lại N phản ánh gần nhất bằng SHADOW_MODEL trước khi báo cáo.')
+    def models_shadow_report(candidate, replay):
+        """Tổng hợp logs/shadow.jsonl: tỉ lệ bất đồng và độ trễ của mô hình ứng viên."""
+        from services.shadow import read_log, summarize, get_shadow
+        if replay:
+            from models import Feedback
+            from services.classifier_registry import get_classifier
+            shadow = get_shadow()
+            if shadow is None:
+                raise click.ClickException('Chưa đặt SHADOW_MODEL=<bundle>:<version>.')
+            rows = Feedback.query.order_by(Feedback.id.desc()).limit(replay).all()
+            items = [(fb.title or '', fb.description or '') for fb in rows]
+            started = time.perf_counter()
+            results = get_classifier().classify_many(items, use_llm=False)
+            shadow.compare(items, results, time.perf_counter() - started)
+            candidate = candidate or shadow.version
+        report = summarize(read_log(candidate=candidate))
+        if not report['rows']:
+            click.echo('Chưa có bản ghi shadow.')
+            return
+        click.echo(f"{report['rows']} phản ánh")
+        for field, rate in report['disagreement'].items():
+            click.echo(f'  khác {field}: {rate:.1%}')
+        for key in ('active_ms', 'shadow_ms'):
+            click.echo(f"  {key}: p50 {report[key]['p50']:.2f} ms  p95 {report[key]['p95']:.2f} ms")
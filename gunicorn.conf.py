@@ -0,0 +1,28 @@
+"""Cấu hình gunicorn: gunicorn -c gunicorn.conf.py
+
+preload_app nạp ứng dụng một lần ở tiến trình master; on_starting nạp sẵn bộ
+phân loại phản ánh (mô hình, từ điển tách từ) rồi đóng băng heap cho GC để các
+worker fork ra dùng chung các trang bộ nhớ đó theo copy-on-write.
+"""
+import gc
+import os
+
+wsgi_app = 'main:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = True
+
+
+def on_starting(server):
+    if os.environ.get('CLASSIFIER_WARMUP', '1') != '0':
+        from services.classifier_registry import warm_up
+        warm_up()
+    # Đối tượng tạo trước khi fork không bị GC quét lại (tránh ghi vào trang dùng chung)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Không dùng lại kết nối CSDL mở ở master (create_app đọc phiên bản lược đồ)
+    from app import db
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
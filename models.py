@@ -1,4 +1,6 @@
-from datetime import datetime
+import json
+import hashlib
+from datetime import datetime, timedelta
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from app import db
@@ -18,6 +20,9 @@ class User(UserMixin, db.Model):
     feedbacks = db.relationship('Feedback', backref='user', lazy=True)
 
 class Household(db.Model):
+    __table_args__ = (
+        db.Index('ix_household_hamlet', 'hamlet'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     household_code = db.Column(db.String(20), unique=True, nullable=False)
     address = db.Column(db.String(200), nullable=False)
@@ -39,6 +44,11 @@ class Household(db.Model):
     residents = db.relationship('Resident', backref='household', lazy=True, cascade='all, delete-orphan')
 
 class Resident(db.Model):
+    __table_args__ = (
+        # Nhân khẩu của hộ; kèm relationship để kiểm tra 'Chủ hộ' chỉ đọc chỉ mục
+        db.Index('ix_resident_household_relationship', 'household_id', 'relationship'),
+        db.Index('ix_resident_birth_date', 'birth_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
     birth_date = db.Column(db.Date, nullable=False)
@@ -60,7 +70,39 @@ class Resident(db.Model):
     # Relationships
     temporary_residences = db.relationship('TemporaryResidence', backref='resident', lazy=True)
 
+class SchemaVersion(db.Model):
+    """Các migration đã chạy (services.migrations)"""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class HamletStats(db.Model):
+    """Số liệu dân cư theo thôn/xóm, cập nhật tăng dần khi dữ liệu đổi (xem services.hamlet_stats)"""
+    __tablename__ = 'hamlet_stats'
+    hamlet = db.Column(db.String(50), primary_key=True)
+    households = db.Column(db.Integer, nullable=False, default=0)
+    residents = db.Column(db.Integer, nullable=False, default=0)
+    heads_without_resident = db.Column(db.Integer, nullable=False, default=0)  # hộ chưa có nhân khẩu 'Chủ hộ'
+    children = db.Column(db.Integer, nullable=False, default=0)  # dưới 18 tuổi (theo năm sinh)
+    elderly = db.Column(db.Integer, nullable=False, default=0)  # từ 60 tuổi
+    temp_residents = db.Column(db.Integer, nullable=False, default=0)  # tạm trú đang hiệu lực
+    temp_absent = db.Column(db.Integer, nullable=False, default=0)  # tạm vắng đang hiệu lực
+    beneficiaries = db.Column(db.Integer, nullable=False, default=0)  # đối tượng hưởng trợ cấp đang hiệu lực
+    stats_year = db.Column(db.Integer)  # năm dùng để tính tuổi; sang năm mới thì tính lại
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def people(self):
+        # Chủ hộ chưa được nhập thành nhân khẩu vẫn được tính một người
+        return self.residents + self.heads_without_resident
+
 class TemporaryResidence(db.Model):
+    __table_args__ = (
+        db.Index('ix_temporary_residence_active_type_start', 'is_active', 'type', 'start_date'),
+        db.Index('ix_temporary_residence_resident', 'resident_id'),
+        db.Index('ix_temporary_residence_head_household', 'head_household_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20), nullable=False)  # 'tam_tru' or 'tam_vang'
     start_date = db.Column(db.Date, nullable=False)
@@ -81,16 +123,31 @@ class TemporaryResidence(db.Model):
     is_for_head = db.Column(db.Boolean, default=False)
 
 class Feedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_feedback_status_created', 'status', 'created_at'),
+        db.Index('ix_feedback_user_created', 'user_id', 'created_at'),
+        db.Index('ix_feedback_created', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False)  # 'o_ga', 'rac_thai', 'mat_dien', 'an_ninh'
     # kind: phan_anh (phản ánh) / khieu_nai (khiếu nại) / None
     kind = db.Column(db.String(20))
+    kind_source = db.Column(db.String(20))  # 'admin' nếu cán bộ đã sửa tay (AI không ghi đè)
     location = db.Column(db.String(200))
     priority = db.Column(db.String(20), default='medium')  # 'low', 'medium', 'high'
     severity = db.Column(db.String(20))  # 'low', 'medium', 'high' - phân loại bởi AI
     severity_confidence = db.Column(db.Float)  # Độ tin cậy của việc phân loại mức độ
+    severity_source = db.Column(db.String(20))  # tầng cascade: 'model'/'rules' (cục bộ), 'llm' (đã tinh chỉnh bằng LLM) hoặc 'admin' (sửa tay)
+    # Giải thích của lần phân loại gần nhất (hiển thị trên trang quản lý, không chạy lại AI)
+    classify_label = db.Column(db.String(20))
+    classify_confidence = db.Column(db.Float)
+    classify_method = db.Column(db.String(20))  # 'rules' hoặc 'tfidf'
+    classify_terms = db.Column(db.Text)  # JSON list các từ khóa quan trọng
+    model_version = db.Column(db.String(40), index=True)  # Phiên bản bộ phân loại đã tạo ra kết quả
+    text_hash = db.Column(db.String(40))  # Hash tiêu đề + mô tả lúc phân loại
+    classified_at = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'in_progress', 'resolved', 'rejected'
     admin_response = db.Column(db.Text)
     attachments = db.Column(db.Text)  # JSON string of file paths
@@ -101,7 +158,133 @@ class Feedback(db.Model):
     # Foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    def store_classification(self, result, explanation_only=False):
+        """Lưu phần giải thích của một kết quả FeedbackClassifier.explain/classify
+
+        explanation_only: chỉ làm mới phần giải thích, giữ model_version/text_hash để
+        reclassifier vẫn coi dòng là lỗi thời nếu loại/mức độ chưa được tính lại.
+        """
+        values = self.classification_values(result, self.title, self.description)
+        if explanation_only:
+            del values['model_version'], values['text_hash']
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    @staticmethod
+    def classification_values(result, title, description):
+        """Các cột store_classification ghi (dùng cho UPDATE hàng loạt không qua đối tượng ORM)"""
+        return {
+            'classify_label': result['label'],
+            'classify_confidence': float(result['confidence']),
+            'classify_method': result.get('method'),
+            'classify_terms': json.dumps(result.get('important_terms') or [], ensure_ascii=False),
+            'model_version': result.get('model_version'),
+            'text_hash': Feedback.compute_text_hash(title, description),
+            'classified_at': datetime.utcnow(),
+        }
+
+    @staticmethod
+    def compute_text_hash(title, description):
+        return hashlib.sha1(f"{title or ''}\x00{description or ''}".encode('utf-8')).hexdigest()
+
+    @property
+    def classify_terms_list(self):
+        try:
+            return json.loads(self.classify_terms) if self.classify_terms else []
+        except Exception:
+            return []
+
+@db.event.listens_for(Feedback, 'before_update')
+def _invalidate_classification(mapper, connection, target):
+    # Sửa nội dung thì kết quả phân loại cũ không còn đúng: để reclassifier xử lý lại
+    if target.text_hash and target.text_hash != Feedback.compute_text_hash(target.title, target.description):
+        target.model_version = None
+
+class FeedbackCorrection(db.Model):
+    """Chỉnh sửa loại/mức độ của cán bộ, dùng để mô hình học trực tuyến (services.online_learning)"""
+    id = db.Column(db.Integer, primary_key=True)
+    feedback_id = db.Column(db.Integer, db.ForeignKey('feedback.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = db.Column(db.String(20), nullable=False)  # 'kind' hoặc 'severity'
+    old_value = db.Column(db.String(20))
+    new_value = db.Column(db.String(20), nullable=False)
+    # Nội dung lúc sửa (phản ánh có thể được sửa lại sau đó)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    model_version = db.Column(db.String(40))  # Phiên bản mô hình đã cho kết quả bị sửa
+    applied_version = db.Column(db.String(40))  # Phiên bản mô hình đã học chỉnh sửa này
+    applied_at = db.Column(db.DateTime, index=True)  # NULL: chưa học
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SeverityJob(db.Model):
+    """Hàng đợi bền vững cho việc tinh chỉnh mức độ nghiêm trọng bằng LLM"""
+    id = db.Column(db.Integer, primary_key=True)
+    feedback_id = db.Column(db.Integer, db.ForeignKey('feedback.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/done/failed/skipped
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)  # thời điểm worker nhận job (để thu hồi job bị treo)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ClassifyJob(db.Model):
+    """Lượt phân loại lại toàn bộ phản ánh chạy nền (xem services.classify_jobs)"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/done/failed/cancelled
+    full = db.Column(db.Boolean, default=False)  # True: phân loại lại tất cả, không chỉ các dòng lỗi thời
+    model_version = db.Column(db.String(40))
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    updated_kind = db.Column(db.Integer, default=0)
+    updated_severity = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    last_id = db.Column(db.Integer, default=0)  # id phản ánh cuối đã xử lý (để chạy tiếp)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    LEASE_SECONDS = 300  # job chưa xong mà không cập nhật quá thời gian này: luồng nền đã chết
+
+    @property
+    def is_active(self):
+        return self.status in ('pending', 'running')
+
+    @property
+    def is_stale(self):
+        return self.is_active and (self.updated_at is None or
+                                   self.updated_at < datetime.utcnow() - timedelta(seconds=self.LEASE_SECONDS))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'full': bool(self.full),
+            'model_version': self.model_version,
+            'total': self.total or 0,
+            'processed': self.processed or 0,
+            'percent': round(100.0 * (self.processed or 0) / self.total, 1) if self.total else 100.0,
+            'updated_kind': self.updated_kind or 0,
+            'updated_severity': self.updated_severity or 0,
+            'errors': self.errors or 0,
+            'last_error': self.last_error,
+            'cancel_requested': bool(self.cancel_requested),
+            'stale': self.is_stale,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 class Announcement(db.Model):
+    __table_args__ = (
+        # Chỉ mục một phần: người dân chỉ đọc các bản tin đã đăng
+        db.Index('ix_announcement_published_date', 'publish_date',
+                 sqlite_where=db.text('is_published = 1'), postgresql_where=db.text('is_published')),
+        db.Index('ix_announcement_created', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -129,6 +312,11 @@ class BenefitCategory(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Beneficiary(db.Model):
+    __table_args__ = (
+        db.Index('ix_beneficiary_category_active', 'category_id', 'is_active'),
+        db.Index('ix_beneficiary_household', 'household_id'),
+        db.Index('ix_beneficiary_resident', 'resident_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     target_type = db.Column(db.String(20), nullable=False)  # household/resident
     household_id = db.Column(db.Integer, db.ForeignKey('household.id'))
@@ -149,6 +337,9 @@ class Beneficiary(db.Model):
     resident = db.relationship('Resident')
 
 class BenefitPayment(db.Model):
+    __table_args__ = (
+        db.Index('ix_benefit_payment_beneficiary', 'beneficiary_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     beneficiary_id = db.Column(db.Integer, db.ForeignKey('beneficiary.id'), nullable=False)
     period = db.Column(db.String(7), nullable=False)  # YYYY-MM
@@ -173,6 +364,10 @@ class DocumentType(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class DocumentRequest(db.Model):
+    __table_args__ = (
+        db.Index('ix_document_request_status_submitted', 'status', 'submitted_at'),
+        db.Index('ix_document_request_user_submitted', 'user_id', 'submitted_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type_id = db.Column(db.Integer, db.ForeignKey('document_type.id'), nullable=False)
@@ -0,0 +1,213 @@
+"""Benchmark FeedbackClassifier: độ trễ/thông lượng từng bước và độ chính xác.
+
+Phát lại data/feedback_training/feedback_data.csv và feedback_severity.csv
+(cộng thêm bản nhân rộng tổng hợp với --scale) qua bộ phân loại, đo riêng:
+- preprocess: chuẩn hóa + tách từ (cache trống)
+- rules: phân loại bằng luật (tách từ đã có trong cache)
+- tfidf: TF-IDF + hồi quy logistic (tách từ đã có trong cache)
+- severity: mức độ nghiêm trọng cục bộ (không gọi LLM), kèm tỉ lệ dừng ở từng tầng
+- batch: explain_many cho cả lô, cache trống
+và độ chính xác / macro-F1 cho loại phản ánh và mức độ.
+
+    python scripts/benchmark_classifier.py run --scale 5 --output benchmarks/classifier_baseline.json
+    python scripts/benchmark_classifier.py compare --baseline benchmarks/classifier_baseline.json
+
+Chế độ compare thoát với mã 1 nếu thông lượng giảm quá --max-throughput-drop
+(tỉ lệ) hoặc độ chính xác/F1 giảm quá --max-accuracy-drop (điểm tuyệt đối).
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.feedback_classifier import FeedbackClassifier
+
+DATA_DIR = os.path.join(ROOT, 'data', 'feedback_training')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'classifier_baseline.json')
+STAGES = ('preprocess', 'rules', 'tfidf', 'severity', 'batch')
+
+
+def load_csv(name, label_col):
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+        return [(r['title'], r['description'], r[label_col]) for r in csv.DictReader(f)]
+
+
+def scale_up(rows, factor):
+    """Nhân rộng dữ liệu; mỗi bản sao có mã riêng để không trúng cache tách từ"""
+    out = list(rows)
+    for k in range(1, factor):
+        out += [(title, f"{desc} (mã {k}-{i})", label) for i, (title, desc, label) in enumerate(rows)]
+    return out
+
+
+def timed(fn, items):
+    """Chạy fn(*item) cho từng item, trả về mảng độ trễ (giây)"""
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(*item)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def summarize(latencies, rows):
+    total = float(latencies.sum()) if hasattr(latencies, 'sum') else float(latencies)
+    summary = {
+        'rows': rows,
+        'total_s': round(total, 6),
+        'rows_per_sec': round(rows / total, 1) if total else None,
+    }
+    if hasattr(latencies, '__len__') and len(latencies):
+        summary['p50_ms'] = round(float(np.percentile(latencies, 50)) * 1000, 4)
+        summary['p95_ms'] = round(float(np.percentile(latencies, 95)) * 1000, 4)
+    return summary
+
+
+def macro_f1(gold, pred):
+    scores = []
+    for label in sorted(set(gold)):
+        tp = sum(g == label and p == label for g, p in zip(gold, pred))
+        fp = sum(g != label and p == label for g, p in zip(gold, pred))
+        fn = sum(g == label and p != label for g, p in zip(gold, pred))
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        scores.append(2 * precision * recall / (precision + recall) if precision + recall else 0.0)
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def quality(gold, pred):
+    accuracy = sum(g == p for g, p in zip(gold, pred)) / len(gold) if gold else 0.0
+    return {'rows': len(gold), 'accuracy': round(accuracy, 4), 'macro_f1': round(macro_f1(gold, pred), 4)}
+
+
+def run(scale=1, tokenizer=None):
+    clf = FeedbackClassifier(tokenizer=tokenizer)
+    kind_rows = load_csv('feedback_data.csv', 'label')
+    severity_rows = load_csv('feedback_severity.csv', 'severity')
+    rows = scale_up(kind_rows + severity_rows, scale)
+    pairs = [(title, desc) for title, desc, _ in rows]
+
+    stages = {}
+    clf.preprocessor.clear()
+    stages['preprocess'] = summarize(timed(clf._preprocess_parts, pairs), len(pairs))
+    # Các bước sau dùng tách từ đã cache để chỉ đo chi phí của riêng bước đó
+    stages['rules'] = summarize(timed(clf._apply_rule_classification, pairs), len(pairs))
+    stages['tfidf'] = summarize(timed(clf._apply_tfidf_classification, pairs), len(pairs))
+    clf.severity_stats.reset()
+    stages['severity'] = summarize(
+        timed(lambda t, d: clf._classify_severity(t, d, use_llm=False), pairs), len(pairs)
+    )
+    severity_tiers = clf.severity_stats.snapshot()
+    clf.preprocessor.clear()
+    start = time.perf_counter()
+    clf.explain_many(pairs)
+    stages['batch'] = summarize(np.float64(time.perf_counter() - start), len(pairs))
+
+    kind_pred = [r['label'] for r in clf.explain_many((t, d) for t, d, _ in kind_rows)]
+    severity_pred = [clf._classify_severity(t, d, use_llm=False)[0] for t, d, _ in severity_rows]
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'model_version': clf.model_version,
+        'tokenizer': clf.preprocessor.tokenizer,
+        'scale': scale,
+        'stages': stages,
+        'severity_tiers': severity_tiers,
+        'quality': {
+            'kind': quality([label for _, _, label in kind_rows], kind_pred),
+            'severity': quality([label for _, _, label in severity_rows], severity_pred),
+        },
+    }
+
+
+def compare(current, baseline, max_throughput_drop, max_accuracy_drop):
+    """So sánh với baseline; trả về danh sách các hồi quy"""
+    failures = []
+    for stage in STAGES:
+        old = baseline['stages'].get(stage, {}).get('rows_per_sec')
+        new = current['stages'].get(stage, {}).get('rows_per_sec')
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        flag = 'FAIL' if change < -max_throughput_drop else 'ok'
+        print(f"{stage:10s} {old:>12.1f} -> {new:>12.1f} rows/s ({change:+.1%}) {flag}")
+        if flag == 'FAIL':
+            failures.append(f"{stage}: thông lượng giảm {-change:.1%}")
+    for task in ('kind', 'severity'):
+        for metric in ('accuracy', 'macro_f1'):
+            old = baseline['quality'].get(task, {}).get(metric)
+            new = current['quality'].get(task, {}).get(metric)
+            if old is None or new is None:
+                continue
+            flag = 'FAIL' if new < old - max_accuracy_drop else 'ok'
+            print(f"{task}.{metric:9s} {old:>8.4f} -> {new:>8.4f} {flag}")
+            if flag == 'FAIL':
+                failures.append(f"{task}.{metric}: {old:.4f} -> {new:.4f}")
+    return failures
+
+
+def print_report(result):
+    print(f"model {result['model_version']} | tokenizer {result['tokenizer']} | scale x{result['scale']}")
+    for stage in STAGES:
+        s = result['stages'][stage]
+        latency = f"p50 {s['p50_ms']:.3f} ms  p95 {s['p95_ms']:.3f} ms" if 'p50_ms' in s else ''
+        print(f"{stage:10s} {s['rows']:>6d} rows  {s['rows_per_sec']:>10.1f} rows/s  {latency}")
+    for tier, t in result.get('severity_tiers', {}).items():
+        print(f"  severity tier {tier:9s} hit rate {t['hit_rate']:6.1%}  calls {t['calls']:>6d}  avg {t['avg_ms']:.3f} ms")
+    for task, q in result['quality'].items():
+        print(f"{task:10s} accuracy {q['accuracy']:.2%}  macro-F1 {q['macro_f1']:.4f}  ({q['rows']} rows)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FeedbackClassifier")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    for name in ('run', 'compare'):
+        p = sub.add_parser(name)
+        p.add_argument('--scale', type=int, default=1, help="nhân rộng dữ liệu N lần")
+        p.add_argument('--tokenizer', choices=('underthesea', 'regex'))
+    sub.choices['run'].add_argument('--output', help="ghi kết quả JSON (ví dụ baseline)")
+    cmp_parser = sub.choices['compare']
+    cmp_parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    cmp_parser.add_argument('--max-throughput-drop', type=float, default=0.25)
+    cmp_parser.add_argument('--max-accuracy-drop', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    if args.mode == 'compare':
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        # Dùng cùng kích thước dữ liệu với baseline để số liệu so sánh được
+        result = run(scale=baseline.get('scale', args.scale), tokenizer=args.tokenizer or baseline.get('tokenizer'))
+        print_report(result)
+        print()
+        failures = compare(result, baseline, args.max_throughput_drop, args.max_accuracy_drop)
+        if failures:
+            print("Hồi quy so với baseline: " + '; '.join(failures))
+            return 1
+        print("Không có hồi quy so với baseline.")
+        return 0
+
+    result = run(scale=args.scale, tokenizer=args.tokenizer)
+    print_report(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Đã ghi {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
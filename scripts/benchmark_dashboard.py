@@ -0,0 +1,146 @@
+"""Benchmark thống kê dân cư của trang tổng quan quản trị: SQL gộp so với nạp toàn bộ.
+
+Tạo CSDL SQLite tạm, sinh dữ liệu hộ/nhân khẩu tổng hợp (khoảng 4 người một
+hộ, 1/5 số hộ không có nhân khẩu 'Chủ hộ') rồi tăng dần tới từng mốc
+--sizes. Ở mỗi mốc đo thời gian và bộ nhớ đỉnh (tracemalloc) của:
+- legacy: cách cũ, Household.query.all() + Resident.query.all() rồi đếm bằng Python
+- sql: services.population_stats (GROUP BY / EXISTS, chỉ trả về vài dòng)
+- table: đọc bảng tổng hợp hamlet_stats (services.hamlet_stats)
+và kiểm tra các cách cho cùng kết quả.
+
+    python scripts/benchmark_dashboard.py --sizes 1000 10000 100000 --output benchmarks/dashboard.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import tracemalloc
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HAMLETS = [f'Thôn {i}' for i in range(1, 13)]
+RELATIONSHIPS = ['Vợ', 'Chồng', 'Con', 'Cha', 'Mẹ', 'Cháu']
+PEOPLE_PER_HOUSEHOLD = 4
+BATCH = 10000
+
+
+def legacy_stats(Household, Resident):
+    """Cách tính cũ của admin.dashboard (để so sánh)"""
+    households = Household.query.all()
+    residents = Resident.query.all()
+    hh_residents_count, hh_has_head = {}, {}
+    for r in residents:
+        hh_residents_count[r.household_id] = hh_residents_count.get(r.household_id, 0) + 1
+        if r.relationship == 'Chủ hộ':
+            hh_has_head[r.household_id] = True
+    stats_map = {}
+    for h in households:
+        s = stats_map.setdefault(h.hamlet, {'hamlet': h.hamlet, 'households': 0, 'residents': 0})
+        s['households'] += 1
+        s['residents'] += hh_residents_count.get(h.id, 0) + (0 if hh_has_head.get(h.id, False) else 1)
+    without_head = sum(1 for h in households if not hh_has_head.get(h.id, False))
+    return list(stats_map.values()), len(residents) + without_head
+
+
+def sql_stats(Resident):
+    from services.population_stats import hamlet_stats, households_without_head
+    return hamlet_stats(), Resident.query.count() + households_without_head()
+
+
+def table_stats():
+    from services.hamlet_stats import get_stats, totals
+    rows = get_stats()
+    stats = [{'hamlet': row.hamlet, 'households': row.households, 'residents': row.people} for row in rows]
+    return stats, totals(rows)['people']
+
+
+def same(legacy, other):
+    """So kết quả bỏ qua thứ tự thôn"""
+    return {s['hamlet']: s for s in legacy[0]} == {s['hamlet']: s for s in other[0]} and legacy[1] == other[1]
+
+
+def measure(fn):
+    from app import db
+    db.session.expire_all()
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+    db.session.remove()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.remove()
+    return result, {'wall_ms': round(wall * 1000, 1), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+
+def grow(db, Household, Resident, residents_target, rng):
+    """Thêm hộ và nhân khẩu cho tới khi đủ residents_target nhân khẩu"""
+    now = datetime.utcnow()
+    current = Resident.query.count()
+    next_household = (db.session.query(db.func.max(Household.id)).scalar() or 0) + 1
+    while current < residents_target:
+        households, residents = [], []
+        while len(residents) < BATCH and current + len(residents) < residents_target:
+            hid = next_household
+            next_household += 1
+            households.append({'id': hid, 'household_code': f'HK{hid:07d}', 'address': f'Số {hid}',
+                               'hamlet': rng.choice(HAMLETS), 'head_of_household': f'Chủ hộ {hid}',
+                               'created_at': now, 'updated_at': now})
+            with_head = rng.random() >= 0.2
+            for k in range(PEOPLE_PER_HOUSEHOLD):
+                residents.append({'full_name': f'Người {hid}-{k}', 'birth_date': date(1950 + rng.randrange(70), 1, 1),
+                                  'gender': rng.choice(('Nam', 'Nữ')), 'household_id': hid,
+                                  'relationship': 'Chủ hộ' if k == 0 and with_head else rng.choice(RELATIONSHIPS),
+                                  'created_at': now, 'updated_at': now})
+        db.session.execute(db.insert(Household), households)
+        db.session.execute(db.insert(Resident), residents)
+        db.session.commit()
+        current += len(residents)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark thống kê dân cư trang tổng quan")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="các mốc số nhân khẩu")
+    parser.add_argument('--output', help="file JSON ghi kết quả")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench_dashboard_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from app import create_app, db
+    from models import Household, Resident
+
+    app = create_app()
+    rng = random.Random(42)
+    rows = []
+    with app.app_context():
+        for size in sorted(args.sizes):
+            grow(db, Household, Resident, size, rng)
+            legacy, legacy_cost = measure(lambda: legacy_stats(Household, Resident))
+            sql, sql_cost = measure(lambda: sql_stats(Resident))
+            table, table_cost = measure(table_stats)
+            ok = legacy == sql and same(legacy, table)
+            rows.append({'residents': size, 'households': Household.query.count(),
+                         'legacy': legacy_cost, 'sql': sql_cost, 'table': table_cost, 'same_result': ok})
+            print(f"{size:>8} nhân khẩu  legacy {legacy_cost['wall_ms']:>8.1f} ms {legacy_cost['peak_mb']:>7.2f} MB"
+                  f"  |  sql {sql_cost['wall_ms']:>7.1f} ms {sql_cost['peak_mb']:>5.2f} MB"
+                  f"  |  table {table_cost['wall_ms']:>5.1f} ms"
+                  f"  |  {'khớp' if ok else 'KHÁC'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), 'results': rows}, f, ensure_ascii=False, indent=2)
+    return 0 if all(r['same_result'] for r in rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Benchmark ghi/đọc đồng thời trên SQLite: hồ sơ engine cũ ('legacy') so với 'wal'.
+
+Tạo một CSDL SQLite tạm có sẵn hộ/nhân khẩu/phản ánh, rồi với mỗi hồ sơ
+(SQLITE_PROFILE) chạy --workers tiến trình (như các worker gunicorn), mỗi tiến
+trình --threads luồng, trong --seconds giây. Mỗi thao tác là một "request":
+- gửi phản ánh (INSERT feedback)
+- cán bộ sửa nhân khẩu (UPDATE resident, kèm cập nhật hamlet_stats)
+- mở trang tổng quan (đọc hamlet_stats, đếm phản ánh, 5 phản ánh mới nhất)
+theo tỉ lệ --write-ratio cho hai loại ghi. Ghi lại số thao tác/giây, độ trễ
+p50/p95 và số lỗi "database is locked".
+
+    python scripts/benchmark_sqlite_concurrency.py --workers 4 --threads 4 --seconds 10 \\
+        --output benchmarks/sqlite_concurrency.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import threading
+import multiprocessing
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+PROFILES = ('legacy', 'wal')
+
+
+def seed(path, households, feedbacks):
+    """CSDL mẫu (chế độ journal mặc định) để mỗi hồ sơ bắt đầu từ cùng một bản sao"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_PROFILE'] = 'legacy'
+    from app import create_app, db
+    from models import Feedback, Household, Resident, User
+    app = create_app()
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    with app.app_context():
+        user_id = User.query.filter_by(username='admin').first().id
+        db.session.execute(db.insert(Household), [
+            {'id': hid, 'household_code': f'HK{hid:06d}', 'address': f'Số {hid}', 'hamlet': f'Thôn {hid % 8}',
+             'head_of_household': f'Chủ hộ {hid}', 'created_at': now, 'updated_at': now}
+            for hid in range(1, households + 1)])
+        db.session.execute(db.insert(Resident), [
+            {'full_name': f'Người {hid}-{k}', 'birth_date': date(1950 + rng.randrange(70), 1, 1), 'gender': 'Nam',
+             'household_id': hid, 'relationship': 'Chủ hộ' if k == 0 else 'Con', 'created_at': now, 'updated_at': now}
+            for hid in range(1, households + 1) for k in range(4)])
+        db.session.execute(db.insert(Feedback), [
+            {'title': f'Phản ánh {i}', 'description': 'Đường hỏng', 'category': 'o_ga', 'user_id': user_id,
+             'status': 'pending', 'created_at': now} for i in range(feedbacks)])
+        db.session.commit()
+        resident_ids = [rid for (rid,) in db.session.query(Resident.id)]
+        db.session.remove()
+        db.engine.dispose()
+    return user_id, resident_ids
+
+
+def worker(profile, path, seconds, threads, write_ratio, user_id, resident_ids, start_at, queue):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ['SEVERITY_WORKER'] = 'off'
+    import logging
+    logging.disable(logging.WARNING)
+    from app import create_app, db
+    from models import Feedback, Resident
+    from services.hamlet_stats import get_stats
+    app = create_app()
+    with app.app_context():
+        db.engine.dispose()
+
+    results = []
+
+    def run(seed):
+        rng = random.Random(seed)
+        ops, errors, latencies = {'submit': 0, 'edit': 0, 'read': 0}, 0, []
+        with app.app_context():
+            while time.time() < start_at:
+                time.sleep(0.001)
+            deadline = start_at + seconds
+            while time.time() < deadline:
+                roll = rng.random()
+                op = 'submit' if roll < write_ratio / 2 else 'edit' if roll < write_ratio else 'read'
+                began = time.perf_counter()
+                try:
+                    if op == 'submit':
+                        db.session.add(Feedback(title='Phản ánh mới', description='Rác thải tồn đọng',
+                                                category='rac_thai', user_id=user_id))
+                        db.session.commit()
+                    elif op == 'edit':
+                        resident = db.session.get(Resident, rng.choice(resident_ids))
+                        resident.phone = f'09{rng.randrange(10 ** 8):08d}'
+                        resident.birth_date = date(1950 + rng.randrange(70), 1, 1)
+                        db.session.commit()
+                    else:
+                        get_stats()
+                        Feedback.query.filter_by(status='pending').count()
+                        Feedback.query.order_by(Feedback.created_at.desc()).limit(5).all()
+                        db.session.rollback()
+                    ops[op] += 1
+                    latencies.append(time.perf_counter() - began)
+                except Exception as e:
+                    db.session.rollback()
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    errors += 1
+                finally:
+                    db.session.remove()
+        results.append((ops, errors, latencies))
+
+    pool = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put(results)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_profile(profile, template, workdir, args, user_id, resident_ids):
+    path = os.path.join(workdir, f'{profile}.db')
+    shutil.copy(template, path)
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    start_at = time.time() + 3  # đợi mọi tiến trình tạo xong ứng dụng
+    procs = [ctx.Process(target=worker, args=(profile, path, args.seconds, args.threads, args.write_ratio,
+                                              user_id, resident_ids, start_at, queue))
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    collected = [item for _ in procs for item in queue.get()]
+    for p in procs:
+        p.join()
+    ops = {k: sum(c[0][k] for c in collected) for k in ('submit', 'edit', 'read')}
+    latencies = [lat for c in collected for lat in c[2]]
+    total = sum(ops.values())
+    return {
+        'profile': profile,
+        'ops': ops,
+        'ops_per_s': round(total / args.seconds, 1),
+        'errors_locked': sum(c[1] for c in collected),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SQLite đồng thời: hồ sơ engine cũ và WAL")
+    parser.add_argument('--workers', type=int, default=4, help="số tiến trình (như worker gunicorn)")
+    parser.add_argument('--threads', type=int, default=4, help="số luồng mỗi tiến trình")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.3, help="tỉ lệ thao tác ghi")
+    parser.add_argument('--households', type=int, default=2000)
+    parser.add_argument('--feedbacks', type=int, default=5000)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--output', help="file JSON ghi kết quả")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    template = os.path.join(workdir, 'template.db')
+    # Tạo dữ liệu trong tiến trình con để tiến trình cha không giữ engine/kết nối khi fork
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(1) as pool:
+        user_id, resident_ids = pool.apply(seed, (template, args.households, args.feedbacks))
+
+    rows = []
+    for profile in args.profiles:
+        row = run_profile(profile, template, workdir, args, user_id, resident_ids)
+        rows.append(row)
+        print(f"{profile:>7}: {row['ops_per_s']:>8.1f} thao tác/s  p50 {row['p50_ms']:>7.2f} ms  "
+              f"p95 {row['p95_ms']:>8.2f} ms  max {row['max_ms']:>8.1f} ms  lỗi khóa {row['errors_locked']}  "
+              f"{row['ops']}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                       'cpus': os.cpu_count(), 'workers': args.workers, 'threads': args.threads,
+                       'seconds': args.seconds, 'write_ratio': args.write_ratio, 'results': rows},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""So sánh hai chế độ tách từ (underthesea / regex) trên dữ liệu huấn luyện.
+
+In thời gian tiền xử lý (lần đầu và khi đã có cache), tỉ lệ văn bản tách
+giống nhau, và độ khớp nhãn / độ chính xác của FeedbackClassifier.explain()
+ở mỗi chế độ.
+
+    python scripts/compare_tokenizers.py
+"""
+import os
+import sys
+import csv
+import time
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.feedback_classifier import FeedbackClassifier
+from services.text_preprocessing import TOKENIZERS
+
+DATA_FILE = os.path.join(ROOT, 'data', 'feedback_training', 'feedback_data.csv')
+
+
+def load_rows(path=DATA_FILE):
+    with open(path, encoding='utf-8') as f:
+        return [(r['title'], r['description'], r['label']) for r in csv.DictReader(f)]
+
+
+def measure(tokenizer, rows):
+    clf = FeedbackClassifier(tokenizer=tokenizer)
+    texts = [t for title, desc, _ in rows for t in (title, desc)]
+
+    start = time.perf_counter()
+    tokens = [clf.preprocessor.preprocess(t) for t in texts]
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in texts:
+        clf.preprocessor.preprocess(t)
+    warm = time.perf_counter() - start
+
+    labels = [r['label'] for r in clf.explain_many((title, desc) for title, desc, _ in rows)]
+    return {'cold': cold, 'warm': warm, 'tokens': tokens, 'labels': labels}
+
+
+def main():
+    logging.disable(logging.WARNING)
+    rows = load_rows()
+    results = {name: measure(name, rows) for name in TOKENIZERS}
+    gold = [label for _, _, label in rows]
+
+    print(f"{len(rows)} mẫu ({2 * len(rows)} đoạn văn bản)")
+    for name, res in results.items():
+        accuracy = sum(p == g for p, g in zip(res['labels'], gold)) / len(rows)
+        print(f"{name:12s} lần đầu {res['cold'] * 1000:8.1f} ms | có cache {res['warm'] * 1000:6.1f} ms"
+              f" | độ chính xác {accuracy:.1%}")
+
+    a, b = (results[name] for name in TOKENIZERS)
+    same_tokens = sum(x == y for x, y in zip(a['tokens'], b['tokens'])) / len(a['tokens'])
+    same_labels = sum(x == y for x, y in zip(a['labels'], b['labels'])) / len(rows)
+    print(f"Văn bản tách giống nhau: {same_tokens:.1%}; nhãn giống nhau: {same_labels:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Chuyển các mô hình pickle cũ (models/*.pkl) sang bundle mảng NumPy.
+
+Chỉ cần chạy một lần cho các bản cài đặt còn mô hình huấn luyện dạng pickle;
+các script huấn luyện hiện ghi thẳng bundle.
+
+    python scripts/export_model_bundles.py
+"""
+import os
+import sys
+import pickle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.model_bundle import export_bundle
+from services.feedback_classifier import MODEL_DIR, TFIDF_BUNDLE, SEVERITY_BUNDLE
+
+PICKLES = (
+    ('vectorizer.pkl', 'classifier.pkl', TFIDF_BUNDLE),
+    ('severity_vectorizer.pkl', 'severity_classifier.pkl', SEVERITY_BUNDLE),
+)
+
+
+def main(model_dir=MODEL_DIR):
+    for vectorizer_file, classifier_file, bundle in PICKLES:
+        paths = [os.path.join(model_dir, name) for name in (vectorizer_file, classifier_file)]
+        if not all(os.path.exists(p) for p in paths):
+            print(f"Bỏ qua {bundle}: thiếu {vectorizer_file} hoặc {classifier_file}")
+            continue
+        with open(paths[0], 'rb') as f:
+            vectorizer = pickle.load(f)
+        with open(paths[1], 'rb') as f:
+            classifier = pickle.load(f)
+        version = export_bundle(vectorizer, classifier, os.path.join(model_dir, bundle))
+        print(f"Đã xuất {bundle} (phiên bản {version})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,42 @@
 import sys, os
-import logging
+import argparse
 
 # Ensure project root is on sys.path
 ROOT = os.path.dirname(os.path.dirname(__file__))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-from app import create_app, db
-from models import Feedback
-from services.feedback_classifier import FeedbackClassifier
+from app import create_app
+from services.classifier_registry import get_classifier
+from services.text_preprocessing import DEFAULT_DISK_CACHE_PATH
+from services.reclassifier import reclassify, count_stale, CHUNK_SIZE
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Phân loại lại các phản ánh có nội dung hoặc phiên bản mô hình thay đổi")
+    parser.add_argument('--full', action='store_true', help="phân loại lại toàn bộ, kể cả dòng chưa thay đổi")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="số dòng mỗi lần commit")
+    parser.add_argument('--limit', type=int, help="dừng sau số dòng này (lần sau chạy tiếp từ checkpoint)")
+    args = parser.parse_args()
+
     app = create_app()
     with app.app_context():
-        clf = FeedbackClassifier()
-        updated_kind = 0
-        updated_severity = 0
-        total = 0
-        for fb in Feedback.query.all():
-            total += 1
-            result = clf.classify(fb.title or '', fb.description or '')
-            # update kind if confidence is high enough
-            if result['confidence'] >= 0.7 and (fb.kind != result['label']):
-                old_kind = fb.kind
-                fb.kind = result['label']
-                updated_kind += 1
-                logging.info(f"Update kind ID {fb.id}: {old_kind} -> {fb.kind} ({result['confidence']:.0%})")
-            # update severity and confidence (no downgrade)
-            sev = result['severity']
-            sc = result['severity_confidence']
-            if fb.severity != sev or (fb.severity_confidence != sc):
-                old_sev = fb.severity
-                fb.severity = sev
-                fb.severity_confidence = sc
-                updated_severity += 1
-                logging.info(f"Update severity ID {fb.id}: {old_sev} -> {sev} ({sc:.0%})")
-            db.session.add(fb)
-            db.session.commit()
-        print(f"Checked {total} items; updated {updated_kind} kinds and {updated_severity} severities.")
+        clf = get_classifier()
+        # Các lần chạy lại dùng lại kết quả tách từ đã lưu trên đĩa
+        clf.enable_token_cache(os.environ.get('TOKEN_CACHE_PATH', DEFAULT_DISK_CACHE_PATH))
+        try:
+            if not args.full:
+                print(f"{count_stale(clf.model_version)} items need reclassification (model {clf.model_version}).")
+            stats = reclassify(clf, full=args.full, chunk_size=args.chunk_size, limit=args.limit)
+        finally:
+            clf.close_token_cache()
+        if stats['resumed_from']:
+            print(f"Resumed after ID {stats['resumed_from']}.")
+        print(f"Checked {stats['checked']} items; updated {stats['updated_kind']} kinds "
+              f"and {stats['updated_severity']} severities.")
+        if not stats['finished']:
+            print("Stopped at --limit; run again to continue from the checkpoint.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,174 @@
+"""Huấn luyện mô hình multi-head: một TfidfVectorizer dùng chung, ba head
+hồi quy logistic cho loại (phan_anh/khieu_nai), mức độ và danh mục phản ánh.
+
+Văn bản được tiền xử lý đúng như lúc chạy (TextPreprocessor, tiêu đề và mô tả
+tách riêng) nên FeedbackClassifier chỉ cần tách từ và vector hóa một lần cho
+cả ba dự đoán. Chỉ số giữ lại (ghi vào card của registry) được đo bằng một
+vectorizer chỉ học trên phần train; bundle xuất ra học lại vectorizer và các
+head trên toàn bộ dữ liệu. Kết quả được đăng ký vào
+models/registry/multihead_bundle (--promote để đưa ngay vào models/multihead_bundle).
+
+Dữ liệu danh mục: data/feedback_training/feedback_category.csv nếu có
+(title, description, category), cộng với nhãn yếu suy từ từ khóa trên các
+mẫu của feedback_data.csv / feedback_severity.csv.
+
+    python scripts/train_multihead_model.py [--promote]
+"""
+import os
+import sys
+import logging
+import argparse
+from collections import Counter
+
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, accuracy_score, f1_score
+
+# Ensure project root is on sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.model_bundle import export_heads
+from services.model_registry import ModelRegistry, data_fingerprint
+from services.text_preprocessing import TextPreprocessor
+from services.feedback_classifier import MULTIHEAD_BUNDLE
+
+DATA_DIR = os.path.join(ROOT, 'data', 'feedback_training')
+
+# Từ khóa gán nhãn yếu cho danh mục (khớp các lựa chọn của FeedbackForm.category)
+CATEGORY_SEEDS = {
+    'o_ga': ['ổ gà', 'ổ voi', 'đường hỏng', 'đường xuống cấp', 'mặt đường', 'đường sá', 'đường bị', 'sụt lún', 'lún'],
+    'rac_thai': ['rác', 'vệ sinh', 'ô nhiễm', 'mùi hôi', 'nước thải', 'chất thải', 'xả thải', 'khói'],
+    'mat_dien': ['mất điện', 'cúp điện', 'chập điện', 'điện lưới', 'cột điện', 'dây điện', 'đèn đường'],
+    'an_ninh': ['an ninh', 'trật tự', 'ma túy', 'trộm', 'cướp', 'đánh nhau', 'gây rối', 'đánh bạc', 'hành hung', 'tệ nạn'],
+}
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/training.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+
+
+def weak_category(title, description):
+    """Danh mục suy từ từ khóa; None nếu khớp nhiều danh mục (bỏ mẫu mơ hồ)"""
+    text = f"{title} {description}".lower()
+    hits = [cat for cat, seeds in CATEGORY_SEEDS.items() if any(s in text for s in seeds)]
+    if len(hits) > 1:
+        return None
+    return hits[0] if hits else 'khac'
+
+
+def load_datasets():
+    kind = pd.read_csv(os.path.join(DATA_DIR, 'feedback_data.csv'))
+    severity = pd.read_csv(os.path.join(DATA_DIR, 'feedback_severity.csv'))
+
+    texts = pd.concat([kind[['title', 'description']], severity[['title', 'description']]], ignore_index=True)
+    texts['category'] = [weak_category(t, d) for t, d in zip(texts['title'], texts['description'])]
+    category = texts.dropna(subset=['category'])
+    curated_path = os.path.join(DATA_DIR, 'feedback_category.csv')
+    if os.path.exists(curated_path):
+        category = pd.concat([category, pd.read_csv(curated_path)], ignore_index=True)
+
+    return {
+        'kind': (kind, 'label'),
+        'severity': (severity, 'severity'),
+        'category': (category, 'category'),
+    }
+
+
+def make_vectorizer():
+    return TfidfVectorizer(max_features=12000, ngram_range=(1, 3), sublinear_tf=True)
+
+
+def split_head(texts, y):
+    """Chia train/test cho một head; None nếu không đủ dữ liệu để giữ lại một phần"""
+    counts = Counter(y)
+    if len(y) < 20 or min(counts.values()) < 2:
+        logging.info(f"Chỉ có {len(y)} mẫu, bỏ qua đánh giá giữ lại")
+        return None
+    return train_test_split(texts, y, test_size=0.2, random_state=42, stratify=y)
+
+
+def held_out_metrics(texts, labels, params):
+    """Chỉ số trên tập giữ lại của từng head.
+
+    Vectorizer đánh giá chỉ học từ vựng/idf trên phần train (bỏ mọi văn bản
+    nằm trong tập test của bất kỳ head nào, vì các head dùng chung văn bản).
+    """
+    splits = {head: split_head(texts[head], labels[head]) for head in texts}
+    test_texts = {t for split in splits.values() if split for t in split[1]}
+    train_texts = {t for head in texts for t in (splits[head][0] if splits[head] else texts[head])}
+    vectorizer = make_vectorizer().fit(sorted(train_texts - test_texts))
+
+    metrics = {}
+    for head, split in splits.items():
+        if split is None:
+            metrics[head] = {}
+            continue
+        X_train, X_test, y_train, y_test = split
+        model = LogisticRegression(max_iter=1000, random_state=42, **params[head])
+        y_pred = model.fit(vectorizer.transform(X_train), y_train).predict(vectorizer.transform(X_test))
+        logging.info(f"Head '{head}':\n" + classification_report(y_test, y_pred, zero_division=0))
+        metrics[head] = {
+            'accuracy': round(float(accuracy_score(y_test, y_pred)), 4),
+            'macro_f1': round(float(f1_score(y_test, y_pred, average='macro', zero_division=0)), 4),
+        }
+    return metrics
+
+
+def train_multihead_model(promote=False):
+    preprocessor = TextPreprocessor()
+
+    def prepare(df):
+        return [f"{preprocessor.preprocess(str(t))} {preprocessor.preprocess(str(d))}"
+                for t, d in zip(df['title'], df['description'])]
+
+    datasets = load_datasets()
+    texts = {head: prepare(df) for head, (df, _) in datasets.items()}
+    labels = {head: list(df[label_col]) for head, (df, label_col) in datasets.items()}
+
+    params = {
+        'kind': {'C': 5.0, 'class_weight': 'balanced'},
+        'severity': {'C': 10.0, 'class_weight': 'balanced'},
+        'category': {'C': 5.0, 'class_weight': 'balanced'},
+    }
+    for head in texts:
+        logging.info(f"Head '{head}': {len(labels[head])} mẫu, phân bố {dict(Counter(labels[head]))}")
+    head_metrics = held_out_metrics(texts, labels, params)
+
+    # Bundle xuất ra: một từ vựng chung cho cả ba head, huấn luyện lại trên toàn bộ dữ liệu
+    vectorizer = make_vectorizer().fit(sorted(set(t for head_texts in texts.values() for t in head_texts)))
+    heads, metrics, info = {}, {}, {}
+    for head in texts:
+        model = LogisticRegression(max_iter=1000, random_state=42, **params[head])
+        heads[head] = model.fit(vectorizer.transform(texts[head]), labels[head])
+        metrics.update({f'{head}_{name}': value for name, value in head_metrics[head].items()})
+        # Bộ phân loại chỉ tin head mức độ khi đủ dòng và có chỉ số giữ lại (xem FeedbackClassifier)
+        info[head] = {'train_rows': len(labels[head]), 'metrics': head_metrics[head]}
+
+    registry = ModelRegistry()
+    version = registry.register(
+        MULTIHEAD_BUNDLE, lambda path: export_heads(vectorizer, heads, path, info),
+        metrics=metrics, source='train_multihead_model', params=params,
+        data_hash=data_fingerprint(os.path.join(DATA_DIR, name) for name in
+                                   ('feedback_data.csv', 'feedback_severity.csv', 'feedback_category.csv')),
+    )
+    if promote:
+        registry.promote(MULTIHEAD_BUNDLE, version)
+        logging.info(f"Đã lưu mô hình multi-head vào models/{MULTIHEAD_BUNDLE} (phiên bản {version})")
+    else:
+        logging.info(f"Đã đăng ký {MULTIHEAD_BUNDLE} phiên bản {version}; "
+                     f"đưa vào chạy bằng `flask models promote {MULTIHEAD_BUNDLE} {version}`")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Huấn luyện mô hình multi-head (loại, mức độ, danh mục)")
+    parser.add_argument('--promote', action='store_true', help="đưa phiên bản mới vào chạy ngay")
+    train_multihead_model(promote=parser.parse_args().promote)
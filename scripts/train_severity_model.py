@@ -2,10 +2,20 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report
-import pickle
+from sklearn.metrics import classification_report, accuracy_score, f1_score
 import os
+import sys
 import logging
+import argparse
+
+# Ensure project root is on sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.model_bundle import export_bundle
+from services.model_registry import ModelRegistry, data_fingerprint
+from services.feedback_classifier import SEVERITY_BUNDLE
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,7 +26,7 @@ logging.basicConfig(
     ]
 )
 
-def train_severity_model():
+def train_severity_model(promote=False):
     """Huấn luyện mô hình phân loại mức độ nghiêm trọng"""
     # Load dữ liệu
     data_path = 'data/feedback_training/feedback_severity.csv'
@@ -58,16 +68,28 @@ def train_severity_model():
     logging.info("\nKết quả đánh giá mô hình:")
     logging.info(classification_report(y_test, y_pred))
 
-    # Lưu mô hình
-    if not os.path.exists('models'):
-        os.makedirs('models')
-        
-    with open('models/severity_vectorizer.pkl', 'wb') as f:
-        pickle.dump(vectorizer, f)
-    with open('models/severity_classifier.pkl', 'wb') as f:
-        pickle.dump(model, f)
-        
-    logging.info("Đã lưu mô hình thành công")
+    metrics = {
+        'accuracy': round(float(accuracy_score(y_test, y_pred)), 4),
+        'macro_f1': round(float(f1_score(y_test, y_pred, average='macro')), 4),
+    }
+
+    # Xuất bundle mảng NumPy (nạp bằng mmap khi chạy, không cần pickle sklearn) vào registry;
+    # số dòng và chỉ số ghi vào meta.json để bộ phân loại quyết định có dùng tầng mô hình hay không
+    registry = ModelRegistry()
+    version = registry.register(
+        SEVERITY_BUNDLE,
+        lambda path: export_bundle(vectorizer, model, path, info={'train_rows': len(X_train), 'metrics': metrics}),
+        metrics=metrics,
+        data_hash=data_fingerprint([data_path]), source='train_severity_model', train_rows=len(X_train),
+    )
+    if promote:
+        registry.promote(SEVERITY_BUNDLE, version)
+        logging.info(f"Đã lưu mô hình thành công (phiên bản {version})")
+    else:
+        logging.info(f"Đã đăng ký {SEVERITY_BUNDLE} phiên bản {version}; "
+                     f"đưa vào chạy bằng `flask models promote {SEVERITY_BUNDLE} {version}`")
 
 if __name__ == '__main__':
-    train_severity_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Huấn luyện mô hình mức độ nghiêm trọng")
+    parser.add_argument('--promote', action='store_true', help="đưa phiên bản mới vào chạy ngay")
+    train_severity_model(promote=parser.parse_args().promote)
\ No newline at end of file
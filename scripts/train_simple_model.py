@@ -1,14 +1,94 @@
-import pandas as pd
+"""Huấn luyện mô hình TF-IDF + hồi quy logistic phân loại phản ánh/khiếu nại.
+
+Văn bản đã chuẩn hóa + tách từ được lưu theo từng dòng vào bộ nhớ đệm trên
+đĩa (instance/token_cache.db) nên các lần chạy sau chỉ tách từ các dòng mới;
+các dòng chưa có trong cache được tách song song trên nhiều lõi CPU.
+
+    python scripts/train_simple_model.py                  # cấu hình cố định
+    python scripts/train_simple_model.py --search grid    # dò lưới tham số
+    python scripts/train_simple_model.py --search random --n-iter 30 --cv 5 --jobs -1
+
+Dữ liệu được tăng cường (augment_text) sau khi chia: chỉ phần huấn luyện (và
+phần huấn luyện của từng fold) có thêm bản tăng cường, tập kiểm tra và fold
+kiểm định chỉ gồm các dòng gốc. Khi dò tham số, mỗi cấu hình được kiểm định
+chéo phân tầng trên tập huấn luyện (các cấu hình chạy song song); thời gian, bộ nhớ đỉnh (tracemalloc) và
+macro-F1/accuracy của từng cấu hình được ghi vào --report. Cấu hình tốt nhất
+được huấn luyện lại, đánh giá trên tập kiểm tra và đăng ký vào models/registry
+(chỉ số, hash dữ liệu, tham số); thêm --promote để đưa ngay vào chạy, không thì
+`flask models promote tfidf_bundle <phiên bản>` sau khi chạy shadow. Khi đã
+promote, tfidf_bundle thay head 'kind' của multihead_bundle; `flask models
+rollback tfidf_bundle` để quay lại.
+"""
+import os
 import re
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import platform
+import resource
+import tracemalloc
 import unicodedata
-from underthesea import word_tokenize
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-import pickle
-import os
-import logging
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterGrid, ParameterSampler
+from sklearn.metrics import classification_report, accuracy_score, f1_score
+
+# Ensure project root is on sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from services.model_bundle import export_bundle
+from services.model_registry import ModelRegistry, data_fingerprint
+from services.feedback_classifier import TFIDF_BUNDLE
+from services.text_preprocessing import DiskTokenCache, DEFAULT_DISK_CACHE_PATH, get_word_tokenize
+
+DATA_PATH = os.path.join(ROOT, 'data', 'feedback_training', 'feedback_data.csv')
+DEFAULT_REPORT = os.path.join(ROOT, 'logs', 'train_simple_search.json')
+
+# Stopwords tiếng Việt phổ biến (dựng một lần, không dựng lại cho từng dòng)
+STOPWORDS = frozenset([
+    'và', 'là', 'của', 'cho', 'với', 'được', 'bị', 'nhưng', 'rằng', 'thì', 'mà', 'có', 'đã', 'này', 'ở',
+    'trong', 'khi', 'đến', 'từ', 'bằng', 'về', 'sau', 'trước', 'nên', 'hay', 'cũng', 'để', 'nữa', 'đó',
+    'nào', 'ra', 'vào', 'lúc', 'đi', 'lại', 'vẫn', 'thế', 'thôi', 'thật', 'chỉ', 'rất', 'rồi', 'vậy', 'vì',
+    'do', 'giữa', 'giúp', 'tại', 'trên', 'dưới', 'qua', 'theo', 'như', 'nhiều', 'ít', 'mỗi', 'mọi', 'cùng',
+    'đồng', 'các', 'những', 'ai', 'gì', 'sao', 'đâu', 'đây', 'đấy', 'kia', 'kìa', 'hết', 'toàn', 'hơn',
+    'kém', 'đủ', 'chưa', 'đang', 'sẽ', 'phải', 'cần', 'muốn', 'không', 'chẳng', 'chắc', 'hoặc', 'bởi',
+])
+# Đổi khi cách chuẩn hóa hoặc danh sách stopwords thay đổi để cache tự mất hiệu lực
+NORMALIZE_VERSION = hashlib.sha1(('1\x00' + ' '.join(sorted(STOPWORDS))).encode('utf-8')).hexdigest()[:8]
+# Dưới ngưỡng này tách từ tuần tự (khởi động tiến trình con tốn hơn phần việc)
+PARALLEL_MIN_ROWS = 1000
+TOKENIZE_CHUNK = 500
+
+# Cấu hình dùng khi không dò tham số
+DEFAULT_PARAMS = {
+    'tfidf__max_features': 12000,     # Tăng số lượng đặc trưng
+    'tfidf__ngram_range': (1, 4),     # Thêm ngram 4 để bắt cụm từ dài
+    'tfidf__max_df': 0.90,
+    'tfidf__sublinear_tf': True,
+    'clf__C': 5.0,
+    'clf__class_weight': 'balanced',
+}
+
+SEARCH_SPACE = {
+    'tfidf__max_features': [5000, 12000, None],
+    'tfidf__ngram_range': [(1, 2), (1, 3), (1, 4)],
+    'tfidf__max_df': [0.90, 1.0],
+    'tfidf__sublinear_tf': [True, False],
+    'clf__C': [1.0, 5.0, 20.0],
+    'clf__class_weight': ['balanced', None],
+}
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,126 +99,238 @@ logging.basicConfig(
     ]
 )
 
-def train_simple_model():
-    # Tăng dữ liệu đơn giản
-    def augment_text(text):
-        # Hoán vị từ
-        words = text.split()
-        if len(words) > 4:
-            import random
-            random.shuffle(words)
-            text_aug = ' '.join(words)
-        else:
-            text_aug = text
-        # Thêm từ đồng nghĩa đơn giản cho một số từ phổ biến
-        synonyms = {
-            'phản ánh': ['góp ý', 'kiến nghị', 'báo cáo'],
-            'khiếu nại': ['tố cáo', 'khiếu kiện', 'tố giác'],
-            'rác': ['rác thải', 'chất thải'],
-            'hỏng': ['hư', 'hư hỏng', 'xuống cấp'],
-            'chậm': ['trễ', 'kéo dài'],
-            'điện': ['mất điện', 'thiếu điện'],
-            'nước': ['nước sạch', 'nước sinh hoạt']
-        }
-        for k, syns in synonyms.items():
-            if k in text_aug:
-                text_aug += ' ' + ' '.join(syns)
-        return text_aug
 
+def normalize_text(text):
+    """Chuẩn hóa, tách từ và bỏ stopwords"""
+    text = unicodedata.normalize('NFC', str(text))
+    text = text.lower()
+    text = re.sub(r'[\W_]+', ' ', text)
+    text = ' '.join(get_word_tokenize()(text))
+    return ' '.join(w for w in text.split() if w not in STOPWORDS)
+
+
+def _normalize_chunk(texts):
+    return [normalize_text(t) for t in texts]
+
+
+def tokenize_corpus(texts, cache_path=DEFAULT_DISK_CACHE_PATH, jobs=-1):
+    """normalize_text cho cả corpus; chỉ tách từ các dòng chưa có trong cache trên đĩa"""
+    start = time.perf_counter()
+    cache = DiskTokenCache(cache_path)
+    keys = [hashlib.sha1(f"train_simple:{NORMALIZE_VERSION}\x00{t}".encode('utf-8')).hexdigest() for t in texts]
+    out = [cache.get(k) for k in keys]
+    missing = [i for i, v in enumerate(out) if v is None]
+    n_jobs = effective_n_jobs(jobs) if len(missing) >= PARALLEL_MIN_ROWS else 1
+    if missing:
+        chunks = [missing[i:i + TOKENIZE_CHUNK] for i in range(0, len(missing), TOKENIZE_CHUNK)]
+        results = Parallel(n_jobs=n_jobs)(delayed(_normalize_chunk)([texts[i] for i in chunk]) for chunk in chunks)
+        for chunk, normalized in zip(chunks, results):
+            for i, value in zip(chunk, normalized):
+                out[i] = value
+                cache.set(keys[i], value)
+    cache.close()
+    stats = {
+        'rows': len(texts),
+        'cached': len(texts) - len(missing),
+        'tokenized': len(missing),
+        'jobs': n_jobs,
+        'wall_s': round(time.perf_counter() - start, 3),
+    }
+    logging.info(f"Tách từ: {stats['tokenized']} dòng mới, {stats['cached']} dòng từ cache "
+                 f"({stats['wall_s']} s, {n_jobs} tiến trình)")
+    return out, stats
+
+
+def augment_text(text):
+    """Tăng dữ liệu đơn giản: hoán vị từ và thêm từ đồng nghĩa"""
+    words = text.split()
+    if len(words) > 4:
+        random.shuffle(words)
+        text_aug = ' '.join(words)
+    else:
+        text_aug = text
+    # Thêm từ đồng nghĩa đơn giản cho một số từ phổ biến
+    synonyms = {
+        'phản ánh': ['góp ý', 'kiến nghị', 'báo cáo'],
+        'khiếu nại': ['tố cáo', 'khiếu kiện', 'tố giác'],
+        'rác': ['rác thải', 'chất thải'],
+        'hỏng': ['hư', 'hư hỏng', 'xuống cấp'],
+        'chậm': ['trễ', 'kéo dài'],
+        'điện': ['mất điện', 'thiếu điện'],
+        'nước': ['nước sạch', 'nước sinh hoạt']
+    }
+    for k, syns in synonyms.items():
+        if k in text_aug:
+            text_aug += ' ' + ' '.join(syns)
+    return text_aug
+
+
+def augment(texts, labels):
+    """Các dòng gốc cộng thêm một bản tăng cường cho mỗi dòng (nếu khác bản gốc)"""
+    aug_texts, aug_labels = [], []
+    for text, label in zip(texts, labels):
+        aug_text = augment_text(text)
+        if aug_text != text:
+            aug_texts.append(aug_text)
+            aug_labels.append(label)
+    if not aug_texts:
+        return texts, labels
+    return (np.concatenate([texts, np.array(aug_texts, dtype=object)]),
+            np.concatenate([labels, np.array(aug_labels, dtype=object)]))
+
+
+def make_pipeline(params=None):
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer(strip_accents=None, min_df=1)),
+        ('clf', LogisticRegression(max_iter=1000, solver='lbfgs', random_state=42)),
+    ])
+    return pipeline.set_params(**(params or DEFAULT_PARAMS))
+
+
+def _json_params(params):
+    return {k: list(v) if isinstance(v, tuple) else v for k, v in params.items()}
+
+
+def evaluate_config(params, texts, labels, cv):
+    """Kiểm định chéo một cấu hình; trả về thời gian, bộ nhớ đỉnh và điểm trung bình.
+
+    texts/labels là các dòng gốc; chỉ phần huấn luyện của mỗi fold được tăng cường.
+    """
+    start = time.perf_counter()
+    f1s, accs = [], []
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(texts, labels))
+    for train_idx, test_idx in folds:
+        model = make_pipeline(params).fit(*augment(texts[train_idx], labels[train_idx]))
+        pred = model.predict(texts[test_idx])
+        f1s.append(f1_score(labels[test_idx], pred, average='macro'))
+        accs.append(accuracy_score(labels[test_idx], pred))
+    wall = time.perf_counter() - start
+
+    # Đo bộ nhớ bằng một lần huấn luyện riêng (tracemalloc làm chậm ~3-4 lần nên không đo cùng lúc)
+    tracemalloc.start()
+    make_pipeline(params).fit(*augment(texts[folds[0][0]], labels[folds[0][0]]))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'params': params,
+        'wall_s': round(wall, 3),
+        'peak_mb': round(peak / 2 ** 20, 1),
+        'macro_f1': round(float(np.mean(f1s)), 4),
+        'macro_f1_std': round(float(np.std(f1s)), 4),
+        'accuracy': round(float(np.mean(accs)), 4),
+    }
+
+
+def search_params(texts, labels, mode='grid', n_iter=20, cv=5, jobs=-1):
+    """Đánh giá song song các cấu hình trong SEARCH_SPACE; kết quả xếp theo macro-F1"""
+    if mode == 'grid':
+        candidates = list(ParameterGrid(SEARCH_SPACE))
+    else:
+        candidates = list(ParameterSampler(SEARCH_SPACE, n_iter=n_iter, random_state=42))
+    logging.info(f"Dò {len(candidates)} cấu hình × {cv} fold trên {effective_n_jobs(jobs)} tiến trình")
+    start = time.perf_counter()
+    results = Parallel(n_jobs=jobs)(delayed(evaluate_config)(p, texts, labels, cv) for p in candidates)
+    wall = time.perf_counter() - start
+    results.sort(key=lambda r: (-r['macro_f1'], r['wall_s']))
+    for r in results[:5]:
+        logging.info(f"macro-F1 {r['macro_f1']:.4f} ±{r['macro_f1_std']:.4f}  acc {r['accuracy']:.4f}  "
+                     f"{r['wall_s']:.2f} s  {r['peak_mb']:.1f} MB  {_json_params(r['params'])}")
+    return results, wall
+
+
+def train_simple_model(search=None, n_iter=20, cv=5, jobs=-1, report=DEFAULT_REPORT,
+                       cache_path=DEFAULT_DISK_CACHE_PATH, promote=False):
     """Train a simple TF-IDF + Logistic Regression model"""
     # Load data
-    data_path = 'data/feedback_training/feedback_data.csv'
-    if not os.path.exists(data_path):
-        logging.error(f"Không tìm thấy file dữ liệu tại {data_path}")
+    if not os.path.exists(DATA_PATH):
+        logging.error(f"Không tìm thấy file dữ liệu tại {DATA_PATH}")
         return
-        
-    df = pd.read_csv(data_path)
+
+    df = pd.read_csv(DATA_PATH)
     logging.info(f"Đã tải {len(df)} mẫu dữ liệu")
-    
-    # Chuẩn hóa dữ liệu đầu vào
-    def normalize_text(text):
-        text = str(text)
-        text = unicodedata.normalize('NFC', text)
-        text = text.lower()
-        text = re.sub(r'[\W_]+', ' ', text)
-        text = word_tokenize(text)
-        text = ' '.join(text)
-        # Loại bỏ stopwords tiếng Việt phổ biến
-        stopwords = set(['và', 'là', 'của', 'cho', 'với', 'được', 'bị', 'nhưng', 'rằng', 'thì', 'mà', 'có', 'đã', 'này', 'ở', 'trong', 'khi', 'đến', 'từ', 'bằng', 'về', 'sau', 'trước', 'nên', 'hay', 'cũng', 'để', 'nữa', 'đó', 'nào', 'ra', 'vào', 'lúc', 'đi', 'lại', 'vẫn', 'thế', 'thôi', 'thật', 'chỉ', 'rất', 'rồi', 'vậy', 'vì', 'do', 'giữa', 'giúp', 'tại', 'trên', 'dưới', 'qua', 'theo', 'như', 'nhiều', 'ít', 'mỗi', 'mọi', 'cùng', 'đồng', 'các', 'những', 'ai', 'gì', 'sao', 'đâu', 'đây', 'đấy', 'đó', 'kia', 'kìa', 'hết', 'toàn', 'hơn', 'kém', 'đủ', 'chưa', 'đã', 'đang', 'sẽ', 'phải', 'cần', 'muốn', 'có', 'không', 'chẳng', 'chưa', 'chắc', 'được', 'bị', 'phải', 'thì', 'là', 'mà', 'nhưng', 'hoặc', 'và', 'hay', 'cũng', 'nên', 'vậy', 'vì', 'do', 'tại', 'bởi', 'như', 'để', 'với', 'của', 'cho', 'về', 'trong', 'trên', 'dưới', 'giữa', 'qua', 'theo', 'từ', 'đến', 'ra', 'vào', 'lúc', 'khi', 'sau', 'trước', 'này', 'kia', 'kìa', 'đây', 'đấy', 'đó', 'hết', 'toàn', 'hơn', 'kém', 'đủ', 'chưa', 'chắc', 'được', 'bị', 'phải', 'thì', 'là', 'mà', 'nhưng', 'hoặc', 'và', 'hay', 'cũng', 'nên', 'vậy', 'vì', 'do', 'tại', 'bởi', 'như', 'để', 'với', 'của', 'cho', 'về', 'trong', 'trên', 'dưới', 'giữa', 'qua', 'theo', 'từ', 'đến', 'ra', 'vào', 'lúc', 'khi', 'sau', 'trước', 'này', 'kia', 'kìa', 'đây', 'đấy', 'đó', 'hết', 'toàn', 'hơn', 'kém', 'đủ', 'chưa', 'chắc'])
-        text = ' '.join([w for w in text.split() if w not in stopwords])
-        return text
-
-    df['text'] = (df['title'] + ' ' + df['description']).apply(normalize_text)
-    # Tăng dữ liệu: mỗi mẫu gốc sẽ có thêm 1 bản tăng cường
-    aug_rows = []
-    for idx, row in df.iterrows():
-        aug_text = augment_text(row['text'])
-        if aug_text != row['text']:
-            aug_rows.append({'text': aug_text, 'label': row['label']})
-    if aug_rows:
-        df = pd.concat([df, pd.DataFrame(aug_rows)], ignore_index=True)
-    
-    # Split data
+
+    # Chuẩn hóa dữ liệu đầu vào (dùng lại kết quả tách từ của các lần chạy trước)
+    df['text'], tokenize_stats = tokenize_corpus(list(df['title'] + ' ' + df['description']), cache_path, jobs)
+
+    # Chia trên các dòng gốc trước khi tăng cường để bản tăng cường không lọt vào tập kiểm tra
     X_train, X_test, y_train, y_test = train_test_split(
-        df['text'], df['label'], 
-        test_size=0.2, 
+        df['text'].to_numpy(dtype=object), df['label'].to_numpy(dtype=object),
+        test_size=0.2,
         random_state=42,
         stratify=df['label']
     )
-    
-    # Create pipeline
-    vectorizer = TfidfVectorizer(
-        max_features=12000,           # Tăng số lượng đặc trưng
-        ngram_range=(1, 4),           # Thêm ngram 4 để bắt cụm từ dài
-        strip_accents=None,
-        min_df=1,
-        max_df=0.90,
-        sublinear_tf=True
-    )
 
-    classifier = LogisticRegression(
-        C=5.0,                        # Tăng regularization mạnh hơn
-        class_weight='balanced',
-        max_iter=1000,                 # Tăng số vòng lặp
-        solver='lbfgs',
-        random_state=42
-    )
-    
-    # Train
-    logging.info("Bắt đầu huấn luyện mô hình...")
-    
-    # Transform text to TF-IDF features
-    X_train_tfidf = vectorizer.fit_transform(X_train)
-    X_test_tfidf = vectorizer.transform(X_test)
-    
-    # Train classifier
-    classifier.fit(X_train_tfidf, y_train)
-    
-    # Evaluate
-    y_pred = classifier.predict(X_test_tfidf)
+    results, search_wall = [], None
+    params = DEFAULT_PARAMS
+    if search:
+        cv = min(cv, int(pd.Series(y_train).value_counts().min()))
+        results, search_wall = search_params(X_train, y_train, search, n_iter, cv, jobs)
+        params = results[0]['params']
+
+    # Train: mỗi mẫu huấn luyện gốc có thêm 1 bản tăng cường
+    X_fit, y_fit = augment(X_train, y_train)
+    logging.info(f"Bắt đầu huấn luyện mô hình với {_json_params(params)} "
+                 f"({len(X_train)} dòng gốc + {len(X_fit) - len(X_train)} dòng tăng cường)...")
+    model = make_pipeline(params).fit(X_fit, y_fit)
+    vectorizer, classifier = model.named_steps['tfidf'], model.named_steps['clf']
+
+    # Evaluate: chỉ số của card tính trên các dòng gốc giữ lại, không có bản tăng cường
+    y_pred = model.predict(X_test)
     logging.info("\nKết quả đánh giá mô hình:")
     logging.info("\n" + classification_report(y_test, y_pred))
-    
+    metrics = {
+        'accuracy': round(float(accuracy_score(y_test, y_pred)), 4),
+        'macro_f1': round(float(f1_score(y_test, y_pred, average='macro')), 4),
+    }
+
+    if search and report:
+        os.makedirs(os.path.dirname(os.path.abspath(report)), exist_ok=True)
+        with open(report, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'jobs': effective_n_jobs(jobs),
+                'search': search,
+                'cv': cv,
+                'train_rows': len(X_train),
+                'augmented_rows': len(X_fit) - len(X_train),
+                'test_rows': len(X_test),
+                'tokenize': tokenize_stats,
+                'search_wall_s': round(search_wall, 3),
+                'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'test': metrics,
+                'results': [dict(r, params=_json_params(r['params'])) for r in results],
+            }, f, ensure_ascii=False, indent=2)
+        logging.info(f"Đã ghi kết quả dò tham số vào {report}")
+
     # Save model and vectorizer
-    os.makedirs('models', exist_ok=True)
-    with open('models/vectorizer.pkl', 'wb') as f:
-        pickle.dump(vectorizer, f)
-    with open('models/classifier.pkl', 'wb') as f:
-        pickle.dump(classifier, f)
-    
-    logging.info("Đã lưu mô hình vào thư mục models/")
-    
+    # Xuất bundle mảng NumPy (nạp bằng mmap khi chạy, không cần pickle sklearn) vào registry
+    registry = ModelRegistry()
+    version = registry.register(
+        TFIDF_BUNDLE, lambda path: export_bundle(vectorizer, classifier, path),
+        metrics=metrics, data_hash=data_fingerprint([DATA_PATH]), source='train_simple_model',
+        params=_json_params(params), train_rows=len(X_train), augmented_rows=len(X_fit) - len(X_train),
+        test_rows=len(X_test),
+    )
+    if promote:
+        registry.promote(TFIDF_BUNDLE, version)
+        logging.info(f"Đã lưu mô hình vào models/{TFIDF_BUNDLE} (phiên bản {version})")
+    else:
+        logging.info(f"Đã đăng ký {TFIDF_BUNDLE} phiên bản {version}; "
+                     f"đưa vào chạy bằng `flask models promote {TFIDF_BUNDLE} {version}`")
+
     # Test some predictions
     test_texts = [
         "Đường hư hỏng nặng cần sửa chữa",
         "Khiếu nại về việc cấp giấy chậm trễ",
         "Rác thải không được thu gom đúng giờ"
     ]
-    
+
     X_test = vectorizer.transform(test_texts)
     predictions = classifier.predict(X_test)
     probabilities = classifier.predict_proba(X_test)
-    
+
     logging.info("\nKiểm tra một số dự đoán:")
     for text, pred, prob in zip(test_texts, predictions, probabilities):
         confidence = max(prob)
@@ -146,5 +338,20 @@ def train_simple_model():
         logging.info(f"Dự đoán: {pred}")
         logging.info(f"Độ tin cậy: {confidence:.2f}")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Huấn luyện mô hình TF-IDF phân loại phản ánh/khiếu nại")
+    parser.add_argument('--search', choices=('grid', 'random'), help="dò tham số bằng kiểm định chéo")
+    parser.add_argument('--n-iter', type=int, default=20, help="số cấu hình thử với --search random")
+    parser.add_argument('--cv', type=int, default=5, help="số fold kiểm định chéo")
+    parser.add_argument('--jobs', type=int, default=-1, help="số tiến trình song song (-1: mọi lõi CPU)")
+    parser.add_argument('--report', default=DEFAULT_REPORT, help="file JSON ghi kết quả từng cấu hình")
+    parser.add_argument('--token-cache', default=os.environ.get('TOKEN_CACHE_PATH', DEFAULT_DISK_CACHE_PATH))
+    parser.add_argument('--promote', action='store_true', help="đưa phiên bản mới vào chạy ngay")
+    args = parser.parse_args(argv)
+    train_simple_model(search=args.search, n_iter=args.n_iter, cv=args.cv, jobs=args.jobs,
+                       report=args.report, cache_path=args.token_cache, promote=args.promote)
+
+
 if __name__ == '__main__':
-    train_simple_model()
\ No newline at end of file
+    main()
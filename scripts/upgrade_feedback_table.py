@@ -13,12 +13,13 @@ def upgrade():
     
     # Phân loại lại tất cả feedback chưa có mức độ nghiêm trọng
     from models import Feedback
-    from services.feedback_classifier import FeedbackClassifier
+    from services.classifier_registry import get_classifier
     
-    classifier = FeedbackClassifier()
+    classifier = get_classifier()
     count = 0
-    for fb in Feedback.query.filter(Feedback.severity == None).all():
-        result = classifier.classify(fb.title or '', fb.description or '')
+    feedbacks = Feedback.query.filter(Feedback.severity == None).all()
+    results = classifier.classify_many((fb.title, fb.description) for fb in feedbacks)
+    for fb, result in zip(feedbacks, results):
         fb.severity = result['severity']
         fb.severity_confidence = result['severity_confidence']
         count += 1
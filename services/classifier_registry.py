@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+import logging
+from typing import Optional, Tuple
+
+from services.feedback_classifier import FeedbackClassifier, MODEL_DIR, MODEL_FILES
+
+
+class ClassifierRegistry:
+    """Giữ một FeedbackClassifier dùng chung cho toàn tiến trình.
+
+    Mô hình chỉ được nạp một lần cho mỗi worker. Khi các file trong models/
+    thay đổi (huấn luyện lại), request đầu tiên nhận ra thay đổi nạp bộ phân
+    loại mới ngay trong lượt gọi đó (đồng bộ, request này chờ nạp xong) rồi
+    hoán đổi nguyên tử; trong lúc đó các request khác vẫn dùng bản cũ.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, check_interval: float = 5.0):
+        self.model_dir = model_dir
+        # Khoảng thời gian (giây) tối thiểu giữa hai lần kiểm tra file mô hình
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._classifier: Optional[FeedbackClassifier] = None
+        self._signature: Optional[Tuple] = None
+        self._last_check = 0.0
+
+    def _model_signature(self) -> Tuple:
+        """Dấu vân tay (mtime, size) của các file mô hình"""
+        sig = []
+        for name in MODEL_FILES:
+            try:
+                st = os.stat(os.path.join(self.model_dir, name))
+                sig.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((name, None, None))
+        return tuple(sig)
+
+    def get(self) -> FeedbackClassifier:
+        """Trả về bộ phân loại hiện hành, nạp lại nếu mô hình trên đĩa đã đổi"""
+        clf = self._classifier
+        if clf is not None and time.monotonic() - self._last_check < self.check_interval:
+            return clf
+
+        # Đã có bộ phân loại và một luồng khác đang nạp lại: dùng tạm bản cũ
+        if not self._lock.acquire(blocking=clf is None):
+            return clf
+        try:
+            if self._classifier is not None and time.monotonic() - self._last_check < self.check_interval:
+                return self._classifier
+            self._last_check = time.monotonic()
+            signature = self._model_signature()
+            if self._classifier is None or signature != self._signature:
+                self._swap(signature)
+            return self._classifier
+        finally:
+            self._lock.release()
+
+    def _swap(self, signature: Tuple):
+        """Nạp bộ phân loại mới và thay thế bản cũ (gọi khi đang giữ khóa)"""
+        new_clf = FeedbackClassifier(model_dir=self.model_dir)
+        if self._classifier is not None and not new_clf.models_loaded:
+            # File có thể đang được ghi dở: giữ bản cũ, lần kiểm tra sau sẽ thử lại
+            logging.warning("Không nạp được mô hình mới, tiếp tục dùng mô hình hiện tại")
+            return
+        self._classifier = new_clf
+        self._signature = signature
+        logging.info("Đã nạp bộ phân loại phản ánh từ %s", self.model_dir)
+
+    def reload(self) -> FeedbackClassifier:
+        """Buộc nạp lại mô hình ngay lập tức"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._swap(self._model_signature())
+            return self._classifier
+
+
+_registry = ClassifierRegistry()
+
+
+def get_classifier() -> FeedbackClassifier:
+    """Bộ phân loại dùng chung của tiến trình hiện tại"""
+    return _registry.get()
+
+
+def reload_classifier() -> FeedbackClassifier:
+    return _registry.reload()
+
+
+def warm_up() -> FeedbackClassifier:
+    """Nạp sẵn mô hình và bộ tách từ trong tiến trình hiện tại.
+
+    Gọi ở tiến trình master của gunicorn (preload_app, xem gunicorn.conf.py)
+    để các worker fork ra dùng chung bộ phân loại đã nạp theo copy-on-write
+    thay vì mỗi worker tự nạp ở request đầu tiên.
+    """
+    clf = _registry.get()
+    clf.preprocessor.warm_up()
+    # Chạy thử một lượt để khởi tạo các nhánh nạp trễ còn lại (rules, TF-IDF, mức độ)
+    clf.classify('Khởi động bộ phân loại', 'Đường trong thôn bị hỏng', use_llm=False)
+    clf.preprocessor.clear()
+    clf.severity_stats.reset()
+    return clf
@@ -0,0 +1,147 @@
+"""Phân loại lại toàn bộ phản ánh bằng job chạy nền thay vì trong request.
+
+start_job() tạo một ClassifyJob (bảng classify_job) rồi chạy nó ở luồng nền
+của tiến trình web; mỗi chunk commit kết quả cùng tiến độ (processed/total,
+số dòng cập nhật, lỗi) nên trang quản trị chỉ cần đọc lại job để hiển thị và
+bất kỳ worker nào cũng trả lời được. Hủy bằng cách đặt cancel_requested;
+luồng nền dừng sau chunk đang chạy. Job 'running' không cập nhật quá
+ClassifyJob.LEASE_SECONDS (tiến trình bị khởi động lại) là job treo: hủy
+ngay được, hoặc chạy tiếp từ last_id ở lần start_job() sau (một UPDATE có
+điều kiện đảm bảo chỉ một worker nhận chạy tiếp).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app import db
+from models import ClassifyJob, Feedback
+
+CHUNK_SIZE = 100
+
+
+def active_job() -> Optional[ClassifyJob]:
+    return (ClassifyJob.query
+            .filter(ClassifyJob.status.in_(('pending', 'running')))
+            .order_by(ClassifyJob.id.desc())
+            .first())
+
+
+def start_job(app, user_id: Optional[int] = None, full: bool = False) -> ClassifyJob:
+    """Tạo job mới (hoặc trả về job đang chạy) và chạy ở luồng nền"""
+    from services.classifier_registry import get_classifier
+    from services.reclassifier import count_stale
+
+    job = active_job()
+    if job is not None and not job.is_stale:
+        return job
+    if job is None:
+        version = get_classifier().model_version
+        job = ClassifyJob(
+            status='pending',
+            full=full,
+            model_version=version,
+            total=Feedback.query.count() if full else count_stale(version),
+            created_by=user_id,
+        )
+        db.session.add(job)
+        db.session.commit()
+    elif not _claim_stale(job):
+        # Worker/request khác vừa nhận chạy tiếp job này
+        return job
+    else:
+        logging.info(f"Chạy tiếp job phân loại {job.id} từ ID {job.last_id}")
+
+    thread = threading.Thread(target=_run_in_app, args=(app, job.id), name=f'classify-job-{job.id}', daemon=True)
+    thread.start()
+    return job
+
+
+def _claim_stale(job: ClassifyJob) -> bool:
+    """Nhận chạy tiếp job treo bằng một UPDATE có điều kiện: chỉ một worker/request thắng"""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=ClassifyJob.LEASE_SECONDS)
+    claimed = db.session.execute(
+        db.update(ClassifyJob)
+        .where(ClassifyJob.id == job.id,
+               ClassifyJob.status.in_(('pending', 'running')),
+               db.or_(ClassifyJob.updated_at.is_(None), ClassifyJob.updated_at < cutoff))
+        .values(status='pending', updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    db.session.refresh(job)
+    return claimed == 1
+
+
+def cancel_job(job: ClassifyJob) -> ClassifyJob:
+    """Yêu cầu dừng; job chưa bắt đầu hoặc treo (không còn luồng nền) được hủy ngay"""
+    if job.is_active:
+        job.cancel_requested = True
+        if job.status == 'pending' or job.is_stale:
+            job.status = 'cancelled'
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
+
+
+def _run_in_app(app, job_id: int):
+    with app.app_context():
+        try:
+            run_job(job_id)
+        finally:
+            db.session.remove()
+
+
+def run_job(job_id: int, classifier=None, chunk_size: int = CHUNK_SIZE) -> ClassifyJob:
+    """Chạy job trong ngữ cảnh ứng dụng hiện tại cho đến khi xong, bị hủy hoặc lỗi"""
+    from services.reclassifier import apply_result, stale_filter
+
+    job = db.session.get(ClassifyJob, job_id)
+    if job is None or not job.is_active:
+        return job
+    if classifier is None:
+        from services.classifier_registry import get_classifier
+        classifier = get_classifier()
+    job.status = 'running'
+    job.started_at = job.started_at or datetime.utcnow()
+    db.session.commit()
+
+    query = Feedback.query if job.full else Feedback.query.filter(stale_filter(job.model_version))
+    try:
+        while True:
+            if job.cancel_requested:
+                job.status = 'cancelled'
+                break
+            chunk = query.filter(Feedback.id > (job.last_id or 0)).order_by(Feedback.id).limit(chunk_size).all()
+            if not chunk:
+                job.status = 'done'
+                break
+            first_id, last_id = chunk[0].id, chunk[-1].id
+            stats = {'updated_kind': 0, 'updated_severity': 0}
+            try:
+                results = classifier.classify_many(((fb.title, fb.description) for fb in chunk), use_llm=False)
+                for fb, result in zip(chunk, results):
+                    apply_result(fb, result, stats)
+            except Exception as e:
+                # Bỏ qua chunk lỗi, ghi nhận rồi chạy tiếp các chunk sau
+                db.session.rollback()
+                logging.error(f"Job phân loại {job_id}: lỗi ở các ID {first_id}-{last_id}: {e}")
+                job.errors = (job.errors or 0) + len(chunk)
+                job.last_error = str(e)[:500]
+                stats = {'updated_kind': 0, 'updated_severity': 0}
+            job.last_id = last_id
+            job.processed = (job.processed or 0) + len(chunk)
+            job.updated_kind = (job.updated_kind or 0) + stats['updated_kind']
+            job.updated_severity = (job.updated_severity or 0) + stats['updated_severity']
+            job.total = max(job.total or 0, job.processed)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Job phân loại {job_id} thất bại: {e}")
+        job = db.session.get(ClassifyJob, job_id)
+        job.status = 'failed'
+        job.last_error = str(e)[:500]
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
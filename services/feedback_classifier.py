@@ -1,71 +1,255 @@
-import re
 import json
 import os
-from typing import Tuple, List, Dict
+import time
+import hashlib
+import threading
+from typing import Tuple, List, Dict, Iterable, Optional
 import logging
-from underthesea import word_tokenize
 import unicodedata
+from services.keyword_matcher import KeywordMatcher
+from services.text_preprocessing import TextPreprocessor, DiskTokenCache
+from services.model_bundle import ModelBundle, META_FILE
+
+# Thư mục chứa các mô hình đã huấn luyện (tính theo gốc dự án, không phụ thuộc cwd)
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
+# Bundle mảng NumPy (xem services/model_bundle.py), tạo bởi các script huấn luyện
+TFIDF_BUNDLE = 'tfidf_bundle'
+SEVERITY_BUNDLE = 'severity_bundle'
+# Một vectorizer dùng chung cho các head 'kind', 'severity', 'category'
+# (scripts/train_multihead_model.py). Nếu models/ có thêm bundle riêng của một
+# head (promote sau khi huấn luyện lại) thì bundle riêng đó được dùng cho head ấy
+MULTIHEAD_BUNDLE = 'multihead_bundle'
+MODEL_FILES = (
+    os.path.join(MULTIHEAD_BUNDLE, META_FILE),
+    os.path.join(TFIDF_BUNDLE, META_FILE),
+    os.path.join(SEVERITY_BUNDLE, META_FILE),
+)
+# Tăng khi thay đổi luật/từ khóa để các kết quả phân loại cũ được coi là lỗi thời
+RULES_VERSION = '2'
+# Các tầng của cascade mức độ nghiêm trọng; 'fallback' = không tầng nào đủ tin cậy
+SEVERITY_TIERS = ('model', 'rules', 'llm', 'fallback')
+
+
+class SeverityTierStats:
+    """Bộ đếm của cascade mức độ: số lần chạy, số lần kết thúc và thời gian theo từng tầng"""
 
-class FeedbackClassifier:
     def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._calls = {t: 0 for t in SEVERITY_TIERS}
+            self._hits = {t: 0 for t in SEVERITY_TIERS}
+            self._seconds = {t: 0.0 for t in SEVERITY_TIERS}
+
+    def record(self, tier: str, seconds: float, calls: int, hits: int):
+        with self._lock:
+            self._calls[tier] += calls
+            self._hits[tier] += hits
+            self._seconds[tier] += seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total = sum(self._hits.values())
+            return {
+                t: {
+                    'calls': self._calls[t],
+                    'hits': self._hits[t],
+                    'hit_rate': self._hits[t] / total if total else 0.0,
+                    'avg_ms': self._seconds[t] / self._calls[t] * 1000 if self._calls[t] else 0.0,
+                }
+                for t in SEVERITY_TIERS
+            }
+
+
+class FeedbackClassifier:
+    def __init__(self, model_dir: str = MODEL_DIR, tokenizer: Optional[str] = None,
+                 bundle_paths: Optional[Dict[str, str]] = None):
+        self.model_dir = model_dir
+        # Thay thư mục của một số bundle (ví dụ mô hình ứng viên trong models/registry khi chạy shadow)
+        self.bundle_paths = dict(bundle_paths or {})
         self._load_config()
+        if tokenizer:
+            self.config['tokenizer'] = tokenizer
+        self.preprocessor = TextPreprocessor(
+            tokenizer=self.config['tokenizer'],
+            max_entries=self.config['preprocess_cache_size']
+        )
         self._load_rules()
         self._setup_logging()
+        self.severity_stats = SeverityTierStats()
+        self._model_digests = {}
+        self._load_multihead_model()
         self._load_tfidf_model()
         self._load_severity_model()
+        self.severity_model_trusted = self._severity_model_trusted()
+        self.model_version = self._compute_model_version()
+
+    def bundle_path(self, name: str) -> str:
+        return self.bundle_paths.get(name) or os.path.join(self.model_dir, name)
+
+    def _has_bundle(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.bundle_path(name), META_FILE))
+
+    def _load_bundle(self, name: str) -> ModelBundle:
+        """Nạp bundle mô hình (mảng mmap), ghi nhận phiên bản để tính model_version"""
+        bundle = ModelBundle.load(self.bundle_path(name))
+        self._model_digests[name] = bundle.version
+        return bundle
+
+    def _compute_model_version(self) -> str:
+        """Phiên bản của bộ phân loại = luật + nội dung các file mô hình đã nạp"""
+        h = hashlib.sha1(f"rules:{RULES_VERSION}".encode('utf-8'))
+        if self.preprocessor.tokenizer != 'underthesea':
+            h.update(f"|tokenizer:{self.preprocessor.tokenizer}".encode('utf-8'))
+        for name in sorted(self._model_digests):
+            h.update(f"|{name}:{self._model_digests[name]}".encode('utf-8'))
+        return h.hexdigest()[:12]
         
+    def _load_multihead_model(self):
+        """Load shared-vectorizer multi-head model (optional)"""
+        self.multihead_model = None
+        if not self._has_bundle(MULTIHEAD_BUNDLE):
+            return
+        try:
+            bundle = self._load_bundle(MULTIHEAD_BUNDLE)
+            missing = {'kind', 'severity'} - set(bundle.heads)
+            if missing:
+                raise ValueError(f"thiếu head {sorted(missing)}")
+            self.multihead_model = bundle
+        except Exception as e:
+            logging.error(f"Error loading multi-head model: {str(e)}")
+            self._model_digests.pop(MULTIHEAD_BUNDLE, None)
+
     def _load_severity_model(self):
-        """Load severity classifier model"""
-        import pickle
+        """Load severity classifier model (thay head 'severity' của multi-head nếu có)"""
+        self.severity_model = None
+        if self.multihead_model is not None and not self._has_bundle(SEVERITY_BUNDLE):
+            return
         try:
-            with open('models/severity_vectorizer.pkl', 'rb') as f:
-                self.severity_vectorizer = pickle.load(f)
-            with open('models/severity_classifier.pkl', 'rb') as f:
-                self.severity_classifier = pickle.load(f)
+            self.severity_model = self._load_bundle(SEVERITY_BUNDLE)
         except Exception as e:
             logging.error(f"Error loading severity model: {str(e)}")
-            self.severity_vectorizer = None
-            self.severity_classifier = None
+            self.severity_model = None
+
     def _load_tfidf_model(self):
-        """Load TF-IDF + Logistic Regression model"""
-        import pickle
+        """Load TF-IDF + Logistic Regression model (thay head 'kind' của multi-head nếu có)"""
+        self.tfidf_model = None
+        if self.multihead_model is not None and not self._has_bundle(TFIDF_BUNDLE):
+            return
         try:
-            with open('models/vectorizer.pkl', 'rb') as f:
-                self.tfidf_vectorizer = pickle.load(f)
-            with open('models/classifier.pkl', 'rb') as f:
-                self.tfidf_classifier = pickle.load(f)
+            self.tfidf_model = self._load_bundle(TFIDF_BUNDLE)
         except Exception as e:
             logging.error(f"Error loading TF-IDF model: {str(e)}")
-            self.tfidf_vectorizer = None
-            self.tfidf_classifier = None
+            self.tfidf_model = None
+
+    def _severity_model_trusted(self) -> bool:
+        """Tầng mô hình của cascade mức độ chỉ chạy khi head mức độ có chỉ số trên tập giữ lại
+        và đủ dữ liệu huấn luyện; head học từ vài chục dòng dễ tự tin sai, lấn át luật từ khóa"""
+        if self.severity_model is not None:
+            info = self.severity_model.head_info()
+        elif self.multihead_model is not None:
+            info = self.multihead_model.head_info('severity')
+        else:
+            return False
+        trusted = bool(info.get('metrics')) and info.get('train_rows', 0) >= self.config['severity_model_min_rows']
+        if not trusted:
+            logging.info(f"Bỏ qua tầng mô hình mức độ: {info.get('train_rows', 0)} dòng huấn luyện, "
+                         f"chỉ số giữ lại {info.get('metrics') or 'không có'}")
+        return trusted
+
+    @property
+    def models_loaded(self) -> bool:
+        """True nếu cả mô hình phân loại lẫn mô hình mức độ đều nạp được"""
+        return ((self.tfidf_model or self.multihead_model) is not None
+                and (self.severity_model or self.multihead_model) is not None)
+
+    def _vectorize(self, items: List[Tuple[str, str]]):
+        """Ma trận TF-IDF dùng chung của mô hình multi-head (tách từ một lần, qua cache)"""
+        texts = []
+        for title, description in items:
+            p_title, p_desc = self._preprocess_parts(title, description)
+            texts.append(f"{p_title} {p_desc}")
+        return self.multihead_model.transform(texts)
+
     def _apply_tfidf_classification(self, title: str, description: str) -> Tuple[str, float, List[str]]:
         """Apply TF-IDF + Logistic Regression classification"""
-        if not self.tfidf_vectorizer or not self.tfidf_classifier:
-            return None
+        return self._apply_tfidf_batch([(title, description)])[0]
+
+    def _apply_tfidf_batch(self, items: List[Tuple[str, str]], X=None) -> List[Optional[Tuple[str, float, List[str]]]]:
+        """TF-IDF cho cả lô: một ma trận thưa và một lần predict_proba
+
+        X: ma trận đã vector hóa sẵn bằng mô hình multi-head (nếu có) cho đúng các dòng này;
+        bỏ qua khi head 'kind' đến từ bundle riêng.
+        """
+        bundle = self.tfidf_model or self.multihead_model
+        if bundle is None or not items:
+            return [None] * len(items)
         try:
-            text = f"{title} {description}"
-            text = self._preprocess_text(text)
-            X = self.tfidf_vectorizer.transform([text])
-            probs = self.tfidf_classifier.predict_proba(X)[0]
-            pred_label = self.tfidf_classifier.classes_[probs.argmax()]
-            confidence = probs.max()
-            # Extract top terms
-            important_terms = []
-            try:
-                feature_names = self.tfidf_vectorizer.get_feature_names_out()
-                top_indices = X.toarray()[0].argsort()[-3:][::-1]
-                important_terms = [feature_names[i] for i in top_indices if X.toarray()[0][i] > 0]
-            except:
-                pass
-            return pred_label, confidence, important_terms
+            if self.tfidf_model is None:
+                head = bundle.head('kind')
+                if X is None:
+                    X = self._vectorize(items)
+            else:
+                head = bundle.head()
+                texts = []
+                for title, description in items:
+                    p_title, p_desc = self._preprocess_parts(title, description)
+                    texts.append(f"{p_title} {p_desc}")
+                X = bundle.transform(texts)
+            probs = head.predict_proba(X)
+            best = probs.argmax(axis=1)
+            results = []
+            for row in range(X.shape[0]):
+                results.append((
+                    str(head.classes_[best[row]]),
+                    float(probs[row, best[row]]),
+                    self._top_terms(X, row, bundle)
+                ))
+            return results
         except Exception as e:
             logging.error(f"TF-IDF classification error: {str(e)}")
-            return None
+            return [None] * len(items)
+
+    @staticmethod
+    def _top_terms(X, row: int, bundle: ModelBundle, k: int = 3) -> List[str]:
+        """Các đặc trưng có trọng số TF-IDF lớn nhất của một dòng (đọc trực tiếp từ CSR)"""
+        start, end = X.indptr[row], X.indptr[row + 1]
+        if start == end:
+            return []
+        data = X.data[start:end]
+        indices = X.indices[start:end]
+        top = data.argsort()[::-1][:k]
+        return [bundle.feature_name(indices[i]) for i in top if data[i] > 0]
+
+    def suggest_category_many(self, items: List[Tuple[str, str]], X=None) -> List[Optional[Tuple[str, float]]]:
+        """Gợi ý danh mục (o_ga, rac_thai, ...) từ head 'category'; None nếu mô hình không có head này"""
+        if self.multihead_model is None or 'category' not in self.multihead_model.heads or not items:
+            return [None] * len(items)
+        if X is None:
+            X = self._vectorize(items)
+        head = self.multihead_model.head('category')
+        probs = head.predict_proba(X)
+        best = probs.argmax(axis=1)
+        return [(str(head.classes_[b]), float(probs[row, b])) for row, b in enumerate(best)]
+
+    def suggest_category(self, title: str, description: str) -> Optional[Tuple[str, float]]:
+        return self.suggest_category_many([(title or '', description or '')])[0]
 
     def _load_config(self):
         """Load classifier configuration"""
         self.config = {
-            'use_word_tokenize': True
+            # 'underthesea' (chính xác hơn) hoặc 'regex' (nhanh hơn nhiều)
+            'tokenizer': os.environ.get('FEEDBACK_TOKENIZER', 'underthesea'),
+            'preprocess_cache_size': int(os.environ.get('FEEDBACK_PREPROCESS_CACHE', 4096)),
+            # Ngưỡng tin cậy để dừng sớm ở từng tầng của cascade mức độ
+            'severity_model_threshold': float(os.environ.get('SEVERITY_MODEL_THRESHOLD', 0.7)),
+            'severity_rules_threshold': float(os.environ.get('SEVERITY_RULES_THRESHOLD', 0.7)),
+            # Số dòng huấn luyện tối thiểu của head mức độ để dùng tầng mô hình
+            'severity_model_min_rows': int(os.environ.get('SEVERITY_MODEL_MIN_ROWS', 100)),
+            # Chỉ điền sẵn danh mục trên form khi head 'category' đủ tin cậy
+            'category_suggest_threshold': float(os.environ.get('CATEGORY_SUGGEST_THRESHOLD', 0.6))
         }
 
     def _initialize_model(self):
@@ -102,6 +286,75 @@ class FeedbackClassifier:
             }
         }
 
+        # Các từ khóa và mẫu câu chỉ mức độ nghiêm trọng
+        self.severity_rules = {
+            # Mức độ nghiêm trọng cao
+            'high': [
+                # An toàn tính mạng / cháy nổ
+                'cháy', 'cháy nhà', 'cháy nổ', 'hỏa hoạn', 'bốc cháy', 'nổ',
+                'chập điện', 'điện giật', 'rò rỉ gas', 'rò rỉ khí gas', 'nổ bình gas',
+                'nổ nồi hơi', 'nổ đường ống', 'cháy rừng', 'cháy chợ', 'cháy kho',
+                'khói dày đặc', 'khói mù mịt', 'cần cứu hỏa', 'xe cứu hỏa',
+
+                # Tai nạn nghiêm trọng
+                'gây chết người', 'tử vong', 'tai nạn nghiêm trọng', 'nguy hiểm đến tính mạng',
+                'đe dọa tính mạng', 'thương tích nặng', 'nhập viện', 'cấp cứu',
+
+                # Thảm họa / thiên tai
+                'sập nhà', 'sập cầu', 'sạt lở', 'lũ quét', 'ngập lụt nghiêm trọng',
+                'bão lớn', 'động đất', 'lốc xoáy', 'giông lốc',
+
+                # Ô nhiễm/hóa chất nghiêm trọng
+                'ô nhiễm nghiêm trọng', 'độc hại', 'nguy hại', 'phát tán độc hại',
+                'gây bệnh', 'dịch bệnh', 'nhiễm độc', 'rò rỉ hóa chất', 'tràn hóa chất',
+
+                # An ninh trật tự nghiêm trọng
+                'ma túy', 'vũ khí', 'gây rối nghiêm trọng', 'băng nhóm', 'tội phạm',
+                'đe dọa', 'hành hung', 'bạo lực', 'trấn lột', 'cướp', 'cướp giật',
+                'đánh nhau', 'ẩu đả', 'xô xát', 'đâm chém', 'đánh hội đồng',
+
+                # Tham nhũng, tiêu cực lớn
+                'tham nhũng', 'tiêu cực', 'trục lợi', 'biển thủ',
+
+                # Khẩn cấp / ảnh hưởng rộng
+                'khẩn cấp', 'cần giải quyết ngay', 'nhiều người', 'cả khu vực', 'toàn xã',
+                'cộng đồng', 'ảnh hưởng nghiêm trọng', 'thiệt hại lớn'
+            ],
+            # Mức độ trung bình
+            'medium': [
+                # Cơ sở hạ tầng
+                'hư hỏng', 'xuống cấp', 'sửa chữa', 'nâng cấp', 'ổ gà', 'nứt', 'lún', 'trơn trượt',
+                'ngập nước', 'cống tắc', 'đèn hỏng',
+
+                # Vệ sinh môi trường
+                'rác thải', 'vệ sinh', 'mùi hôi', 'nước thải', 'đốt rác', 'khói',
+
+                # Trật tự đô thị
+                'lấn chiếm', 'xây dựng sai phép', 'họp chợ tự phát', 'đỗ xe sai quy định', 'buôn bán lấn chiếm',
+
+                # Dịch vụ công
+                'chậm trễ', 'thái độ không tốt', 'sai quy trình', 'thu phí sai', 'hồ sơ ách tắc',
+
+                # Tiện ích
+                'mất điện', 'mất nước', 'đường sá', 'internet chập chờn', 'thiếu đèn', 'đèn đường'
+            ]
+        }
+        self._build_matchers()
+
+    def _build_matchers(self):
+        """Biên dịch các bộ từ khóa thành automaton một lần cho mỗi bộ phân loại"""
+        rule_terms = []
+        for label in ['khieu_nai', 'phan_anh']:
+            weight = 4 if label == 'khieu_nai' else 3  # Ưu tiên từ khóa khiếu nại
+            rule_terms += [(p, (label, 'strong'), weight) for p in self.rules[label]['strong_patterns']]
+        for label in ['khieu_nai', 'phan_anh']:
+            weight = 2 if label == 'khieu_nai' else 1
+            rule_terms += [(k, (label, 'keyword'), weight) for k in self.rules[label]['keywords']]
+        self.rule_matcher = KeywordMatcher.from_terms(rule_terms)
+        self.severity_matcher = KeywordMatcher.from_terms(
+            [(p, level, 1) for level in ['high', 'medium'] for p in self.severity_rules[level]]
+        )
+
     def _setup_logging(self):
         """Setup logging for classification results"""
         logging.basicConfig(
@@ -111,23 +364,21 @@ class FeedbackClassifier:
         )
 
     def _preprocess_text(self, text: str) -> str:
-        """Preprocess input text"""
-        # Convert to lowercase and normalize spaces
-        text = text.lower().strip()
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters but keep Vietnamese diacritics
-        text = re.sub(r'[^\w\s\u0080-\u024F]', ' ', text)
-        
-        # Word tokenization for Vietnamese
-        if self.config['use_word_tokenize']:
-            try:
-                tokens = word_tokenize(text)
-                text = ' '.join(tokens)
-            except:
-                pass
-                
-        return text
+        """Preprocess input text (kết quả được lưu trong cache LRU theo nội dung)"""
+        return self.preprocessor.preprocess(text)
+
+    def _preprocess_parts(self, title: str, description: str) -> Tuple[str, str]:
+        """Tiêu đề và mô tả được xử lý riêng để bước luật và TF-IDF dùng chung cache"""
+        return self._preprocess_text(title), self._preprocess_text(description)
+
+    def enable_token_cache(self, path: str):
+        """Bật cache tách từ trên đĩa (cho các job chạy hàng loạt, chạy lại nhiều lần)"""
+        self.preprocessor.disk_cache = DiskTokenCache(path)
+
+    def close_token_cache(self):
+        if self.preprocessor.disk_cache:
+            self.preprocessor.disk_cache.close()
+            self.preprocessor.disk_cache = None
 
     def _apply_ml_classification(self, title: str, description: str) -> Tuple[str, float, List[str]]:
         """Deprecated ML classification method - kept for compatibility"""
@@ -146,41 +397,26 @@ class FeedbackClassifier:
     def _apply_rule_classification(self, title: str, description: str) -> Tuple[str, float, List[str]]:
         """Apply rule-based classification with enhanced keyword weighting"""
         # Cho tiêu đề trọng số cao hơn
-        text = f"{title} {title} {description}".lower()
-        text = self._preprocess_text(text)
-        text_noacc = self.strip_accents(text)
+        p_title, p_desc = self._preprocess_parts(title, description)
+        text = f"{p_title} {p_title} {p_desc}"
         
         scores = {'khieu_nai': 0, 'phan_anh': 0}
         matched_terms = []
 
-        # Nếu có từ khóa mạnh về khiếu nại trong tiêu đề, ưu tiên cao (hỗ trợ không dấu)
-        title_lower = title.lower()
-        title_noacc = self.strip_accents(title_lower)
-        for pattern in self.rules['khieu_nai']['strong_patterns']:
-            p_noacc = self.strip_accents(pattern)
-            if pattern in title_lower or p_noacc in title_noacc:
+        # Nếu có từ khóa mạnh về khiếu nại trong tiêu đề, ưu tiên cao (matcher hỗ trợ không dấu)
+        title_terms = set()
+        for m in self.rule_matcher.find_terms(title):
+            if m.group == ('khieu_nai', 'strong'):
                 scores['khieu_nai'] += 5  # Tăng trọng số cho từ khóa trong tiêu đề
-                matched_terms.append(f"{pattern} (tiêu đề)")
+                matched_terms.append(f"{m.term} (tiêu đề)")
+                title_terms.add(m.term)
 
-        # Check for strong patterns first (hỗ trợ không dấu)
-        for label in ['khieu_nai', 'phan_anh']:
-            for pattern in self.rules[label]['strong_patterns']:
-                p_noacc = self.strip_accents(pattern)
-                if pattern in text or p_noacc in text_noacc:
-                    weight = 4 if label == 'khieu_nai' else 3  # Ưu tiên từ khóa khiếu nại
-                    scores[label] += weight
-                    if pattern not in [term.split(' (')[0] for term in matched_terms]:
-                        matched_terms.append(pattern)
-
-        # Then check for regular keywords (hỗ trợ không dấu)
-        for label in ['khieu_nai', 'phan_anh']:
-            for keyword in self.rules[label]['keywords']:
-                k_noacc = self.strip_accents(keyword)
-                if keyword in text or k_noacc in text_noacc:
-                    weight = 2 if label == 'khieu_nai' else 1  # Ưu tiên từ khóa khiếu nại
-                    scores[label] += weight
-                    if keyword not in [term.split(' (')[0] for term in matched_terms]:
-                        matched_terms.append(keyword)
+        # Từ khóa mạnh rồi từ khóa thường, theo đúng thứ tự khai báo trong self.rules
+        for m in self.rule_matcher.find_terms(text):
+            label = m.group[0]
+            scores[label] += m.weight
+            if m.term not in title_terms and m.term not in matched_terms:
+                matched_terms.append(m.term)
 
         # Calculate confidence based on score difference
         total_score = sum(scores.values())
@@ -216,83 +452,118 @@ class FeedbackClassifier:
                 
         return important_terms[:3]
 
-    def _classify_severity(self, title: str, description: str) -> Tuple[str, float]:
-        """Phân loại mức độ nghiêm trọng của phản ánh/khiếu nại sử dụng OpenAI API hoặc fallback về quy tắc"""
-        # Thử phân tích bằng OpenAI API trước
-        from services.openai_service import OpenAIService
-        openai_service = OpenAIService()
-        
-        api_result = openai_service.analyze_feedback(title, description)
-        if api_result:
-            return api_result['severity'], api_result['confidence']
-            
-        # Nếu API thất bại, fallback về phân tích quy tắc
-        text = f"{title} {description}".lower()
-        text_noacc = self.strip_accents(text)
-        
-        # Các từ khóa và mẫu câu chỉ mức độ nghiêm trọng cao
-        high_patterns = [
-            # An toàn tính mạng / cháy nổ
-            'cháy', 'cháy nhà', 'cháy nổ', 'hỏa hoạn', 'bốc cháy', 'nổ',
-            'chập điện', 'điện giật', 'rò rỉ gas', 'rò rỉ khí gas', 'nổ bình gas',
-            'nổ nồi hơi', 'nổ đường ống', 'cháy rừng', 'cháy chợ', 'cháy kho',
-            'khói dày đặc', 'khói mù mịt', 'cần cứu hỏa', 'xe cứu hỏa',
-
-            # Tai nạn nghiêm trọng
-            'gây chết người', 'tử vong', 'tai nạn nghiêm trọng', 'nguy hiểm đến tính mạng',
-            'đe dọa tính mạng', 'thương tích nặng', 'nhập viện', 'cấp cứu',
-
-            # Thảm họa / thiên tai
-            'sập nhà', 'sập cầu', 'sạt lở', 'lũ quét', 'ngập lụt nghiêm trọng',
-            'bão lớn', 'động đất', 'lốc xoáy', 'giông lốc',
-
-            # Ô nhiễm/hóa chất nghiêm trọng
-            'ô nhiễm nghiêm trọng', 'độc hại', 'nguy hại', 'phát tán độc hại',
-            'gây bệnh', 'dịch bệnh', 'nhiễm độc', 'rò rỉ hóa chất', 'tràn hóa chất',
-
-            # An ninh trật tự nghiêm trọng
-            'ma túy', 'vũ khí', 'gây rối nghiêm trọng', 'băng nhóm', 'tội phạm',
-            'đe dọa', 'hành hung', 'bạo lực', 'trấn lột', 'cướp', 'cướp giật',
-            'đánh nhau', 'ẩu đả', 'xô xát', 'đâm chém', 'đánh hội đồng',
-
-            # Tham nhũng, tiêu cực lớn
-            'tham nhũng', 'tiêu cực', 'trục lợi', 'biển thủ',
-
-            # Khẩn cấp / ảnh hưởng rộng
-            'khẩn cấp', 'cần giải quyết ngay', 'nhiều người', 'cả khu vực', 'toàn xã',
-            'cộng đồng', 'ảnh hưởng nghiêm trọng', 'thiệt hại lớn'
-        ]
-
-        # Các từ khóa và mẫu câu chỉ mức độ trung bình
-        medium_patterns = [
-            # Cơ sở hạ tầng
-            'hư hỏng', 'xuống cấp', 'sửa chữa', 'nâng cấp', 'ổ gà', 'nứt', 'lún', 'trơn trượt',
-            'ngập nước', 'cống tắc', 'đèn hỏng',
-
-            # Vệ sinh môi trường
-            'rác thải', 'vệ sinh', 'mùi hôi', 'nước thải', 'đốt rác', 'khói',
-
-            # Trật tự đô thị
-            'lấn chiếm', 'xây dựng sai phép', 'họp chợ tự phát', 'đỗ xe sai quy định', 'buôn bán lấn chiếm',
-
-            # Dịch vụ công
-            'chậm trễ', 'thái độ không tốt', 'sai quy trình', 'thu phí sai', 'hồ sơ ách tắc',
-
-            # Tiện ích
-            'mất điện', 'mất nước', 'đường sá', 'internet chập chờn', 'thiếu đèn', 'đèn đường'
-        ]
-        
-        # Đếm số lượng pattern match (hỗ trợ không dấu)
-        def count_matches(patterns: List[str]) -> int:
-            c = 0
-            for p in patterns:
-                p_noacc = self.strip_accents(p)
-                if p in text or p_noacc in text_noacc:
-                    c += 1
-            return c
-        
-        high_matches = count_matches(high_patterns)
-        medium_matches = count_matches(medium_patterns)
+    def _classify_severity(self, title: str, description: str, use_llm: bool = True) -> Tuple[str, float]:
+        """Phân loại mức độ nghiêm trọng qua cascade mô hình cục bộ → luật → LLM"""
+        severity, confidence, _, _ = self._classify_severity_many([(title, description)], use_llm)[0]
+        return severity, confidence
+
+    def _apply_severity_model(self, items: List[Tuple[str, str]], X=None) -> List[Tuple[str, float]]:
+        """Mô hình mức độ đã huấn luyện (TF-IDF + LR) cho cả lô"""
+        if self.severity_model is not None:
+            # Bundle riêng được huấn luyện trên văn bản gốc (chưa tách từ)
+            head = self.severity_model.head()
+            X = self.severity_model.transform([f"{title} {description}" for title, description in items])
+        else:
+            head = self.multihead_model.head('severity')
+            if X is None:
+                X = self._vectorize(items)
+        probs = head.predict_proba(X)
+        best = probs.argmax(axis=1)
+        return [(str(head.classes_[b]), float(probs[row, b])) for row, b in enumerate(best)]
+
+    def _classify_severity_many(self, items: List[Tuple[str, str]], use_llm: bool = True,
+                                X=None) -> List[Tuple[str, float, str, bool]]:
+        """Cascade mức độ cho cả lô: (mức độ, độ tin cậy, tầng, còn mơ hồ)
+
+        Mỗi tầng chỉ xử lý các dòng mà tầng trước chưa đủ tin cậy. Nếu không
+        tầng cục bộ nào vượt ngưỡng và không gọi LLM (hoặc LLM lỗi), lấy kết quả
+        cục bộ tin cậy nhất và đánh dấu còn mơ hồ để hàng đợi LLM tinh chỉnh sau.
+        """
+        results = [None] * len(items)
+        best = [None] * len(items)
+
+        def offer(i, label, confidence, tier, threshold):
+            if confidence >= threshold:
+                results[i] = (label, confidence, tier, False)
+            elif best[i] is None or confidence > best[i][1]:
+                best[i] = (label, confidence, tier)
+
+        # Tầng 1: mô hình cục bộ (chỉ khi head mức độ đáng tin, xem _severity_model_trusted)
+        if self.severity_model_trusted and items:
+            start = time.perf_counter()
+            try:
+                predictions = self._apply_severity_model(items, X)
+            except Exception as e:
+                logging.error(f"Severity model error: {str(e)}")
+                predictions = []
+            for i, (label, confidence) in enumerate(predictions):
+                offer(i, label, confidence, 'model', self.config['severity_model_threshold'])
+            self.severity_stats.record('model', time.perf_counter() - start, len(items),
+                                       sum(r is not None for r in results))
+
+        # Tầng 2: từ khóa
+        pending = [i for i, r in enumerate(results) if r is None]
+        if pending:
+            start = time.perf_counter()
+            for i in pending:
+                label, confidence = self._classify_severity_rules(*items[i])
+                offer(i, label, confidence, 'rules', self.config['severity_rules_threshold'])
+            self.severity_stats.record('rules', time.perf_counter() - start, len(pending),
+                                       sum(results[i] is not None for i in pending))
+
+        # Tầng 3: LLM (chậm, tốn phí) chỉ cho các trường hợp còn mơ hồ
+        pending = [i for i, r in enumerate(results) if r is None]
+        if pending and use_llm and self.llm_available:
+            start = time.perf_counter()
+            refined = self.refine_severity_many([items[i] for i in pending])
+            for i, r in zip(pending, refined):
+                if r:
+                    results[i] = (r[0], r[1], 'llm', False)
+            self.severity_stats.record('llm', time.perf_counter() - start, len(pending),
+                                       sum(results[i] is not None for i in pending))
+
+        pending = [i for i, r in enumerate(results) if r is None]
+        for i in pending:
+            label, confidence, tier = best[i]
+            results[i] = (label, confidence, tier, True)
+        self.severity_stats.record('fallback', 0.0, 0, len(pending))
+        return results
+
+    @property
+    def llm_service(self):
+        """OpenAIService dùng chung (đọc cấu hình một lần cho mỗi bộ phân loại)"""
+        service = getattr(self, '_llm_service', None)
+        if service is None:
+            from services.openai_service import OpenAIService
+            service = self._llm_service = OpenAIService()
+        return service
+
+    @property
+    def llm_available(self) -> bool:
+        """Có cấu hình API LLM để tinh chỉnh mức độ hay không"""
+        return bool(self.llm_service.api_key)
+
+    def refine_severity(self, title: str, description: str) -> Optional[Tuple[str, float]]:
+        """Phân tích mức độ bằng LLM (chậm, gọi mạng); None nếu API không dùng được"""
+        return self.refine_severity_many([(title, description)])[0]
+
+    def refine_severity_many(self, items: List[Tuple[str, str]]) -> List[Optional[Tuple[str, float]]]:
+        """Gọi LLM song song qua LLMClientPool (giới hạn tốc độ, circuit breaker, deadline)"""
+        if not self.llm_available:
+            return [None] * len(items)
+        from services.llm_pool import get_llm_pool
+        results = get_llm_pool().map(self.llm_service.analyze_feedback, items)
+        return [(r['severity'], r['confidence']) if r else None for r in results]
+
+    def _classify_severity_rules(self, title: str, description: str) -> Tuple[str, float]:
+        """Phân loại mức độ nghiêm trọng bằng từ khóa (một lượt quét, hỗ trợ không dấu)"""
+        high_matches = 0
+        medium_matches = 0
+        for m in self.severity_matcher.find_terms(f"{title} {description}"):
+            if m.group == 'high':
+                high_matches += 1
+            else:
+                medium_matches += 1
         
         # Logic phân loại
         if high_matches > 0:
@@ -308,39 +579,85 @@ class FeedbackClassifier:
             # Không tìm thấy dấu hiệu đặc biệt
             return 'low', 0.65
             
-    def classify(self, title: str, description: str) -> Dict:
-        """Main classification method combining rules and TF-IDF"""
-        # Log input
-        logging.info(f"Classifying feedback - Title: {title}")
-
+    def explain(self, title: str, description: str) -> Dict:
+        """Phân loại phản ánh/khiếu nại (không tính mức độ) kèm phần giải thích"""
         # Try rule-based first vì có độ chính xác cao hơn
         rule_result = self._apply_rule_classification(title, description)
-        if rule_result and rule_result[1] >= 0.7:
+        tfidf_result = None
+        if not self._rules_confident(rule_result):
+            tfidf_result = self._apply_tfidf_classification(title, description)
+        return self._combine_results(rule_result, tfidf_result)
+
+    @staticmethod
+    def _rules_confident(rule_result) -> bool:
+        return bool(rule_result) and rule_result[1] >= 0.7
+
+    def _combine_results(self, rule_result, tfidf_result) -> Dict:
+        """Chọn giữa kết quả luật và TF-IDF"""
+        if self._rules_confident(rule_result):
             label, confidence, terms = rule_result
             method = "rules"
-        else:
+        elif tfidf_result and tfidf_result[1] >= 0.75:  # Tăng ngưỡng tin cậy cho TF-IDF
             # Fallback to TF-IDF if rules không đủ tin cậy
-            tfidf_result = self._apply_tfidf_classification(title, description)
-            if tfidf_result and tfidf_result[1] >= 0.75:  # Tăng ngưỡng tin cậy cho TF-IDF
-                label, confidence, terms = tfidf_result
-                method = "tfidf"
-            else:
-                # Nếu cả hai phương pháp đều không đủ tin cậy, dùng kết quả từ rules
-                label, confidence, terms = rule_result
-                method = "rules"
-
-        # Phân loại mức độ nghiêm trọng
-        severity, severity_confidence = self._classify_severity(title, description)
+            label, confidence, terms = tfidf_result
+            method = "tfidf"
+        else:
+            # Nếu cả hai phương pháp đều không đủ tin cậy, dùng kết quả từ rules
+            label, confidence, terms = rule_result
+            method = "rules"
 
-        # Log result
-        result = {
+        return {
             'label': label,
-            'confidence': confidence,
-            'important_terms': terms,
+            'confidence': float(confidence),
+            'important_terms': list(terms),
             'method': method,
-            'severity': severity,
-            'severity_confidence': severity_confidence
+            'model_version': self.model_version
         }
+
+    def explain_many(self, items: Iterable[Tuple[str, str]], X=None) -> List[Dict]:
+        """explain() cho cả lô; TF-IDF chỉ chạy một lần cho các dòng luật chưa đủ tin cậy"""
+        items = [(title or '', description or '') for title, description in items]
+        rule_results = [self._apply_rule_classification(t, d) for t, d in items]
+        pending = [i for i, r in enumerate(rule_results) if not self._rules_confident(r)]
+        tfidf_results = [None] * len(items)
+        batch = self._apply_tfidf_batch([items[i] for i in pending], X[pending] if X is not None and pending else None)
+        for i, res in zip(pending, batch):
+            tfidf_results[i] = res
+        return [self._combine_results(r, t) for r, t in zip(rule_results, tfidf_results)]
+
+    @staticmethod
+    def _set_severity(result: Dict, severity: Tuple[str, float, str, bool]):
+        result['severity'], result['severity_confidence'], result['severity_tier'], result['severity_ambiguous'] = severity
+
+    def _classify_batch(self, items: List[Tuple[str, str]], use_llm: bool) -> List[Dict]:
+        """Loại, mức độ và gợi ý danh mục; với mô hình multi-head chỉ vector hóa một lần"""
+        X = self._vectorize(items) if self.multihead_model is not None and items else None
+        results = self.explain_many(items, X)
+        for result, severity in zip(results, self._classify_severity_many(items, use_llm, X)):
+            self._set_severity(result, severity)
+        for result, category in zip(results, self.suggest_category_many(items, X)):
+            result['category'], result['category_confidence'] = category if category else (None, None)
+        return results
+
+    def classify_many(self, items: Iterable[Tuple[str, str]], use_llm: bool = True) -> List[Dict]:
+        """Phân loại nhiều phản ánh (title, description) một lượt, giữ nguyên thứ tự đầu vào"""
+        items = [(title or '', description or '') for title, description in items]
+        results = self._classify_batch(items, use_llm)
+        logging.info(f"Batch classified {len(results)} feedbacks")
+        return results
+
+    def classify(self, title: str, description: str, use_llm: bool = True) -> Dict:
+        """Main classification method combining rules and TF-IDF
+
+        use_llm=False chỉ dùng phân tích cục bộ cho mức độ nghiêm trọng (không gọi mạng);
+        các kết quả còn mơ hồ (severity_ambiguous) khi đó được giao cho services.severity_queue.
+        """
+        # Log input
+        logging.info(f"Classifying feedback - Title: {title}")
+
+        result = self._classify_batch([(title or '', description or '')], use_llm)[0]
+
+        # Log result
         logging.info(f"Classification result: {json.dumps(result)}")
 
-        return result
\ No newline at end of file
+        return result
@@ -3,8 +3,37 @@ import json
 import logging
 from typing import Dict, Optional
 import google.generativeai as genai
+from services.llm_cache import get_llm_cache, prompt_version
+
+MODEL = 'models/gemini-2.5-pro'
+
+SYSTEM_PROMPT = """Bạn là một chuyên gia phân tích phản ánh, khiếu nại của người dân. 
+Nhiệm vụ của bạn là phân loại mức độ nghiêm trọng của vấn đề theo 3 mức:
+- cao: Ảnh hưởng đến tính mạng, sức khỏe; vi phạm pháp luật nghiêm trọng; tham nhũng; ô nhiễm nghiêm trọng; ảnh hưởng đến nhiều người; cần giải quyết khẩn cấp
+- bình thường: Cơ sở hạ tầng hư hỏng; vệ sinh môi trường; trật tự đô thị; dịch vụ công chậm trễ; tiện ích gián đoạn
+- thấp: Vấn đề nhỏ, cá nhân, không gấp
+
+2. Lý do phân loại: Giải thích ngắn gọn lý do phân loại mức độ
+
+Trả về kết quả theo định dạng JSON:
+{
+    "severity": "cao/binh_thuong/thap",
+    "confidence": 0.7-0.95,
+    "reason": "Lý do phân loại..."
+}"""
+
+USER_PROMPT = """Tiêu đề: {title}
+Nội dung: {content}
+
+Hãy phân loại mức độ nghiêm trọng của phản ánh/khiếu nại trên."""
+
+# Đổi prompt/model sẽ đổi phiên bản => các kết quả cache cũ tự hết hiệu lực
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, USER_PROMPT, MODEL)
 
 class GeminiService:
+    # GenerativeModel dùng lại giữa các lời gọi thay vì tạo mới mỗi lần
+    _models = {}
+
     def __init__(self):
         # Đọc API key từ file cấu hình
         try:
@@ -23,33 +52,25 @@ class GeminiService:
             genai.configure(api_key=self.api_key)
             
     def analyze_feedback(self, title: str, content: str) -> Optional[Dict]:
-        """Phân tích phản ánh/khiếu nại sử dụng Google Gemini API"""
+        """Phân tích phản ánh/khiếu nại sử dụng Google Gemini API (có cache theo nội dung)"""
         if not self.api_key:
             return None
+        cache = get_llm_cache()
+        if cache is None:
+            return self._call_api(title, content)
+        return cache.cached_call('gemini', MODEL, PROMPT_VERSION, title, content,
+                                 lambda: self._call_api(title, content))
+
+    def _call_api(self, title: str, content: str) -> Optional[Dict]:
         try:
             # Tạo prompt để phân tích
-            system_prompt = """Bạn là một chuyên gia phân tích phản ánh, khiếu nại của người dân. 
-Nhiệm vụ của bạn là phân loại mức độ nghiêm trọng của vấn đề theo 3 mức:
-- cao: Ảnh hưởng đến tính mạng, sức khỏe; vi phạm pháp luật nghiêm trọng; tham nhũng; ô nhiễm nghiêm trọng; ảnh hưởng đến nhiều người; cần giải quyết khẩn cấp
-- bình thường: Cơ sở hạ tầng hư hỏng; vệ sinh môi trường; trật tự đô thị; dịch vụ công chậm trễ; tiện ích gián đoạn
-- thấp: Vấn đề nhỏ, cá nhân, không gấp
-
-2. Lý do phân loại: Giải thích ngắn gọn lý do phân loại mức độ
-
-Trả về kết quả theo định dạng JSON:
-{
-    "severity": "cao/binh_thuong/thap",
-    "confidence": 0.7-0.95,
-    "reason": "Lý do phân loại..."
-}"""
-
-            user_prompt = f"""Tiêu đề: {title}
-Nội dung: {content}
-
-Hãy phân loại mức độ nghiêm trọng của phản ánh/khiếu nại trên."""
+            system_prompt = SYSTEM_PROMPT
+            user_prompt = USER_PROMPT.format(title=title, content=content)
 
             # Khởi tạo model
-            model = genai.GenerativeModel('models/gemini-2.5-pro')
+            model = self._models.get(MODEL)
+            if model is None:
+                model = self._models.setdefault(MODEL, genai.GenerativeModel(MODEL))
             
             # Gọi API
             prompt = f"{system_prompt}\n\n{user_prompt}"
@@ -0,0 +1,381 @@
+"""Bảng tổng hợp hamlet_stats, cập nhật tăng dần bằng sự kiện ORM.
+
+Mỗi lần Household/Resident/TemporaryResidence/Beneficiary được thêm, sửa hay
+xóa qua ORM, hook after_insert/after_update/after_delete cộng hoặc trừ phần
+đóng góp của dòng đó vào thôn/xóm tương ứng (UPDATE ... SET x = x + :d trong
+cùng giao dịch). Các thay đổi làm dịch chuyển cả nhóm dòng (hộ đổi thôn, nhân
+khẩu chuyển hộ, xóa hộ) và câu lệnh INSERT/UPDATE/DELETE hàng loạt thì tính
+lại các thôn liên quan (hoặc toàn bộ) sau khi ghi. Trang tổng quan chỉ đọc
+vài dòng của bảng này.
+
+Tuổi tính theo năm sinh nên bảng lưu stats_year; sang năm mới lần đọc đầu tiên
+tính lại toàn bộ.
+
+    flask rebuild-stats      # tính lại toàn bộ
+    flask check-stats        # so bảng với số liệu tính trực tiếp (mã thoát 1 nếu lệch)
+"""
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, event, extract, func, insert, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from models import Beneficiary, HamletStats, Household, Resident, TemporaryResidence
+from services.population_stats import HEAD_RELATIONSHIP, household_residents
+
+COUNTERS = ('households', 'residents', 'heads_without_resident', 'children', 'elderly',
+            'temp_residents', 'temp_absent', 'beneficiaries')
+CHILD_AGE = 18
+ELDERLY_AGE = 60
+TRACKED = (Household, Resident, TemporaryResidence, Beneficiary)
+# Khóa trong Session.info: các thôn cần tính lại sau flush
+_DIRTY_KEY = 'hamlet_stats_dirty'
+
+
+def _year() -> int:
+    return date.today().year
+
+
+# --- Tính trực tiếp bằng truy vấn gộp (dùng cho rebuild và kiểm tra) ---
+
+def compute(conn, year: Optional[int] = None, hamlets: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Số liệu từng thôn tính thẳng từ các bảng gốc (hamlets: chỉ các thôn này)"""
+    year = year or _year()
+    hamlets = None if hamlets is None else list(hamlets)
+    stats = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def run(query, *columns):
+        if hamlets is not None:
+            query = query.where(Household.hamlet.in_(hamlets))
+        for hamlet, *values in conn.execute(query.group_by(Household.hamlet)):
+            for column, value in zip(columns, values):
+                stats[hamlet][column] = int(value or 0)
+
+    run(select(Household.hamlet, func.count(Household.id)), 'households')
+
+    birth_year = extract('year', Resident.birth_date)
+    run(select(Household.hamlet, func.count(Resident.id),
+               func.sum(case((birth_year > year - CHILD_AGE, 1), else_=0)),
+               func.sum(case((birth_year <= year - ELDERLY_AGE, 1), else_=0)))
+        .join(Household, Household.id == Resident.household_id),
+        'residents', 'children', 'elderly')
+
+    per_household = household_residents()
+    run(select(Household.hamlet, func.count(Household.id))
+        .outerjoin(per_household, per_household.c.household_id == Household.id)
+        .where(func.coalesce(per_household.c.has_head, 0) == 0),
+        'heads_without_resident')
+
+    run(select(Household.hamlet,
+               func.sum(case((TemporaryResidence.type == 'tam_tru', 1), else_=0)),
+               func.sum(case((TemporaryResidence.type == 'tam_vang', 1), else_=0)))
+        .select_from(TemporaryResidence)
+        .outerjoin(Resident, Resident.id == TemporaryResidence.resident_id)
+        .join(Household, Household.id == func.coalesce(Resident.household_id, TemporaryResidence.head_household_id))
+        .where(TemporaryResidence.is_active.is_(True)),
+        'temp_residents', 'temp_absent')
+
+    run(select(Household.hamlet, func.count(Beneficiary.id))
+        .select_from(Beneficiary)
+        .outerjoin(Resident, Resident.id == Beneficiary.resident_id)
+        .join(Household, Household.id == func.coalesce(Beneficiary.household_id, Resident.household_id))
+        .where(Beneficiary.is_active.is_(True)),
+        'beneficiaries')
+    return dict(stats)
+
+
+def recompute(conn, hamlets: Optional[Iterable[str]] = None, year: Optional[int] = None):
+    """Ghi lại bảng cho các thôn chỉ định (None: toàn bộ) từ số liệu tính trực tiếp"""
+    year = year or _year()
+    hamlets = None if hamlets is None else [h for h in set(hamlets) if h is not None]
+    if hamlets == []:
+        return
+    fresh = compute(conn, year, hamlets)
+    stmt = delete(HamletStats)
+    if hamlets is not None:
+        stmt = stmt.where(HamletStats.hamlet.in_(hamlets))
+    conn.execute(stmt)
+    if fresh:
+        conn.execute(insert(HamletStats), [
+            {'hamlet': hamlet, **values, 'stats_year': year} for hamlet, values in fresh.items()
+        ])
+
+
+def rebuild() -> int:
+    """Tính lại toàn bộ bảng (flask rebuild-stats); trả về số thôn"""
+    recompute(db.session.connection())
+    db.session.commit()
+    return HamletStats.query.count()
+
+
+def check() -> List[Dict]:
+    """Các ô lệch giữa bảng và số liệu tính trực tiếp: [{hamlet, column, stored, actual}]"""
+    conn = db.session.connection()
+    actual = compute(conn)
+    stored = {row.hamlet: row for row in HamletStats.query.all()}
+    mismatches = []
+    for hamlet in sorted(set(actual) | set(stored)):
+        row = stored.get(hamlet)
+        for column in COUNTERS:
+            have = getattr(row, column) if row is not None else 0
+            want = actual.get(hamlet, {}).get(column, 0)
+            if have != want:
+                mismatches.append({'hamlet': hamlet, 'column': column, 'stored': have, 'actual': want})
+    return mismatches
+
+
+def ensure_stats():
+    """Dựng bảng lần đầu (hoặc khi sang năm mới) để các lần đọc sau chỉ cần vài dòng"""
+    year = _year()
+    row = db.session.query(HamletStats.stats_year).first()
+    if row is None and db.session.query(Household.id).first() is None:
+        return
+    if row is None or db.session.query(HamletStats.hamlet).filter(HamletStats.stats_year != year).first():
+        logging.info("Tính lại bảng hamlet_stats")
+        recompute(db.session.connection(), year=year)
+        db.session.commit()
+
+
+def get_stats() -> List[HamletStats]:
+    """Các thôn còn hộ, theo tên"""
+    ensure_stats()
+    return HamletStats.query.filter(HamletStats.households > 0).order_by(HamletStats.hamlet).all()
+
+
+def totals(rows: List[HamletStats]) -> Dict[str, int]:
+    result = {column: sum(getattr(row, column) for row in rows) for column in COUNTERS}
+    result['people'] = result['residents'] + result['heads_without_resident']
+    return result
+
+
+# --- Cập nhật tăng dần ---
+
+def _apply(conn, deltas: Dict[str, Dict[str, int]]):
+    year = _year()
+    for hamlet, delta in deltas.items():
+        delta = {k: v for k, v in delta.items() if v}
+        if hamlet is None or not delta:
+            continue
+        res = conn.execute(
+            update(HamletStats)
+            .where(HamletStats.hamlet == hamlet)
+            .values({getattr(HamletStats, k): getattr(HamletStats, k) + v for k, v in delta.items()})
+        )
+        if not res.rowcount:
+            conn.execute(insert(HamletStats).values(
+                hamlet=hamlet, stats_year=year, **{k: delta.get(k, 0) for k in COUNTERS}))
+
+
+def _add(deltas, hamlet, sign, **counts):
+    if hamlet is None:
+        return
+    bucket = deltas.setdefault(hamlet, {})
+    for column, value in counts.items():
+        bucket[column] = bucket.get(column, 0) + sign * int(value)
+
+
+def _hamlet_of_household(conn, household_id):
+    if household_id is None:
+        return None
+    return conn.scalar(select(Household.hamlet).where(Household.id == household_id))
+
+
+def _hamlet_of_resident(conn, resident_id):
+    if resident_id is None:
+        return None
+    return conn.scalar(select(Household.hamlet)
+                       .join(Resident, Resident.household_id == Household.id)
+                       .where(Resident.id == resident_id))
+
+
+def _values(target, columns, old: bool) -> Dict:
+    """Giá trị hiện tại hoặc trước thay đổi (old=True) của các cột"""
+    state = inspect(target)
+    values = {}
+    for column in columns:
+        value = getattr(target, column)
+        if old:
+            history = state.attrs[column].history
+            if history.deleted:
+                value = history.deleted[0]
+        values[column] = value
+    return values
+
+
+def _changed(target, *columns) -> bool:
+    state = inspect(target)
+    return any(state.attrs[c].history.has_changes() for c in columns)
+
+
+def _mark_dirty(target, *hamlets):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).update(h for h in hamlets if h is not None)
+
+
+def _resident_contribution(conn, deltas, values, sign, year):
+    hamlet = _hamlet_of_household(conn, values['household_id'])
+    age = year - values['birth_date'].year if values['birth_date'] else None
+    _add(deltas, hamlet, sign, residents=1,
+         children=age is not None and age < CHILD_AGE,
+         elderly=age is not None and age >= ELDERLY_AGE)
+
+
+def _head_change(conn, deltas, old_household, old_is_head, new_household, new_is_head):
+    """Cập nhật heads_without_resident khi một nhân khẩu trở thành/thôi là 'Chủ hộ' của hộ"""
+    for household_id in {old_household, new_household} - {None}:
+        after = conn.scalar(select(func.count(Resident.id)).where(
+            Resident.household_id == household_id, Resident.relationship == HEAD_RELATIONSHIP))
+        before = (after - int(bool(new_is_head) and new_household == household_id)
+                  + int(bool(old_is_head) and old_household == household_id))
+        change = int(after == 0) - int(before == 0)
+        if change:
+            _add(deltas, _hamlet_of_household(conn, household_id), 1, heads_without_resident=change)
+
+
+def _temp_contribution(conn, deltas, values, sign):
+    if not values['is_active']:
+        return
+    hamlet = _hamlet_of_resident(conn, values['resident_id']) or _hamlet_of_household(conn, values['head_household_id'])
+    _add(deltas, hamlet, sign,
+         temp_residents=values['type'] == 'tam_tru',
+         temp_absent=values['type'] == 'tam_vang')
+
+
+def _beneficiary_contribution(conn, deltas, values, sign):
+    if not values['is_active']:
+        return
+    hamlet = _hamlet_of_household(conn, values['household_id']) or _hamlet_of_resident(conn, values['resident_id'])
+    _add(deltas, hamlet, sign, beneficiaries=1)
+
+
+RESIDENT_COLUMNS = ('household_id', 'birth_date', 'relationship')
+TEMP_COLUMNS = ('is_active', 'type', 'resident_id', 'head_household_id')
+BENEFICIARY_COLUMNS = ('is_active', 'household_id', 'resident_id')
+
+
+def _track_old_values(model, columns):
+    """Nạp giá trị cũ khi gán cột (kể cả khi cột đã hết hạn sau commit) để tính phần trừ"""
+    for column in columns:
+        event.listen(getattr(model, column), 'set', lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+
+
+_track_old_values(Household, ('hamlet',))
+_track_old_values(Resident, RESIDENT_COLUMNS)
+_track_old_values(TemporaryResidence, TEMP_COLUMNS)
+_track_old_values(Beneficiary, BENEFICIARY_COLUMNS)
+
+
+@event.listens_for(Household, 'after_insert')
+def _household_inserted(mapper, conn, target):
+    # Hộ mới chưa có nhân khẩu nào là 'Chủ hộ'
+    _apply(conn, {target.hamlet: {'households': 1, 'heads_without_resident': 1}})
+
+
+@event.listens_for(Household, 'after_update')
+def _household_updated(mapper, conn, target):
+    if _changed(target, 'hamlet'):
+        _mark_dirty(target, _values(target, ('hamlet',), old=True)['hamlet'], target.hamlet)
+
+
+@event.listens_for(Household, 'after_delete')
+def _household_deleted(mapper, conn, target):
+    _mark_dirty(target, target.hamlet)
+
+
+@event.listens_for(Resident, 'after_insert')
+def _resident_inserted(mapper, conn, target):
+    deltas = {}
+    _resident_contribution(conn, deltas, _values(target, RESIDENT_COLUMNS, old=False), 1, _year())
+    if target.relationship == HEAD_RELATIONSHIP:
+        _head_change(conn, deltas, None, False, target.household_id, True)
+    _apply(conn, deltas)
+
+
+@event.listens_for(Resident, 'after_update')
+def _resident_updated(mapper, conn, target):
+    if not _changed(target, *RESIDENT_COLUMNS):
+        return
+    old = _values(target, RESIDENT_COLUMNS, old=True)
+    new = _values(target, RESIDENT_COLUMNS, old=False)
+    if old['household_id'] != new['household_id']:
+        # Tạm trú/tạm vắng và trợ cấp của nhân khẩu đi theo sang hộ mới
+        _mark_dirty(target, _hamlet_of_household(conn, old['household_id']),
+                    _hamlet_of_household(conn, new['household_id']))
+        return
+    deltas = {}
+    year = _year()
+    _resident_contribution(conn, deltas, old, -1, year)
+    _resident_contribution(conn, deltas, new, 1, year)
+    old_is_head = old['relationship'] == HEAD_RELATIONSHIP
+    new_is_head = new['relationship'] == HEAD_RELATIONSHIP
+    if old_is_head != new_is_head:
+        _head_change(conn, deltas, old['household_id'], old_is_head, new['household_id'], new_is_head)
+    _apply(conn, deltas)
+
+
+@event.listens_for(Resident, 'after_delete')
+def _resident_deleted(mapper, conn, target):
+    deltas = {}
+    old = _values(target, RESIDENT_COLUMNS, old=True)
+    _resident_contribution(conn, deltas, old, -1, _year())
+    if old['relationship'] == HEAD_RELATIONSHIP:
+        _head_change(conn, deltas, old['household_id'], True, None, False)
+    _apply(conn, deltas)
+
+
+def _listen_simple(model, columns, contribution):
+    """Mô hình chỉ đóng góp vào một thôn: sửa = trừ phần cũ, cộng phần mới"""
+    @event.listens_for(model, 'after_insert')
+    def inserted(mapper, conn, target):
+        deltas = {}
+        contribution(conn, deltas, _values(target, columns, old=False), 1)
+        _apply(conn, deltas)
+
+    @event.listens_for(model, 'after_update')
+    def updated(mapper, conn, target):
+        if not _changed(target, *columns):
+            return
+        deltas = {}
+        contribution(conn, deltas, _values(target, columns, old=True), -1)
+        contribution(conn, deltas, _values(target, columns, old=False), 1)
+        _apply(conn, deltas)
+
+    @event.listens_for(model, 'after_delete')
+    def deleted(mapper, conn, target):
+        deltas = {}
+        contribution(conn, deltas, _values(target, columns, old=True), -1)
+        _apply(conn, deltas)
+
+
+_listen_simple(TemporaryResidence, TEMP_COLUMNS, _temp_contribution)
+_listen_simple(Beneficiary, BENEFICIARY_COLUMNS, _beneficiary_contribution)
+
+
+@event.listens_for(Session, 'after_flush')
+def _recompute_dirty(session, flush_context):
+    hamlets = session.info.pop(_DIRTY_KEY, None)
+    if hamlets:
+        recompute(session.connection(), hamlets)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_dirty(session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    """INSERT/UPDATE/DELETE hàng loạt không qua sự kiện từng dòng: tính lại toàn bộ sau khi chạy"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in TRACKED:
+        return None
+    result = orm_execute_state.invoke_statement()
+    recompute(orm_execute_state.session.connection())
+    return result
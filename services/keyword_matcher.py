@@ -0,0 +1,111 @@
+import unicodedata
+from collections import deque, namedtuple
+from typing import Dict, Iterable, List
+
+# Một lần khớp: cụm từ gốc, vị trí [start, end) trên văn bản đã chuẩn hóa, nhóm và trọng số
+KeywordMatch = namedtuple('KeywordMatch', ['term', 'start', 'end', 'group', 'weight', 'order'])
+
+
+class KeywordMatcher:
+    """Bộ so khớp nhiều từ khóa một lượt (automaton Aho-Corasick).
+
+    Cả từ khóa lẫn văn bản đều được đưa về dạng chữ thường, không dấu trước
+    khi so khớp, vì vậy một lần quét bắt được cả cách viết có dấu và không
+    dấu. Chi phí mỗi lần quét tỉ lệ với độ dài văn bản, không phụ thuộc số
+    lượng từ khóa.
+    """
+
+    _fold_cache: Dict[str, str] = {}
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[tuple]] = [[]]
+        self._count = 0
+        self._built = False
+
+    @classmethod
+    def fold_char(cls, c: str) -> str:
+        folded = cls._fold_cache.get(c)
+        if folded is None:
+            folded = ''.join(
+                ch for ch in unicodedata.normalize('NFD', c.lower())
+                if unicodedata.category(ch) != 'Mn'
+            )
+            cls._fold_cache[c] = folded
+        return folded
+
+    @classmethod
+    def fold(cls, text: str) -> str:
+        """Chữ thường + bỏ dấu; vị trí ký tự khớp với văn bản dạng NFC"""
+        return ''.join(cls.fold_char(c) for c in unicodedata.normalize('NFC', text))
+
+    def add(self, term: str, group=None, weight: float = 1):
+        """Thêm một từ khóa; thứ tự thêm được giữ lại trong KeywordMatch.order"""
+        if self._built:
+            raise RuntimeError("KeywordMatcher đã được build, không thể thêm từ khóa")
+        key = self.fold(term)
+        if not key:
+            return
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((term, len(key), group, weight, self._count))
+        self._count += 1
+
+    def build(self) -> 'KeywordMatcher':
+        """Tính các liên kết fail (BFS); gọi một lần sau khi thêm đủ từ khóa"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    @classmethod
+    def from_terms(cls, entries: Iterable[tuple]) -> 'KeywordMatcher':
+        """Tạo matcher từ các bộ (term, group, weight)"""
+        matcher = cls()
+        for term, group, weight in entries:
+            matcher.add(term, group, weight)
+        return matcher.build()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Mọi lần xuất hiện của các từ khóa trong text"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for i, ch in enumerate(self.fold(text)):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for term, length, group, weight, order in out[node]:
+                matches.append(KeywordMatch(term, i - length + 1, i + 1, group, weight, order))
+        return matches
+
+    def find_terms(self, text: str) -> List[KeywordMatch]:
+        """Mỗi từ khóa khớp được trả về một lần (lần xuất hiện đầu), theo thứ tự thêm vào"""
+        first = {}
+        for m in self.find_all(text):
+            if m.order not in first:
+                first[m.order] = m
+        return [first[k] for k in sorted(first)]
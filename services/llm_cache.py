@@ -0,0 +1,170 @@
+"""Bộ nhớ đệm bền vững cho kết quả phân tích phản ánh bằng LLM (OpenAI/Gemini).
+
+Khóa = SHA-256 của (nhà cung cấp, model, phiên bản prompt, văn bản đã chuẩn
+hóa), nên đổi prompt hoặc model thì các mục cũ tự động không còn được dùng.
+Dữ liệu nằm trong một file SQLite riêng (mặc định instance/llm_cache.db),
+có giới hạn số mục (LRU) và thời gian sống (TTL), kèm bộ đếm hit/miss.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'llm_cache.db')
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+
+def prompt_version(*parts) -> str:
+    """Dấu vân tay ngắn của prompt/tham số gọi API"""
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(str(p).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()[:12]
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize('NFC', text or '').lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class LLMCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL,"
+                " value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL,"
+                " hit_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(provider: str, model: str, version: str, title: str, content: str) -> str:
+        raw = '\x00'.join([provider, model, version, normalize_text(title), normalize_text(content)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _bump(self, conn, name: str):
+        conn.execute(
+            "INSERT INTO llm_cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    conn.execute(
+                        "UPDATE llm_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                        (now, key)
+                    )
+                    self._bump(conn, 'hits')
+                    return json.loads(row[0])
+                if row:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._bump(conn, 'misses')
+        except Exception as e:
+            logging.error(f"LLM cache read error: {str(e)}")
+        return None
+
+    def set(self, key: str, provider: str, model: str, value: Dict):
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, provider, model, value, created_at, last_access, hit_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, provider, model, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._writes += 1
+                if self._writes % 100 == 1:
+                    self._evict(conn, now)
+        except Exception as e:
+            logging.error(f"LLM cache write error: {str(e)}")
+
+    def _evict(self, conn, now: float):
+        """Xóa mục hết hạn rồi cắt bớt các mục lâu không dùng nhất khi vượt giới hạn"""
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def evict(self):
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM llm_cache_stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.execute("DELETE FROM llm_cache_stats")
+
+    def cached_call(self, provider: str, model: str, version: str, title: str, content: str, fn) -> Optional[Dict]:
+        """Trả kết quả đã lưu hoặc gọi fn() và lưu lại nếu thành công"""
+        key = self.make_key(provider, model, version, title, content)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result = fn()
+        if result:
+            self.set(key, provider, model, result)
+        return result
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Cache dùng chung của tiến trình; None nếu bị tắt bằng LLM_CACHE=off"""
+    global _cache
+    if os.environ.get('LLM_CACHE', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(path=os.environ.get('LLM_CACHE_PATH', DEFAULT_PATH))
+    return _cache
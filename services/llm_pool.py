@@ -0,0 +1,176 @@
+"""Pool dùng chung cho các lời gọi LLM (OpenAI/Gemini).
+
+- Tối đa max_workers lời gọi chạy song song (ThreadPoolExecutor).
+- Token bucket giới hạn số lời gọi mỗi giây gửi tới nhà cung cấp.
+- Circuit breaker: sau failure_threshold lần lỗi liên tiếp, mọi lời gọi trả
+  về None ngay (để dùng luật cục bộ) trong reset_timeout giây, sau đó cho
+  một lời gọi thử (half-open).
+- Mỗi lời gọi có deadline; quá hạn thì trả None thay vì chờ hết timeout.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Optional, Sequence
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker đang mở, lời gọi bị từ chối"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Lấy một token, chờ tối đa timeout giây; False nếu hết hạn"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            # half-open: chỉ cho một lời gọi thử
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logging.warning("LLM circuit breaker mở sau %d lỗi liên tiếp", self._failures)
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class LLMClientPool:
+    def __init__(self, max_workers: int = 4, rate: float = 2.0, burst: float = 4,
+                 failure_threshold: int = 5, reset_timeout: float = 60.0, deadline: float = 20.0):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    def _run(self, fn: Callable, args: tuple, expires: float):
+        # Chờ token trong phạm vi deadline; hết giờ thì bỏ qua lời gọi
+        if not self.bucket.acquire(timeout=max(0.0, expires - time.monotonic())):
+            raise FutureTimeout()
+        if time.monotonic() >= expires:
+            raise FutureTimeout()
+        return fn(*args)
+
+    def submit(self, fn: Callable, *args, deadline: Optional[float] = None):
+        """Gửi một lời gọi vào pool; trả về (future, thời điểm hết hạn)"""
+        if not self.breaker.allow():
+            raise CircuitOpenError()
+        expires = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        return self._executor.submit(self._run, fn, args, expires), expires
+
+    def _collect(self, future, expires: float):
+        try:
+            result = future.result(timeout=max(0.0, expires - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            logging.warning("LLM call vượt quá deadline")
+            self.breaker.record_failure()
+            return None
+        except Exception as e:
+            logging.error(f"LLM call lỗi: {str(e)}")
+            self.breaker.record_failure()
+            return None
+        if result is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+    def call(self, fn: Callable, *args, deadline: Optional[float] = None):
+        """Gọi fn(*args) qua pool; None nếu lỗi, quá hạn hoặc circuit đang mở"""
+        try:
+            future, expires = self.submit(fn, *args, deadline=deadline)
+        except CircuitOpenError:
+            return None
+        return self._collect(future, expires)
+
+    def map(self, fn: Callable, items: Sequence[tuple], deadline: Optional[float] = None) -> List:
+        """Gọi fn(*item) cho từng item song song (tối đa max_workers), giữ thứ tự"""
+        pending = []
+        for item in items:
+            try:
+                pending.append(self.submit(fn, *item, deadline=deadline))
+            except CircuitOpenError:
+                pending.append(None)
+        return [self._collect(*p) if p else None for p in pending]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    """Pool dùng chung của tiến trình, cấu hình qua biến môi trường LLM_*"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LLMClientPool(
+                    max_workers=int(os.environ.get('LLM_MAX_CONCURRENCY', 4)),
+                    rate=float(os.environ.get('LLM_RATE_PER_SEC', 2.0)),
+                    burst=float(os.environ.get('LLM_BURST', 4)),
+                    failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', 5)),
+                    reset_timeout=float(os.environ.get('LLM_BREAKER_RESET', 60)),
+                    deadline=float(os.environ.get('LLM_DEADLINE', 20)),
+                )
+    return _pool
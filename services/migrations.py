@@ -0,0 +1,161 @@
+"""Migration có đánh số phiên bản, thay cho việc kiểm tra/ALTER lược đồ ở mỗi lần khởi động.
+
+Mỗi migration là một hàm nhận Connection, chạy trong một giao dịch cùng với việc
+ghi số phiên bản vào bảng schema_version. Dòng phiên bản được INSERT trước để
+giữ khóa ghi: nhiều tiến trình cùng khởi động thì chỉ một tiến trình chạy
+migration, các tiến trình còn lại gặp khóa chính trùng và bỏ qua.
+
+Migration 1 tạo bảng từ models.py hiện tại (create_all), nên các migration sau
+phải chạy được cả khi thay đổi đã có sẵn (kiểm tra cột/chỉ mục trước khi thêm).
+
+    flask db upgrade         # chạy các migration còn thiếu
+    flask db status          # phiên bản hiện tại và các migration đang chờ
+
+create_app chỉ đọc số phiên bản; CSDL cũ hơn thì tự nâng cấp khi
+AUTO_MIGRATE bật (mặc định), ngược lại chỉ ghi cảnh báo.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, insert, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+from app import db
+from models import DocumentType, SchemaVersion, User
+
+# Cột được thêm dần vào các bảng cũ (trước khi có migration)
+LEGACY_COLUMNS = {
+    'temporary_residence': [
+        ('updated_at', 'DATETIME'),
+        ('head_household_id', 'INTEGER'),
+        ('is_for_head', 'BOOLEAN DEFAULT 0'),
+        ('lat', 'FLOAT'),
+        ('lng', 'FLOAT'),
+    ],
+    'resident': [('current_lat', 'FLOAT'), ('current_lng', 'FLOAT')],
+    'household': [('location_lat', 'FLOAT'), ('location_lng', 'FLOAT')],
+    'beneficiary': [('is_paid', 'BOOLEAN DEFAULT 0'), ('support_amount', 'INTEGER')],
+    'feedback': [
+        ('kind', 'VARCHAR(20)'),
+        ('classify_label', 'VARCHAR(20)'),
+        ('classify_confidence', 'FLOAT'),
+        ('classify_method', 'VARCHAR(20)'),
+        ('classify_terms', 'TEXT'),
+        ('model_version', 'VARCHAR(40)'),
+        ('classified_at', 'DATETIME'),
+        ('severity_source', 'VARCHAR(20)'),
+        ('text_hash', 'VARCHAR(40)'),
+        ('kind_source', 'VARCHAR(20)'),
+    ],
+    'benefit_category': [('support_amount', 'INTEGER')],
+}
+
+DEFAULT_DOCUMENT_TYPES = [
+    {"code": "xac_nhan_cu_tru", "name": "Xác nhận cư trú", "description": "Xác nhận nơi cư trú hiện tại.", "required_fields": "[{\"key\":\"dia_chi_thuong_tru\",\"label\":\"Địa chỉ thường trú\"},{\"key\":\"dia_chi_tam_tru\",\"label\":\"Địa chỉ tạm trú\",\"optional\":true}]", "fee": 0, "processing_time_days": 1},
+    {"code": "xac_nhan_tam_tru", "name": "Xác nhận tạm trú", "description": "Xác nhận thông tin tạm trú.", "required_fields": "[{\"key\":\"dia_chi_tam_tru\",\"label\":\"Địa chỉ tạm trú\"},{\"key\":\"thoi_gian_tu\",\"label\":\"Thời gian từ\"},{\"key\":\"thoi_gian_den\",\"label\":\"Thời gian đến\"}]", "fee": 0, "processing_time_days": 1},
+    {"code": "xac_nhan_tam_vang", "name": "Xác nhận tạm vắng", "description": "Xác nhận thông tin tạm vắng.", "required_fields": "[{\"key\":\"noi_den\",\"label\":\"Nơi đến\"},{\"key\":\"thoi_gian_tu\",\"label\":\"Thời gian từ\"},{\"key\":\"thoi_gian_den\",\"label\":\"Thời gian đến\"},{\"key\":\"ly_do\",\"label\":\"Lý do\"}]", "fee": 0, "processing_time_days": 1},
+    {"code": "xac_nhan_doc_than", "name": "Xác nhận tình trạng hôn nhân (độc thân)", "description": "Xác nhận độc thân phục vụ hồ sơ kết hôn, vay vốn...", "required_fields": "[{\"key\":\"ngay_sinh\",\"label\":\"Ngày sinh\"},{\"key\":\"noi_cu_tru\",\"label\":\"Nơi cư trú\"}]", "fee": 20000, "processing_time_days": 2},
+    {"code": "xac_nhan_ho_ngheo", "name": "Xác nhận hộ nghèo", "description": "Xác nhận hộ thuộc diện nghèo.", "required_fields": "[{\"key\":\"ma_ho\",\"label\":\"Mã hộ\"},{\"key\":\"nam_xet_duyet\",\"label\":\"Năm xét duyệt\"}]", "fee": 0, "processing_time_days": 2},
+    {"code": "xac_nhan_can_ngheo", "name": "Xác nhận hộ cận nghèo", "description": "Xác nhận hộ thuộc diện cận nghèo.", "required_fields": "[{\"key\":\"ma_ho\",\"label\":\"Mã hộ\"},{\"key\":\"nam_xet_duyet\",\"label\":\"Năm xét duyệt\"}]", "fee": 0, "processing_time_days": 2},
+    {"code": "dang_ky_khai_sinh", "name": "Đăng ký khai sinh", "description": "Thủ tục đăng ký khai sinh.", "required_fields": "[{\"key\":\"ten_tre\",\"label\":\"Tên trẻ\"},{\"key\":\"ngay_sinh\",\"label\":\"Ngày sinh\"},{\"key\":\"noi_sinh\",\"label\":\"Nơi sinh\"},{\"key\":\"cha\",\"label\":\"Cha\"},{\"key\":\"me\",\"label\":\"Mẹ\"}]", "fee": 0, "processing_time_days": 3},
+    {"code": "dang_ky_ket_hon", "name": "Đăng ký kết hôn", "description": "Thủ tục đăng ký kết hôn.", "required_fields": "[{\"key\":\"ten_vo\",\"label\":\"Họ tên vợ\"},{\"key\":\"ten_chong\",\"label\":\"Họ tên chồng\"},{\"key\":\"ngay_dang_ky\",\"label\":\"Ngày đăng ký\"}]", "fee": 0, "processing_time_days": 3},
+    {"code": "dang_ky_khai_tu", "name": "Đăng ký khai tử", "description": "Thủ tục đăng ký khai tử.", "required_fields": "[{\"key\":\"nguoi_mat\",\"label\":\"Họ tên người mất\"},{\"key\":\"ngay_mat\",\"label\":\"Ngày mất\"},{\"key\":\"noi_mat\",\"label\":\"Nơi mất\"},{\"key\":\"ly_do\",\"label\":\"Lý do\"}]", "fee": 0, "processing_time_days": 3}
+]
+
+
+def _initial_schema(conn):
+    """Tạo bảng còn thiếu và bổ sung các cột của CSDL tạo từ phiên bản cũ"""
+    db.metadata.create_all(bind=conn)
+    insp = inspect(conn)
+    for table, columns in LEGACY_COLUMNS.items():
+        existing = {c['name'] for c in insp.get_columns(table)}
+        for name, ddl in columns:
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    # CCCD để trống chuyển thành NULL để không vi phạm UNIQUE
+    conn.execute(text("UPDATE resident SET id_number = NULL WHERE id_number = ''"))
+
+
+def _index_pack(conn):
+    """Chỉ mục khai báo trong models.py cho các bảng đã có từ trước"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _seed_defaults(conn):
+    """Tài khoản quản trị mặc định và các loại giấy tờ của xã"""
+    from werkzeug.security import generate_password_hash
+    if conn.scalar(select(User.id).where(User.username == 'admin')) is None:
+        conn.execute(insert(User).values(
+            username='admin', email='admin@ubnd.gov.vn', full_name='Quản trị viên', role='admin', is_active=True,
+            password_hash=generate_password_hash('admin123')))
+        logging.info("Default admin user created: admin/admin123")
+    existing_codes = set(conn.scalars(select(DocumentType.code)))
+    missing = [t for t in DEFAULT_DOCUMENT_TYPES if t['code'] not in existing_codes]
+    if missing:
+        conn.execute(insert(DocumentType), missing)
+
+
+def _hamlet_stats(conn):
+    """Dựng bảng thống kê theo thôn/xóm"""
+    from services.hamlet_stats import recompute
+    recompute(conn)
+
+
+# (phiên bản, tên, hàm) theo thứ tự; chỉ thêm vào cuối, không sửa migration đã phát hành
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'initial_schema', _initial_schema),
+    (2, 'index_pack', _index_pack),
+    (3, 'seed_defaults', _seed_defaults),
+    (4, 'hamlet_stats', _hamlet_stats),
+]
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version() -> int:
+    """Phiên bản lược đồ hiện tại (0: CSDL chưa có bảng schema_version)"""
+    try:
+        with db.engine.connect() as conn:
+            return conn.scalar(select(func.max(SchemaVersion.version))) or 0
+    except (OperationalError, ProgrammingError):
+        return 0
+
+
+def applied() -> List[SchemaVersion]:
+    if not current_version():
+        return []
+    return SchemaVersion.query.order_by(SchemaVersion.version).all()
+
+
+def pending() -> List[Tuple[int, str]]:
+    version = current_version()
+    return [(v, name) for v, name, _ in MIGRATIONS if v > version]
+
+
+def upgrade(target: Optional[int] = None) -> List[int]:
+    """Chạy các migration còn thiếu (tới target nếu có); trả về các phiên bản vừa chạy"""
+    engine = db.engine
+    try:
+        SchemaVersion.__table__.create(engine, checkfirst=True)
+    except (OperationalError, ProgrammingError):
+        # Tiến trình khác vừa tạo bảng giữa lúc kiểm tra và lúc tạo
+        if not inspect(engine).has_table(SchemaVersion.__tablename__):
+            raise
+    done = []
+    for version, name, step in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.connect() as conn:
+            try:
+                # Ghi phiên bản trước: giữ khóa ghi tới khi commit, tiến trình khác không chạy trùng
+                conn.execute(insert(SchemaVersion).values(version=version, name=name, applied_at=datetime.utcnow()))
+            except IntegrityError:
+                conn.rollback()
+                continue
+            logging.info(f"Migration {version}: {name}")
+            step(conn)
+            conn.commit()
+        done.append(version)
+    return done
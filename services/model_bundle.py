@@ -0,0 +1,273 @@
+"""Định dạng mô hình gọn, nạp bằng mmap, thay cho TfidfVectorizer/LogisticRegression pickle.
+
+Mỗi bundle là một thư mục trong models/ gồm các mảng NumPy (.npy):
+- vocab: từ vựng (UTF-8 bytes) đã sắp xếp, chỉ số cột = vị trí trong mảng
+- idf: trọng số idf
+- với mỗi head (bộ phân loại dùng chung ma trận TF-IDF): coef, intercept, classes
+và meta.json (tham số analyzer, tên file mảng, phiên bản, thông tin huấn luyện
+của từng head: số dòng train_rows và chỉ số giữ lại metrics). meta.json được ghi
+sau cùng nên bộ nạp luôn thấy một bundle hoàn chỉnh. Các mảng được mở với
+mmap_mode='r' nên mọi worker gunicorn dùng chung trang bộ nhớ của hệ điều
+hành, không cần unpickle sklearn khi chạy.
+"""
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+HEAD_ARRAYS = ('coef', 'intercept', 'classes')
+META_FILE = 'meta.json'
+FORMAT_VERSION = 2
+DEFAULT_HEAD = 'default'
+
+
+def export_bundle(vectorizer, classifier, path: str, info: Dict = None) -> str:
+    """Ghi TfidfVectorizer + LogisticRegression đã huấn luyện thành bundle; trả về phiên bản"""
+    return export_heads(vectorizer, {DEFAULT_HEAD: classifier}, path, {DEFAULT_HEAD: info or {}})
+
+
+def export_heads(vectorizer, classifiers: Dict, path: str, info: Dict = None) -> str:
+    """Ghi một TfidfVectorizer dùng chung và nhiều LogisticRegression (theo tên head)
+
+    info: {head: {'train_rows': ..., 'metrics': {...}}} ghi vào meta.json của head.
+    """
+    terms = sorted(vectorizer.vocabulary_, key=lambda t: t.encode('utf-8'))
+    columns = np.array([vectorizer.vocabulary_[t] for t in terms])
+    arrays = {
+        'vocab': np.array([t.encode('utf-8') for t in terms]),
+        'idf': np.ascontiguousarray(vectorizer.idf_[columns], dtype=np.float64),
+    }
+    heads = {}
+    for head, classifier in classifiers.items():
+        arrays[f'{head}.coef'] = np.ascontiguousarray(classifier.coef_[:, columns], dtype=np.float64)
+        arrays[f'{head}.intercept'] = np.ascontiguousarray(classifier.intercept_, dtype=np.float64)
+        arrays[f'{head}.classes'] = np.array([str(c) for c in classifier.classes_])
+        multi_class = getattr(classifier, 'multi_class', 'auto')
+        heads[head] = {**(info or {}).get(head, {}), 'multi_class': 'ovr' if multi_class == 'ovr' else 'multinomial'}
+
+    return _write_bundle(path, arrays, heads, {
+        'lowercase': bool(vectorizer.lowercase),
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(vectorizer.ngram_range),
+        'sublinear_tf': bool(vectorizer.sublinear_tf),
+        'norm': vectorizer.norm,
+    })
+
+
+def _write_bundle(path: str, arrays: Dict, heads: Dict, analyzer: Dict) -> str:
+    """Ghi các mảng + meta.json (ghi sau cùng); phiên bản là hash nội dung các mảng"""
+    h = hashlib.sha1()
+    for name in sorted(arrays):
+        h.update(name.encode('utf-8'))
+        h.update(np.asarray(arrays[name]).tobytes())
+    version = h.hexdigest()[:12]
+
+    os.makedirs(path, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{name}-{version}.npy"
+        tmp = os.path.join(path, files[name] + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(path, files[name]))
+
+    meta = {'format': FORMAT_VERSION, 'version': version, 'files': files, 'heads': heads, **analyzer}
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+    # Dọn mảng của các phiên bản cũ (worker đang mmap vẫn giữ được file đã mở)
+    keep = set(files.values())
+    for name in os.listdir(path):
+        if name.endswith('.npy') and name not in keep:
+            os.remove(os.path.join(path, name))
+    return version
+
+
+class ModelHead:
+    """Một bộ phân loại hồi quy logistic trên ma trận TF-IDF của bundle"""
+
+    def __init__(self, coef, intercept, classes, multi_class: str = 'multinomial'):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = classes
+        self.multi_class = multi_class
+
+    def decision_function(self, X) -> np.ndarray:
+        return np.asarray(X @ self.coef.T) + self.intercept
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            p = 1 / (1 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - p, p])
+        if self.multi_class == 'ovr':
+            p = 1 / (1 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+        scores = scores - scores.max(axis=1, keepdims=True)
+        p = np.exp(scores)
+        return p / p.sum(axis=1, keepdims=True)
+
+    def partial_fit(self, X, y, sample_weight=None, learning_rate: float = 0.5,
+                    epochs: int = 5, l2: float = 1e-3) -> 'ModelHead':
+        """Cập nhật trực tuyến bằng gradient descent theo lô trên log-loss; trả về head mới.
+
+        Nhãn không thuộc classes_ bị bỏ qua. l2 kéo trọng số về giá trị trước lô
+        để vài mẫu sửa tay không làm lệch cả mô hình.
+        """
+        classes = [str(c) for c in self.classes_]
+        rows = [i for i, label in enumerate(y) if label in classes]
+        coef = np.array(self.coef, dtype=np.float64)
+        intercept = np.array(self.intercept, dtype=np.float64)
+        head = ModelHead(coef, intercept, self.classes_, self.multi_class)
+        if not rows:
+            return head
+        X = X[rows]
+        weights = np.ones(len(rows)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)[rows]
+        weights = weights / weights.sum()
+        target = np.zeros((len(rows), len(classes)))
+        target[np.arange(len(rows)), [classes.index(y[i]) for i in rows]] = 1
+        start_coef, start_intercept = coef.copy(), intercept.copy()
+
+        for _ in range(epochs):
+            scores = np.asarray(X @ coef.T) + intercept
+            if coef.shape[0] == 1:
+                # Nhị phân: một vector trọng số cho lớp classes_[1]
+                error = (1 / (1 + np.exp(-scores[:, 0])) - target[:, 1])[:, None]
+            elif self.multi_class == 'ovr':
+                error = 1 / (1 + np.exp(-scores)) - target
+            else:
+                scores = scores - scores.max(axis=1, keepdims=True)
+                p = np.exp(scores)
+                error = p / p.sum(axis=1, keepdims=True) - target
+            error *= weights[:, None]
+            coef -= learning_rate * (np.asarray(X.T @ error).T + l2 * (coef - start_coef))
+            intercept -= learning_rate * (error.sum(axis=0) + l2 * (intercept - start_intercept))
+        return head
+
+
+class ModelBundle:
+    """Suy luận TF-IDF + hồi quy logistic trực tiếp từ các mảng của bundle"""
+
+    def __init__(self, meta: dict, arrays: dict):
+        self.meta = meta
+        self.version = meta['version']
+        self.vocab = arrays['vocab']
+        self.idf = arrays['idf']
+        self.heads = {
+            name: ModelHead(arrays[f'{name}.coef'], arrays[f'{name}.intercept'], arrays[f'{name}.classes'],
+                            opts.get('multi_class', 'multinomial'))
+            for name, opts in meta['heads'].items()
+        }
+        self._token_re = re.compile(meta['token_pattern'])
+        self._ngram_range = tuple(meta['ngram_range'])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'ModelBundle':
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') == 1:
+            # Bundle một head (trước khi có multi-head)
+            meta['files'] = {
+                (f'{DEFAULT_HEAD}.{k}' if k in HEAD_ARRAYS else k): v for k, v in meta['files'].items()
+            }
+            meta['heads'] = {DEFAULT_HEAD: {'multi_class': meta.get('multi_class', 'multinomial')}}
+        elif meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Định dạng bundle không hỗ trợ: {meta.get('format')}")
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode='r' if mmap else None)
+            for name, filename in meta['files'].items()
+        }
+        return cls(meta, arrays)
+
+    def head(self, name: str = DEFAULT_HEAD) -> ModelHead:
+        return self.heads[name]
+
+    def head_info(self, name: str = DEFAULT_HEAD) -> Dict:
+        """Thông tin huấn luyện của head ({} với bundle cũ chưa ghi)"""
+        return self.meta['heads'].get(name, {})
+
+    def export(self, path: str, heads: Dict[str, ModelHead] = None) -> str:
+        """Ghi lại bundle (cùng từ vựng/idf), thay các head trong heads; trả về phiên bản mới"""
+        heads = {**self.heads, **(heads or {})}
+        arrays = {'vocab': np.asarray(self.vocab), 'idf': np.asarray(self.idf)}
+        for name, head in heads.items():
+            arrays[f'{name}.coef'] = np.ascontiguousarray(head.coef, dtype=np.float64)
+            arrays[f'{name}.intercept'] = np.ascontiguousarray(head.intercept, dtype=np.float64)
+            arrays[f'{name}.classes'] = np.asarray(head.classes_)
+        analyzer = {k: self.meta[k] for k in ('lowercase', 'token_pattern', 'ngram_range', 'sublinear_tf', 'norm')}
+        # Giữ thông tin huấn luyện của từng head (train_rows, metrics)
+        opts = {name: {**self.meta['heads'].get(name, {}), 'multi_class': head.multi_class}
+                for name, head in heads.items()}
+        return _write_bundle(path, arrays, opts, analyzer)
+
+    @property
+    def classes_(self):
+        return self.heads[DEFAULT_HEAD].classes_
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.heads[DEFAULT_HEAD].predict_proba(X)
+
+    def feature_name(self, column: int) -> str:
+        return bytes(self.vocab[column]).decode('utf-8')
+
+    def _analyze(self, doc: str) -> List[str]:
+        """Giống analyzer 'word' của sklearn: tách token theo token_pattern rồi sinh n-gram"""
+        if self.meta['lowercase']:
+            doc = doc.lower()
+        tokens = self._token_re.findall(doc)
+        min_n, max_n = self._ngram_range
+        if max_n == 1:
+            return tokens
+        original = tokens
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, len(original) + 1)):
+            for i in range(len(original) - n + 1):
+                tokens.append(' '.join(original[i:i + n]))
+        return tokens
+
+    def transform(self, texts: List[str]) -> csr_matrix:
+        """Ma trận TF-IDF (CSR, chuẩn hóa theo dòng) như TfidfVectorizer.transform"""
+        rows, terms, counts = [], [], []
+        for row, text in enumerate(texts):
+            for term, count in Counter(self._analyze(text)).items():
+                rows.append(row)
+                terms.append(term.encode('utf-8'))
+                counts.append(count)
+
+        shape = (len(texts), len(self.vocab))
+        if not terms:
+            return csr_matrix(shape, dtype=np.float64)
+
+        # Tra từ vựng cho cả lô bằng tìm kiếm nhị phân trên mảng đã sắp xếp
+        needles = np.array(terms)
+        pos = np.searchsorted(self.vocab, needles)
+        pos = np.minimum(pos, len(self.vocab) - 1)
+        found = self.vocab[pos] == needles
+        rows = np.array(rows)[found]
+        cols = pos[found]
+        data = np.array(counts, dtype=np.float64)[found]
+
+        if self.meta['sublinear_tf']:
+            data = np.log(data) + 1
+        data *= self.idf[cols]
+        if self.meta['norm'] == 'l2':
+            norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=shape[0]))
+            norms[norms == 0] = 1
+            data /= norms[rows]
+
+        # Dựng CSR trực tiếp (mỗi dòng đã theo thứ tự, sắp xếp cột trong dòng như sklearn)
+        order = np.lexsort((cols, rows))
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=shape[0]))))
+        return csr_matrix((data[order], cols[order], indptr), shape=shape)
+
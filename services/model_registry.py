@@ -0,0 +1,217 @@
+"""Kho phiên bản mô hình: lưu mọi bundle đã huấn luyện kèm thẻ mô tả, promote/rollback.
+
+    models/registry/<bundle>/<version>/    bản sao bundle (meta.json + .npy) và card.json
+    models/registry/<bundle>/history.json  lịch sử các lần promote
+
+Thư mục models/<bundle>/ vẫn là mô hình đang chạy (FeedbackClassifier và
+ClassifierRegistry đọc từ đó). Script huấn luyện chỉ đăng ký phiên bản ứng
+viên; promote() sao chép một phiên bản vào models/<bundle>/ (meta.json ghi
+sau cùng) và các worker tự nạp lại. card.json ghi chỉ số đánh giá, hash dữ
+liệu huấn luyện, thời điểm, script và phiên bản cha.
+
+tfidf_bundle/severity_bundle là bundle riêng của một head: khi đã promote thì
+được dùng thay head tương ứng của multihead_bundle; rollback về trước lần
+promote đầu tiên gỡ bundle riêng khỏi models/ để quay lại head của multi-head.
+
+    flask models list | promote <bundle> <version> | rollback <bundle>
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services.model_bundle import META_FILE
+from services.feedback_classifier import MODEL_DIR, MULTIHEAD_BUNDLE, SEVERITY_BUNDLE, TFIDF_BUNDLE
+
+REGISTRY_DIR = os.path.join(MODEL_DIR, 'registry')
+# Bundle riêng của một head, thay head đó của MULTIHEAD_BUNDLE khi có trong models/
+HEAD_OVERRIDE_BUNDLES = (TFIDF_BUNDLE, SEVERITY_BUNDLE)
+CARD_FILE = 'card.json'
+HISTORY_FILE = 'history.json'
+
+
+def data_fingerprint(paths: Iterable[str]) -> str:
+    """Hash nội dung các file dữ liệu huấn luyện (file không tồn tại bị bỏ qua)"""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        if not os.path.exists(path):
+            continue
+        h.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()[:12]
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _link_or_copy(src: str, dst: str):
+    """Hard link nếu được (cùng ổ đĩa, mảng không bị sửa sau khi ghi), không thì sao chép"""
+    tmp = f"{dst}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ModelRegistry:
+    def __init__(self, root: str = REGISTRY_DIR, model_dir: str = MODEL_DIR):
+        self.root = root
+        self.model_dir = model_dir
+
+    def version_path(self, bundle: str, version: str) -> str:
+        return os.path.join(self.root, bundle, version)
+
+    def active_path(self, bundle: str) -> str:
+        return os.path.join(self.model_dir, bundle)
+
+    def active_version(self, bundle: str) -> Optional[str]:
+        return _read_json(os.path.join(self.active_path(bundle), META_FILE), {}).get('version')
+
+    def card(self, bundle: str, version: str) -> Optional[Dict]:
+        return _read_json(os.path.join(self.version_path(bundle, version), CARD_FILE), None)
+
+    def versions(self, bundle: str) -> List[Dict]:
+        """Thẻ của mọi phiên bản đã đăng ký, cũ trước mới sau"""
+        base = os.path.join(self.root, bundle)
+        cards = [self.card(bundle, name) for name in os.listdir(base)] if os.path.isdir(base) else []
+        return sorted((c for c in cards if c), key=lambda c: c.get('created_at') or '')
+
+    def bundles(self) -> List[str]:
+        """Tên các bundle đang chạy hoặc đã có trong registry"""
+        names = {n for n in os.listdir(self.model_dir) if os.path.exists(os.path.join(self.model_dir, n, META_FILE))}
+        if os.path.isdir(self.root):
+            names |= {n for n in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, n))}
+        return sorted(names)
+
+    def history(self, bundle: str) -> List[Dict]:
+        return _read_json(os.path.join(self.root, bundle, HISTORY_FILE), [])
+
+    def register(self, bundle: str, write: Callable[[str], str], **card) -> str:
+        """Ghi một bundle mới vào registry; write(path) xuất bundle và trả về phiên bản.
+
+        card: metrics, data_hash, source, params... (lưu vào card.json)
+        """
+        staging = os.path.join(self.root, bundle, f".staging-{uuid.uuid4().hex[:8]}")
+        os.makedirs(staging)
+        try:
+            version = write(staging)
+            target = self.version_path(bundle, version)
+            if os.path.exists(target):
+                shutil.rmtree(staging)
+            else:
+                os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        existing = self.card(bundle, version) or {}
+        active = self.active_version(bundle)
+        _write_json(os.path.join(target, CARD_FILE), {
+            'bundle': bundle,
+            'version': version,
+            'created_at': existing.get('created_at') or datetime.now().isoformat(timespec='seconds'),
+            'parent': active if active != version else existing.get('parent'),
+            **{k: v for k, v in existing.items() if k not in ('bundle', 'version', 'created_at', 'parent')},
+            **card,
+        })
+        logging.info(f"Đã đăng ký {bundle} phiên bản {version}")
+        return version
+
+    def register_active(self, bundle: str) -> Optional[str]:
+        """Đăng ký bundle đang chạy (nếu chưa có trong registry) để có thể rollback về nó"""
+        version = self.active_version(bundle)
+        if version is None or self.card(bundle, version):
+            return version
+        source = self.active_path(bundle)
+
+        def copy(path):
+            meta = _read_json(os.path.join(source, META_FILE), {})
+            for filename in meta.get('files', {}).values():
+                _link_or_copy(os.path.join(source, filename), os.path.join(path, filename))
+            shutil.copy2(os.path.join(source, META_FILE), os.path.join(path, META_FILE))
+            return version
+
+        return self.register(bundle, copy, source='active')
+
+    def promote(self, bundle: str, version: str, reason: str = 'promote') -> str:
+        """Đưa một phiên bản đã đăng ký vào models/<bundle>/ (các worker tự nạp lại)"""
+        src = self.version_path(bundle, version)
+        meta = _read_json(os.path.join(src, META_FILE), None)
+        if meta is None:
+            raise ValueError(f"Không có {bundle} phiên bản {version} trong registry")
+        previous = self.register_active(bundle)
+        dst = self.active_path(bundle)
+        os.makedirs(dst, exist_ok=True)
+        for filename in meta['files'].values():
+            _link_or_copy(os.path.join(src, filename), os.path.join(dst, filename))
+        # meta.json được sao chép (không link) để mtime đổi và ClassifierRegistry nhận ra
+        shutil.copyfile(os.path.join(src, META_FILE), os.path.join(dst, META_FILE + '.tmp'))
+        os.replace(os.path.join(dst, META_FILE + '.tmp'), os.path.join(dst, META_FILE))
+        # Dọn mảng của phiên bản cũ (worker đang mmap vẫn giữ được file đã mở)
+        keep = set(meta['files'].values())
+        for name in os.listdir(dst):
+            if name.endswith('.npy') and name not in keep:
+                os.remove(os.path.join(dst, name))
+
+        history = self.history(bundle)
+        history.append({
+            'version': version,
+            'previous': previous,
+            'reason': reason,
+            'promoted_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        _write_json(os.path.join(self.root, bundle, HISTORY_FILE), history)
+        logging.info(f"{bundle}: {previous} -> {version} ({reason})")
+        return version
+
+    def rollback(self, bundle: str) -> Optional[str]:
+        """Quay về phiên bản chạy trước khi phiên bản hiện tại được promote (gọi lại để lùi tiếp).
+
+        Bundle riêng của một head chưa từng chạy trước đó thì được gỡ (trả về None).
+        """
+        active = self.active_version(bundle)
+        for entry in reversed(self.history(bundle)):
+            if entry['reason'] == 'rollback' or entry['version'] != active:
+                continue
+            if entry.get('previous') and entry['previous'] != active:
+                return self.promote(bundle, entry['previous'], reason='rollback')
+            if not entry.get('previous') and bundle in HEAD_OVERRIDE_BUNDLES and self.active_version(MULTIHEAD_BUNDLE):
+                return self.retire(bundle)
+            break
+        raise ValueError(f"Không có phiên bản trước của {bundle} để rollback")
+
+    def retire(self, bundle: str) -> None:
+        """Gỡ bundle khỏi models/ (meta.json xóa trước để các worker nạp lại ngay)"""
+        active = self.active_version(bundle)
+        dst = self.active_path(bundle)
+        os.remove(os.path.join(dst, META_FILE))
+        shutil.rmtree(dst, ignore_errors=True)
+        history = self.history(bundle)
+        history.append({
+            'version': None,
+            'previous': active,
+            'reason': 'rollback',
+            'promoted_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        _write_json(os.path.join(self.root, bundle, HISTORY_FILE), history)
+        logging.info(f"{bundle}: gỡ {active}, dùng lại head của {MULTIHEAD_BUNDLE}")
@@ -0,0 +1,119 @@
+"""Học trực tuyến từ các chỉnh sửa loại/mức độ của cán bộ.
+
+Khi cán bộ đổi loại (phan_anh/khieu_nai) hoặc mức độ của một phản ánh, một
+FeedbackCorrection được ghi lại. learn_pending() lấy các chỉnh sửa chưa học
+theo lô nhỏ, cập nhật head 'kind'/'severity' của mô hình multi-head bằng
+ModelHead.partial_fit trên ma trận TF-IDF sẵn có (không huấn luyện lại từ
+đầu) rồi đăng ký và promote một phiên bản bundle mới qua models/registry
+(`flask models rollback multihead_bundle` để quay lại). ClassifierRegistry của
+các worker tự nạp phiên bản đó ở lần kiểm tra kế tiếp; model_version đổi nên
+reclassifier sẽ cập nhật lại các phản ánh.
+
+    flask learn-corrections          # ví dụ chạy định kỳ bằng cron
+"""
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from app import db
+from models import Feedback, FeedbackCorrection
+
+LEARNABLE_FIELDS = ('kind', 'severity')
+BATCH_SIZE = 32
+# Tham số cập nhật cho mỗi lô (xem ModelHead.partial_fit)
+LEARNING_RATE = 0.5
+EPOCHS = 10
+
+
+def record_correction(fb: Feedback, field: str, new_value: str, user_id: Optional[int] = None):
+    """Ghi nhận cán bộ sửa fb.<field> và đánh dấu nguồn 'admin' để AI không ghi đè (chưa commit)"""
+    old_value = getattr(fb, field)
+    if field not in LEARNABLE_FIELDS or not new_value or new_value == old_value:
+        return None
+    correction = FeedbackCorrection(
+        feedback_id=fb.id,
+        field=field,
+        old_value=old_value,
+        new_value=new_value,
+        title=fb.title or '',
+        description=fb.description or '',
+        model_version=fb.model_version,
+        created_by=user_id,
+    )
+    setattr(fb, field, new_value)
+    setattr(fb, f'{field}_source', 'admin')
+    if field == 'severity':
+        fb.severity_confidence = 1.0
+    db.session.add(correction)
+    return correction
+
+
+def count_pending() -> int:
+    return FeedbackCorrection.query.filter(FeedbackCorrection.applied_at.is_(None)).count()
+
+
+def learn_pending(classifier=None, batch_size: int = BATCH_SIZE, limit: Optional[int] = None) -> Dict:
+    """Học các chỉnh sửa chưa học theo lô, công bố phiên bản mô hình mới; trả về thống kê"""
+    from services.feedback_classifier import MULTIHEAD_BUNDLE
+    from services.classifier_registry import get_classifier, reload_classifier
+    from services.model_registry import ModelRegistry
+
+    clf = classifier or get_classifier()
+    stats = {'learned': 0, 'skipped': 0, 'batches': 0, 'version': None}
+    bundle = clf.multihead_model
+    if bundle is None:
+        logging.warning("Chưa có models/multihead_bundle, bỏ qua học trực tuyến")
+        return stats
+
+    overridden = [f for f, model in (('kind', clf.tfidf_model), ('severity', clf.severity_model)) if model]
+    if overridden:
+        logging.warning(f"Head {overridden} đang dùng bundle riêng; chỉnh sửa học vào multihead_bundle "
+                        f"chỉ có hiệu lực sau khi gỡ bundle riêng (flask models rollback)")
+    heads = dict(bundle.heads)
+    consumed = []
+    last_id = 0
+    while limit is None or len(consumed) < limit:
+        size = batch_size if limit is None else min(batch_size, limit - len(consumed))
+        batch = (FeedbackCorrection.query
+                 .filter(FeedbackCorrection.applied_at.is_(None), FeedbackCorrection.id > last_id)
+                 .order_by(FeedbackCorrection.id)
+                 .limit(size)
+                 .all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for field in LEARNABLE_FIELDS:
+            rows = [c for c in batch if c.field == field]
+            if not rows:
+                continue
+            head = heads.get(field)
+            labels = [c.new_value for c in rows]
+            known = set(str(c) for c in head.classes_) if head is not None else set()
+            stats['skipped'] += sum(label not in known for label in labels)
+            if not known.intersection(labels):
+                continue
+            X = clf._vectorize([(c.title, c.description) for c in rows])
+            heads[field] = head.partial_fit(X, labels, learning_rate=LEARNING_RATE, epochs=EPOCHS)
+            stats['learned'] += sum(label in known for label in labels)
+        consumed.extend(batch)
+        stats['batches'] += 1
+
+    if not consumed:
+        return stats
+    version = bundle.version
+    if stats['learned']:
+        registry = ModelRegistry(os.path.join(clf.model_dir, 'registry'), clf.model_dir)
+        version = registry.register(MULTIHEAD_BUNDLE, lambda path: bundle.export(path, heads),
+                                    source='online', corrections=stats['learned'])
+        registry.promote(MULTIHEAD_BUNDLE, version, reason='online')
+        logging.info(f"Đã học {stats['learned']} chỉnh sửa, công bố mô hình multi-head phiên bản {version}")
+        if classifier is None:
+            reload_classifier()
+    now = datetime.utcnow()
+    for correction in consumed:
+        correction.applied_at = now
+        correction.applied_version = version
+    db.session.commit()
+    stats['version'] = version
+    return stats
@@ -1,36 +1,16 @@
 import os
 import openai
 import json
+import threading
 from typing import Dict, Optional
 import logging
+from services.llm_cache import get_llm_cache, prompt_version
 
-class OpenAIService:
-    def __init__(self):
-        # Đọc API key từ file cấu hình
-        try:
-            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'api_config.json')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                self.api_key = config.get('openai', {}).get('api_key')
-        except Exception as e:
-            logging.error(f"Không thể đọc file cấu hình API: {str(e)}")
-            self.api_key = None
-            
-        # Cập nhật API key mới
-        if not self.api_key:
-            logging.warning("OpenAI API key chưa được cấu hình trong config/api_config.json")
-            self.api_key = None
-            
-        openai.api_key = self.api_key
-        
-    def analyze_feedback(self, title: str, content: str) -> Optional[Dict]:
-        """Phân tích phản ánh/khiếu nại sử dụng OpenAI API"""
-        if not self.api_key:
-            return None
-            
-        try:
-            # Tạo prompt để phân tích
-            system_prompt = """Bạn là một chuyên gia phân tích phản ánh, khiếu nại của người dân. 
+MODEL = "gpt-3.5-turbo"
+TEMPERATURE = 0.3
+MAX_TOKENS = 200
+
+SYSTEM_PROMPT = """Bạn là một chuyên gia phân tích phản ánh, khiếu nại của người dân. 
 Nhiệm vụ của bạn là phân tích mức độ nghiêm trọng của vấn đề dựa trên các tiêu chí:
 
 1. Mức độ nghiêm trọng (severity):
@@ -49,20 +29,79 @@ Trả về kết quả theo định dạng JSON:
     "reason": "Lý do phân loại..."
 }"""
 
-            user_prompt = f"""Tiêu đề: {title}
+USER_PROMPT = """Tiêu đề: {title}
 Nội dung: {content}
 
 Hãy phân tích mức độ nghiêm trọng của phản ánh/khiếu nại trên."""
 
-            client = openai.OpenAI(api_key=self.api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+# Đổi prompt/model/tham số sẽ đổi phiên bản => các kết quả cache cũ tự hết hiệu lực
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, USER_PROMPT, MODEL, TEMPERATURE, MAX_TOKENS)
+
+class OpenAIService:
+    # Client HTTP dùng lại giữa các lời gọi (giữ kết nối keep-alive), theo (api_key, base_url)
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: float = 20.0):
+        self.timeout = timeout
+        self.base_url = base_url or os.environ.get('OPENAI_BASE_URL')
+        self.api_key = api_key
+        # Đọc API key từ file cấu hình
+        if api_key is None:
+            try:
+                config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'api_config.json')
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                    self.api_key = config.get('openai', {}).get('api_key')
+                    self.base_url = self.base_url or config.get('openai', {}).get('base_url')
+            except Exception as e:
+                logging.error(f"Không thể đọc file cấu hình API: {str(e)}")
+                self.api_key = None
+            
+        # Cập nhật API key mới
+        if not self.api_key:
+            logging.warning("OpenAI API key chưa được cấu hình trong config/api_config.json")
+            self.api_key = None
+            
+        openai.api_key = self.api_key
+
+    def _client(self):
+        key = (self.api_key, self.base_url)
+        client = self._clients.get(key)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(key)
+                if client is None:
+                    # Không tự retry: việc thử lại do LLMClientPool/severity_queue quyết định
+                    client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                           timeout=self.timeout, max_retries=0)
+                    self._clients[key] = client
+        return client
+        
+    def analyze_feedback(self, title: str, content: str) -> Optional[Dict]:
+        """Phân tích phản ánh/khiếu nại sử dụng OpenAI API (có cache theo nội dung)"""
+        if not self.api_key:
+            return None
+        cache = get_llm_cache()
+        if cache is None:
+            return self._call_api(title, content)
+        return cache.cached_call('openai', MODEL, PROMPT_VERSION, title, content,
+                                 lambda: self._call_api(title, content))
+
+    def _call_api(self, title: str, content: str) -> Optional[Dict]:
+        try:
+            # Tạo prompt để phân tích
+            system_prompt = SYSTEM_PROMPT
+            user_prompt = USER_PROMPT.format(title=title, content=content)
+
+            response = self._client().chat.completions.create(
+                model=MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.3,
-                max_tokens=200
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
             )
             
             result = json.loads(response.choices[0].message.content)
@@ -0,0 +1,47 @@
+"""Thống kê dân cư tính bằng truy vấn gộp (GROUP BY) thay vì nạp mọi hộ và nhân khẩu.
+
+Quy ước đếm người giữ như trang tổng quan cũ: hộ không có nhân khẩu nào có
+quan hệ 'Chủ hộ' thì chủ hộ (Household.head_of_household) được tính thêm
+một người.
+"""
+from typing import Dict, List
+
+from sqlalchemy import case, func, select
+
+from app import db
+from models import Household, Resident
+
+HEAD_RELATIONSHIP = 'Chủ hộ'
+
+
+def household_residents():
+    """Một lượt GROUP BY trên resident: số nhân khẩu và có 'Chủ hộ' hay không của từng hộ"""
+    return (select(Resident.household_id,
+                   func.count().label('n'),
+                   func.max(case((Resident.relationship == HEAD_RELATIONSHIP, 1), else_=0)).label('has_head'))
+            .group_by(Resident.household_id)
+            .subquery())
+
+
+def hamlet_stats() -> List[Dict]:
+    """Số hộ và số người theo thôn/xóm (theo thứ tự hộ đầu tiên của mỗi thôn)"""
+    per_household = household_residents()
+    people = func.coalesce(per_household.c.n, 0) + 1 - func.coalesce(per_household.c.has_head, 0)
+    rows = db.session.execute(
+        select(Household.hamlet, func.count(Household.id), func.sum(people))
+        .outerjoin(per_household, per_household.c.household_id == Household.id)
+        .group_by(Household.hamlet)
+        .order_by(func.min(Household.id))
+    ).all()
+    return [{'hamlet': hamlet, 'households': households, 'residents': int(residents or 0)}
+            for hamlet, households, residents in rows]
+
+
+def households_without_head() -> int:
+    """Số hộ chưa có nhân khẩu nào là 'Chủ hộ'"""
+    per_household = household_residents()
+    return db.session.scalar(
+        select(func.count(Household.id))
+        .outerjoin(per_household, per_household.c.household_id == Household.id)
+        .where(func.coalesce(per_household.c.has_head, 0) == 0)
+    ) or 0
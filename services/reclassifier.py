@@ -0,0 +1,243 @@
+"""Phân loại lại tăng dần các phản ánh.
+
+Chỉ xử lý các dòng có model_version khác phiên bản bộ phân loại hiện tại
+(hoặc chưa có text_hash, hoặc nội dung đã sửa — khi đó model_version bị xóa).
+Các dòng được duyệt theo id tăng dần, mỗi chunk một lần commit; sau mỗi chunk
+checkpoint được ghi ra file để lần chạy bị ngắt sau tiếp tục từ chỗ dừng.
+
+reclassify_parallel() (lệnh `flask reclassify`) dành cho bảng lớn: tiến trình
+cha đọc id/nội dung theo chunk, một nhóm tiến trình con (mỗi tiến trình nạp mô
+hình một lần) phân loại, rồi tiến trình cha ghi mỗi chunk bằng một UPDATE hàng
+loạt theo khóa chính.
+"""
+import os
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+
+from app import db
+from models import Feedback
+
+CHUNK_SIZE = 200
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'reclassify_checkpoint.json')
+# Chỉ đổi loại phản ánh/khiếu nại khi bộ phân loại đủ tin cậy
+KIND_CONFIDENCE = 0.7
+
+
+def _read_checkpoint(path: str) -> Dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_checkpoint(path: str, data: Dict):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def stale_filter(model_version: str):
+    """Điều kiện SQL chọn các phản ánh cần phân loại lại"""
+    return or_(
+        Feedback.model_version.is_(None),
+        Feedback.model_version != model_version,
+        Feedback.text_hash.is_(None),
+    )
+
+
+def count_stale(model_version: str) -> int:
+    return Feedback.query.filter(stale_filter(model_version)).count()
+
+
+def result_updates(fb, result: Dict, stats: Dict) -> Dict:
+    """Các cột loại/mức độ cần đổi theo kết quả phân loại (fb: Feedback hoặc dòng có cùng cột);
+    giá trị do cán bộ sửa hoặc LLM tinh chỉnh được giữ nguyên"""
+    updates = {}
+    if fb.kind_source != 'admin' and result['confidence'] >= KIND_CONFIDENCE and fb.kind != result['label']:
+        updates['kind'] = result['label']
+        stats['updated_kind'] += 1
+        logging.info(f"Cập nhật phân loại ID {fb.id}: {fb.kind} -> {result['label']} (tin cậy: {result['confidence']:.0%})")
+
+    severity, severity_confidence = result['severity'], result['severity_confidence']
+    if fb.severity_source not in ('llm', 'admin') and (fb.severity != severity or fb.severity_confidence != severity_confidence):
+        updates['severity'] = severity
+        updates['severity_confidence'] = severity_confidence
+        updates['severity_source'] = result['severity_tier']
+        stats['updated_severity'] += 1
+        logging.info(f"Cập nhật mức độ ID {fb.id}: {fb.severity} -> {severity} (tin cậy: {severity_confidence:.0%})")
+    return updates
+
+
+def apply_result(fb: Feedback, result: Dict, stats: Dict):
+    """Ghi kết quả phân loại vào phản ánh"""
+    from services.severity_queue import enqueue_refinement
+
+    updates = result_updates(fb, result, stats)
+    for key, value in updates.items():
+        setattr(fb, key, value)
+    if 'severity' in updates and result['severity_ambiguous']:
+        enqueue_refinement(fb.id)
+    fb.store_classification(result)
+
+
+def reclassify(classifier=None, full: bool = False, chunk_size: int = CHUNK_SIZE,
+               checkpoint_path: Optional[str] = CHECKPOINT_PATH, limit: Optional[int] = None) -> Dict:
+    """Phân loại lại các phản ánh lỗi thời (full=True: tất cả); trả về thống kê"""
+    if classifier is None:
+        from services.classifier_registry import get_classifier
+        classifier = get_classifier()
+    version = classifier.model_version
+
+    last_id = 0
+    checkpoint = _read_checkpoint(checkpoint_path) if checkpoint_path else {}
+    if checkpoint.get('model_version') == version and checkpoint.get('full') == full:
+        last_id = checkpoint.get('last_id', 0)
+        logging.info(f"Tiếp tục phân loại lại từ ID {last_id}")
+
+    stats = {'checked': 0, 'updated_kind': 0, 'updated_severity': 0, 'resumed_from': last_id}
+    query = Feedback.query if full else Feedback.query.filter(stale_filter(version))
+    finished = False
+    while limit is None or stats['checked'] < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - stats['checked'])
+        chunk = query.filter(Feedback.id > last_id).order_by(Feedback.id).limit(size).all()
+        if not chunk:
+            finished = True
+            break
+        results = classifier.classify_many(((fb.title, fb.description) for fb in chunk), use_llm=False)
+        for fb, result in zip(chunk, results):
+            apply_result(fb, result, stats)
+        db.session.commit()
+
+        last_id = chunk[-1].id
+        stats['checked'] += len(chunk)
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, {'model_version': version, 'full': full, 'last_id': last_id})
+
+    # Dừng vì đủ limit thì giữ checkpoint cho lần chạy sau
+    stats['finished'] = finished
+    if finished and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+
+# --- Phân loại lại song song nhiều tiến trình (flask reclassify) ---
+
+# Các trường của kết quả phân loại mà tiến trình cha cần để ghi lại
+RESULT_FIELDS = ('label', 'confidence', 'method', 'important_terms', 'model_version',
+                 'severity', 'severity_confidence', 'severity_tier', 'severity_ambiguous')
+
+_worker_classifier = None
+
+
+def _init_worker(token_cache_path: Optional[str]):
+    """Chạy một lần trong mỗi tiến trình con: nạp (hoặc nhận qua fork) bộ phân loại"""
+    global _worker_classifier
+    from services.classifier_registry import get_classifier
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_classifier = get_classifier()
+    if token_cache_path:
+        # Mỗi tiến trình mở kết nối SQLite riêng tới cache tách từ
+        _worker_classifier.enable_token_cache(token_cache_path)
+
+
+def _classify_chunk(items: List[Tuple[int, str, str]]) -> List[Tuple[int, Dict]]:
+    results = _worker_classifier.classify_many(((title, description) for _, title, description in items), use_llm=False)
+    if _worker_classifier.preprocessor.disk_cache:
+        _worker_classifier.preprocessor.disk_cache.flush()
+    return [(fid, {k: r.get(k) for k in RESULT_FIELDS}) for (fid, _, _), r in zip(items, results)]
+
+
+def _write_chunk(classified: List[Tuple[int, Dict]], texts: Dict[int, Tuple[str, str]], stats: Dict, dry_run: bool):
+    """Ghi kết quả một chunk bằng một UPDATE hàng loạt theo khóa chính"""
+    from services.severity_queue import enqueue_refinement
+
+    ids = [fid for fid, _ in classified]
+    # Đọc lại các cột có thể bị cán bộ sửa trong lúc đang phân loại
+    current = {row.id: row for row in db.session.query(
+        Feedback.id, Feedback.title, Feedback.description, Feedback.kind, Feedback.kind_source,
+        Feedback.severity, Feedback.severity_confidence, Feedback.severity_source,
+    ).filter(Feedback.id.in_(ids))}
+    values, refine = [], []
+    for fid, result in classified:
+        row = current.get(fid)
+        if row is None:
+            continue
+        if Feedback.compute_text_hash(row.title, row.description) != Feedback.compute_text_hash(*texts[fid]):
+            # Nội dung đã bị sửa sau khi đọc: kết quả không còn đúng, để dòng lỗi thời cho lần chạy sau
+            stats['skipped_edited'] += 1
+            continue
+        updates = result_updates(row, result, stats)
+        if 'severity' in updates and result['severity_ambiguous']:
+            refine.append(fid)
+        values.append({'id': fid, **updates, **Feedback.classification_values(result, *texts[fid])})
+    stats['checked'] += len(values)
+    if dry_run:
+        return
+    if values:
+        db.session.execute(update(Feedback), values)
+    for fid in refine:
+        enqueue_refinement(fid)
+    db.session.commit()
+
+
+def reclassify_parallel(workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE, full: bool = False,
+                        since: Optional[datetime] = None, dry_run: bool = False,
+                        token_cache_path: Optional[str] = None, progress=None) -> Dict:
+    """Phân loại lại bằng nhóm tiến trình: tiến trình cha đọc id theo chunk, các tiến trình con
+    phân loại, tiến trình cha ghi kết quả; trả về thống kê như reclassify()"""
+    from services.classifier_registry import get_classifier
+
+    workers = workers or os.cpu_count() or 1
+    # Nạp trước ở tiến trình cha để các tiến trình con fork dùng chung mô hình
+    version = get_classifier().model_version
+    query = db.session.query(Feedback.id, Feedback.title, Feedback.description)
+    if not full:
+        query = query.filter(stale_filter(version))
+    if since is not None:
+        query = query.filter(Feedback.created_at >= since)
+
+    stats = {'checked': 0, 'updated_kind': 0, 'updated_severity': 0, 'skipped_edited': 0, 'chunks': 0,
+             'workers': workers}
+    texts: Dict[int, Tuple[str, str]] = {}
+    last_id = 0
+    exhausted = False
+    pending = set()
+    # Dọn kết nối đang mở trước khi fork để tiến trình con không dùng chung socket/file CSDL
+    db.session.remove()
+    db.engine.dispose()
+    ctx = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(token_cache_path,)) as pool:
+        while pending or not exhausted:
+            # Giữ tối đa 2 chunk mỗi tiến trình đang chờ để bộ nhớ không tăng theo số dòng
+            while not exhausted and len(pending) < workers * 2:
+                rows = query.filter(Feedback.id > last_id).order_by(Feedback.id).limit(chunk_size).all()
+                if not rows:
+                    exhausted = True
+                    break
+                last_id = rows[-1].id
+                items = [(row.id, row.title or '', row.description or '') for row in rows]
+                texts.update((fid, (title, description)) for fid, title, description in items)
+                pending.add(pool.submit(_classify_chunk, items))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                classified = future.result()
+                _write_chunk(classified, texts, stats, dry_run)
+                for fid, _ in classified:
+                    texts.pop(fid, None)
+                stats['chunks'] += 1
+                if progress:
+                    progress(stats)
+    if dry_run:
+        db.session.rollback()
+    return stats
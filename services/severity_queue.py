@@ -0,0 +1,183 @@
+"""Hàng đợi tinh chỉnh mức độ nghiêm trọng bằng LLM, chạy ngoài request.
+
+Khi gửi phản ánh, mức độ được tính ngay bằng luật/mô hình cục bộ và một
+SeverityJob được thêm vào bảng severity_job. Worker (luồng nền trong mỗi
+tiến trình web, hoặc lệnh `flask severity-worker`) nhận job, gọi LLM rồi cập
+nhật Feedback.severity/severity_confidence. Job nằm trong CSDL nên vẫn còn
+sau khi khởi động lại; job bị treo quá LEASE_SECONDS được trả lại hàng đợi.
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import update
+
+from app import db
+from models import Feedback, SeverityJob
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+LEASE_SECONDS = 300
+POLL_SECONDS = 5
+# Số job nhận mỗi lượt; các lời gọi LLM trong một lượt chạy song song qua LLMClientPool
+BATCH_SIZE = 8
+
+_worker_lock = threading.Lock()
+_worker_thread: Optional[threading.Thread] = None
+
+
+def enqueue_refinement(feedback_id: int) -> Optional[SeverityJob]:
+    """Thêm job tinh chỉnh cho phản ánh nếu chưa có job đang chờ (người gọi tự commit)"""
+    existing = SeverityJob.query.filter(
+        SeverityJob.feedback_id == feedback_id,
+        SeverityJob.status.in_(('pending', 'running'))
+    ).first()
+    if existing:
+        if existing.status == 'pending':
+            existing.next_run_at = datetime.utcnow()
+        return existing
+    job = SeverityJob(feedback_id=feedback_id, status='pending', next_run_at=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)))
+
+
+def recover_stale_jobs() -> int:
+    """Trả các job 'running' quá hạn (worker chết giữa chừng) về trạng thái chờ"""
+    cutoff = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+    res = db.session.execute(
+        update(SeverityJob)
+        .where(SeverityJob.status == 'running', SeverityJob.locked_at < cutoff)
+        .values(status='pending', locked_at=None)
+    )
+    db.session.commit()
+    return res.rowcount or 0
+
+
+def _claim_batch(limit: int) -> List[SeverityJob]:
+    """Nhận tối đa limit job đến hạn; UPDATE có điều kiện để nhiều worker không nhận trùng"""
+    now = datetime.utcnow()
+    candidates = db.session.query(SeverityJob.id).filter(
+        SeverityJob.status == 'pending',
+        SeverityJob.next_run_at <= now
+    ).order_by(SeverityJob.next_run_at, SeverityJob.id).limit(limit).all()
+    claimed = []
+    for (job_id,) in candidates:
+        res = db.session.execute(
+            update(SeverityJob)
+            .where(SeverityJob.id == job_id, SeverityJob.status == 'pending')
+            .values(status='running', locked_at=now)
+        )
+        if res.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return [db.session.get(SeverityJob, job_id) for job_id in claimed]
+
+
+def process_jobs(jobs: List[SeverityJob], classifier=None) -> List[str]:
+    """Chạy các job đã nhận (gọi LLM song song qua pool); trả về trạng thái mới của từng job"""
+    if classifier is None:
+        from services.classifier_registry import get_classifier
+        classifier = get_classifier()
+    llm_ready = classifier.llm_available
+    # Đọc phản ánh trước khi sửa job: get() không tự flush UPDATE nào, nên chưa mở giao dịch ghi
+    feedbacks = {job.id: db.session.get(Feedback, job.feedback_id) for job in jobs}
+    to_refine = []
+    for job in jobs:
+        job.attempts = (job.attempts or 0) + 1
+        fb = feedbacks[job.id]
+        if fb is None:
+            job.status = 'skipped'
+            job.last_error = 'Phản ánh không còn tồn tại'
+        elif fb.severity_source == 'admin':
+            job.status = 'skipped'
+            job.last_error = 'Cán bộ đã sửa mức độ'
+        elif not llm_ready:
+            # Không có API key: thử lại cũng vô ích, giữ kết quả cục bộ
+            job.status = 'skipped'
+            job.last_error = 'Chưa cấu hình API LLM'
+        else:
+            to_refine.append((job, fb.title or '', fb.description or ''))
+        if job.status != 'running':
+            job.locked_at = None
+    # Ghi số lần thử rồi commit ngay: không giữ khóa ghi SQLite trong lúc chờ LLM (locked_at vẫn giữ lease)
+    db.session.commit()
+
+    refined_all = classifier.refine_severity_many(
+        [(title, description) for _, title, description in to_refine]
+    ) if to_refine else []
+    # Áp kết quả trong một giao dịch ngắn; đọc lại phản ánh vì cán bộ có thể đã sửa trong lúc chờ
+    for (job, _, _), refined in zip(to_refine, refined_all):
+        job.locked_at = None
+        fb = db.session.get(Feedback, job.feedback_id)
+        if fb is None or fb.severity_source == 'admin':
+            job.status = 'skipped'
+            job.last_error = 'Phản ánh không còn tồn tại' if fb is None else 'Cán bộ đã sửa mức độ'
+        elif refined:
+            fb.severity, fb.severity_confidence = refined
+            fb.severity_source = 'llm'
+            job.status = 'done'
+            job.last_error = None
+            logging.info(f"Tinh chỉnh mức độ ID {fb.id}: {fb.severity} ({fb.severity_confidence:.0%})")
+        elif job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.last_error = 'LLM không trả về kết quả'
+        else:
+            job.status = 'pending'
+            job.next_run_at = datetime.utcnow() + _retry_delay(job.attempts)
+            job.last_error = 'LLM không trả về kết quả'
+    db.session.commit()
+    return [job.status for job in jobs]
+
+
+def process_job(job: SeverityJob, classifier=None) -> str:
+    return process_jobs([job], classifier)[0]
+
+
+def run_pending(max_jobs: Optional[int] = None, batch_size: int = BATCH_SIZE) -> int:
+    """Xử lý các job đến hạn cho tới khi hết (hoặc đủ max_jobs); trả về số job đã chạy"""
+    recover_stale_jobs()
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        limit = batch_size if max_jobs is None else min(batch_size, max_jobs - processed)
+        jobs = _claim_batch(limit)
+        if not jobs:
+            break
+        try:
+            process_jobs(jobs)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Severity jobs {[j.id for j in jobs]} lỗi: {str(e)}")
+        processed += len(jobs)
+    return processed
+
+
+def _worker_loop(app):
+    while True:
+        try:
+            with app.app_context():
+                run_pending()
+                db.session.remove()
+        except Exception as e:
+            logging.error(f"Severity worker lỗi: {str(e)}")
+        time.sleep(app.config.get('SEVERITY_WORKER_POLL', POLL_SECONDS))
+
+
+def ensure_worker(app):
+    """Khởi động luồng worker nền của tiến trình hiện tại (chỉ một lần)"""
+    global _worker_thread
+    if app.config.get('SEVERITY_WORKER', 'thread') != 'thread':
+        return
+    if _worker_thread is not None and _worker_thread.is_alive():
+        return
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, args=(app,), name='severity-worker', daemon=True)
+        _worker_thread.start()
@@ -0,0 +1,151 @@
+"""Chạy shadow một mô hình ứng viên bên cạnh mô hình đang chạy.
+
+Đặt SHADOW_MODEL=<bundle>:<phiên bản trong models/registry> (ví dụ
+multihead_bundle:1c08fc3bf020). Mỗi phản ánh mới được bộ phân loại ứng viên
+chấm lại ở luồng nền (không gọi LLM); kết quả người dân/cán bộ thấy vẫn là của
+mô hình đang chạy. Ứng viên tfidf_bundle/severity_bundle thay head tương ứng
+của multihead_bundle, đúng như khi được promote. Mỗi lần so sánh được ghi một dòng JSON vào logs/shadow.jsonl
+(trường khác nhau, độ trễ hai mô hình) để `flask models shadow-report` tổng hợp.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SHADOW_LOG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'shadow.jsonl')
+COMPARED_FIELDS = ('label', 'severity', 'category')
+# Số lô tối đa đang chờ; quá thì bỏ qua để shadow không làm chậm ứng dụng
+MAX_PENDING = 8
+
+
+class ShadowEvaluator:
+    def __init__(self, candidate, bundle: str, version: str, sample_rate: float = 1.0, log_path: str = SHADOW_LOG):
+        self.candidate = candidate
+        self.bundle = bundle
+        self.version = version
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.dropped = 0
+
+    def observe(self, items: List[Tuple[str, str]], results: List[Dict], active_seconds: float,
+                active_version: Optional[str] = None):
+        """Đưa một lô đã phân loại bởi mô hình đang chạy vào hàng chờ so sánh (không chặn)"""
+        if not items or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= MAX_PENDING:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self._executor.submit(self._compare, list(items), results, active_seconds, active_version)
+
+    def _compare(self, items, results, active_seconds, active_version):
+        try:
+            self.compare(items, results, active_seconds, active_version)
+        except Exception as e:
+            logging.error(f"Shadow evaluation failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def compare(self, items, results, active_seconds, active_version=None) -> List[Dict]:
+        """Chấm lô bằng mô hình ứng viên, ghi và trả về các bản ghi so sánh"""
+        start = time.perf_counter()
+        shadow_results = self.candidate.classify_many(items, use_llm=False)
+        shadow_seconds = time.perf_counter() - start
+        records = []
+        for active, shadow in zip(results, shadow_results):
+            records.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'bundle': self.bundle,
+                'candidate': self.version,
+                'active_model': active_version or active.get('model_version'),
+                'active_ms': round(active_seconds / len(items) * 1000, 3),
+                'shadow_ms': round(shadow_seconds / len(items) * 1000, 3),
+                'active': {f: active.get(f) for f in COMPARED_FIELDS},
+                'shadow': {f: shadow.get(f) for f in COMPARED_FIELDS},
+                'disagree': [f for f in COMPARED_FIELDS if active.get(f) != shadow.get(f)],
+            })
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with self._lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return records
+
+
+def summarize(records: List[Dict]) -> Dict:
+    """Tỉ lệ bất đồng theo trường và độ trễ (p50/p95) của hai mô hình"""
+    if not records:
+        return {'rows': 0}
+    active_ms = np.array([r['active_ms'] for r in records])
+    shadow_ms = np.array([r['shadow_ms'] for r in records])
+    return {
+        'rows': len(records),
+        'disagreement': {f: sum(f in r['disagree'] for r in records) / len(records) for f in COMPARED_FIELDS},
+        'active_ms': {'p50': float(np.percentile(active_ms, 50)), 'p95': float(np.percentile(active_ms, 95))},
+        'shadow_ms': {'p50': float(np.percentile(shadow_ms, 50)), 'p95': float(np.percentile(shadow_ms, 95))},
+    }
+
+
+def read_log(path: str = SHADOW_LOG, candidate: Optional[str] = None) -> List[Dict]:
+    records = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if candidate is None or record.get('candidate') == candidate:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
+
+
+def build_evaluator(spec: str, sample_rate: float = 1.0, registry=None) -> ShadowEvaluator:
+    """ShadowEvaluator cho spec '<bundle>:<version>' (phiên bản phải có trong models/registry)"""
+    from services.feedback_classifier import FeedbackClassifier, MULTIHEAD_BUNDLE, SEVERITY_BUNDLE, TFIDF_BUNDLE
+    from services.model_registry import ModelRegistry
+
+    bundle, _, version = spec.partition(':')
+    if bundle not in (MULTIHEAD_BUNDLE, TFIDF_BUNDLE, SEVERITY_BUNDLE):
+        raise ValueError(f"Bộ phân loại không dùng bundle {bundle}")
+    registry = registry or ModelRegistry()
+    path = registry.version_path(bundle, version)
+    if not registry.card(bundle, version):
+        raise ValueError(f"Không có {bundle} phiên bản {version} trong registry")
+    candidate = FeedbackClassifier(model_dir=registry.model_dir, bundle_paths={bundle: path})
+    return ShadowEvaluator(candidate, bundle, version, sample_rate)
+
+
+_evaluator = None
+_evaluator_spec = None
+_evaluator_lock = threading.Lock()
+
+
+def get_shadow() -> Optional[ShadowEvaluator]:
+    """ShadowEvaluator theo biến môi trường SHADOW_MODEL; None nếu không bật"""
+    global _evaluator, _evaluator_spec
+    spec = os.environ.get('SHADOW_MODEL', '').strip()
+    if not spec:
+        return None
+    with _evaluator_lock:
+        if spec != _evaluator_spec:
+            _evaluator_spec = spec
+            try:
+                _evaluator = build_evaluator(spec, float(os.environ.get('SHADOW_SAMPLE_RATE', 1.0)))
+            except Exception as e:
+                logging.error(f"Không bật được shadow {spec}: {e}")
+                _evaluator = None
+        return _evaluator
@@ -0,0 +1,90 @@
+"""Cấu hình engine SQLite cho chạy thật (WAL, busy_timeout, mmap, cache...).
+
+Cấu hình cũ (pool_pre_ping, pool_recycle=300) dành cho CSDL qua mạng; với một
+file SQLite, các cán bộ sửa dữ liệu cùng lúc người dân gửi phản ánh thì hay gặp
+"database is locked". Hồ sơ 'wal' đặt các PRAGMA sau cho mỗi kết nối mới (sự
+kiện connect của engine):
+
+- journal_mode=WAL: người đọc không chặn người ghi và ngược lại
+- synchronous=NORMAL: an toàn với WAL, bớt fsync mỗi lần commit
+- busy_timeout: chờ khóa ghi thay vì báo lỗi ngay
+- mmap_size, cache_size, temp_store=MEMORY: đọc/sắp xếp trong bộ nhớ
+
+Chọn hồ sơ bằng SQLITE_PROFILE ('wal' mặc định, 'legacy' giữ cấu hình cũ);
+ghi đè từng PRAGMA bằng SQLITE_PRAGMAS, ví dụ "mmap_size=0,cache_size=-16000".
+"""
+import logging
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES: Dict[str, Dict[str, object]] = {
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 15000,  # ms
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # số âm: KiB (64 MB)
+        'temp_store': 'MEMORY',
+    },
+    'legacy': {},
+}
+# Tùy chọn engine cũ (giữ để so sánh trong benchmark)
+LEGACY_ENGINE_OPTIONS = {'pool_recycle': 300, 'pool_pre_ping': True}
+
+
+def is_sqlite_file(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def parse_pragmas(spec: str) -> Dict[str, str]:
+    """"a=1,b=2" -> {'a': '1', 'b': '2'}"""
+    pragmas = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            key, value = (part.strip() for part in item.split('=', 1))
+            if not key.isidentifier() or not value.replace('-', '').isalnum():
+                raise ValueError(f"PRAGMA không hợp lệ: {item}")
+            pragmas[key.lower()] = value
+    return pragmas
+
+
+def resolve(profile: str, overrides: str = '') -> Dict[str, object]:
+    if profile not in PROFILES:
+        raise ValueError(f"SQLITE_PROFILE không hợp lệ: {profile} (chọn {', '.join(PROFILES)})")
+    return {**PROFILES[profile], **parse_pragmas(overrides)}
+
+
+def engine_options(profile: str, pragmas: Dict[str, object]) -> Dict:
+    """Tùy chọn create_engine phù hợp với một file SQLite"""
+    if profile == 'legacy':
+        return dict(LEGACY_ENGINE_OPTIONS)
+    busy_ms = int(pragmas.get('busy_timeout', 5000))
+    # File cục bộ không bị mạng cắt kết nối: không cần ping/recycle. Mỗi luồng giữ
+    # một kết nối trong pool; timeout của sqlite3 trùng busy_timeout.
+    return {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'connect_args': {'timeout': busy_ms / 1000},
+    }
+
+
+def register(engine, pragmas: Dict[str, object]):
+    """Đặt PRAGMA cho mỗi kết nối mới của engine"""
+    if not pragmas:
+        return
+    # journal_mode đặt trước (lưu trong file); các PRAGMA khác chỉ có hiệu lực cho kết nối
+    ordered = sorted(pragmas.items(), key=lambda item: item[0] != 'journal_mode')
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in ordered:
+                cursor.execute(f'PRAGMA {key}={value}')
+        except Exception:
+            logging.exception("Không đặt được PRAGMA SQLite")
+        finally:
+            cursor.close()
@@ -0,0 +1,131 @@
+"""Chuẩn hóa và tách từ tiếng Việt cho FeedbackClassifier, có bộ nhớ đệm.
+
+- Bộ nhớ đệm LRU trong tiến trình, khóa theo hash nội dung, dùng chung cho
+  bước luật và bước TF-IDF.
+- Bộ nhớ đệm trên đĩa (SQLite) tùy chọn cho các job chạy hàng loạt.
+- Hai chế độ tách từ: 'underthesea' (mặc định) và 'regex' (nhanh hơn nhiều;
+  so sánh bằng scripts/compare_tokenizers.py).
+
+underthesea chỉ được import ở lần tách từ đầu tiên (hoặc khi gọi warm_up),
+nên các tiến trình dùng 'regex' hay không phân loại phản ánh không phải trả
+chi phí nạp thư viện và từ điển của nó.
+"""
+import re
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+TOKENIZERS = ('underthesea', 'regex')
+DEFAULT_DISK_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'token_cache.db')
+_WORD_RE = re.compile(r'\w+')
+_word_tokenize = None
+
+
+def get_word_tokenize():
+    """underthesea.word_tokenize, import lần đầu khi cần"""
+    global _word_tokenize
+    if _word_tokenize is None:
+        from underthesea import word_tokenize
+        _word_tokenize = word_tokenize
+    return _word_tokenize
+
+
+class DiskTokenCache:
+    """Lưu văn bản đã tách từ vào một file SQLite để các lần chạy sau dùng lại"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._pending = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM tokens WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO tokens (key, value) VALUES (?, ?)", (key, value))
+            self._pending += 1
+            if self._pending >= 500:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+class TextPreprocessor:
+    def __init__(self, tokenizer: str = 'underthesea', max_entries: int = 4096,
+                 disk_cache: Optional[DiskTokenCache] = None):
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Tokenizer không hợp lệ: {tokenizer}")
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.disk_cache = disk_cache
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.tokenizer}\x00{text}".encode('utf-8')).hexdigest()
+
+    def _tokenize(self, text: str) -> str:
+        # Convert to lowercase and normalize spaces
+        text = text.lower().strip()
+        text = re.sub(r'\s+', ' ', text)
+
+        # Remove special characters but keep Vietnamese diacritics
+        text = re.sub(r'[^\w\s\u0080-ɏ]', ' ', text)
+
+        # Word tokenization for Vietnamese
+        if self.tokenizer == 'regex':
+            return ' '.join(_WORD_RE.findall(text))
+        try:
+            return ' '.join(get_word_tokenize()(text))
+        except Exception:
+            return text
+
+    def preprocess(self, text: str) -> str:
+        """Văn bản đã chuẩn hóa + tách từ, lấy từ cache nếu đã xử lý trước đó"""
+        key = self._key(text)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        result = self.disk_cache.get(key) if self.disk_cache else None
+        if result is None:
+            result = self._tokenize(text)
+            if self.disk_cache:
+                self.disk_cache.set(key, result)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def warm_up(self):
+        """Nạp trước thư viện và mô hình tách từ (lần gọi đầu của underthesea mất vài trăm ms)"""
+        if self.tokenizer == 'underthesea':
+            get_word_tokenize()('khởi động bộ tách từ')
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
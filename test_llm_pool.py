@@ -0,0 +1,144 @@
+"""Kiểm tra LLMClientPool với một endpoint OpenAI giả chạy cục bộ."""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.llm_pool import LLMClientPool
+from services.openai_service import OpenAIService
+
+
+class FakeOpenAI:
+    """Máy chủ HTTP giả lập /v1/chat/completions"""
+
+    def __init__(self, mode='ok', delay=0.0):
+        self.mode = mode
+        self.delay = delay
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    time.sleep(fake.delay)
+                    if fake.mode == 'error':
+                        self.send_response(500)
+                        self.send_header('Content-Type', 'application/json')
+                        self.end_headers()
+                        self.wfile.write(b'{"error": {"message": "boom"}}')
+                        return
+                    content = json.dumps({'severity': 'HIGH', 'confidence': 0.9, 'reason': 'test'})
+                    body = json.dumps({
+                        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0,
+                        'model': 'gpt-3.5-turbo',
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': content}}],
+                        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+                    }).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**kwargs):
+        srv = FakeOpenAI(**kwargs)
+        servers.append(srv)
+        return srv
+
+    yield start
+    for srv in servers:
+        srv.close()
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv('LLM_CACHE', 'off')
+
+
+def _service(srv, timeout=5.0):
+    return OpenAIService(api_key='test-key', base_url=srv.url, timeout=timeout)
+
+
+def test_map_runs_concurrently_but_bounded(fake_server):
+    srv = fake_server(delay=0.2)
+    pool = LLMClientPool(max_workers=3, rate=1000, burst=1000)
+    items = [(f'Tiêu đề {i}', 'Nội dung') for i in range(9)]
+    started = time.monotonic()
+    results = pool.map(_service(srv).analyze_feedback, items)
+    elapsed = time.monotonic() - started
+    assert all(r and r['severity'] == 'high' for r in results)
+    assert srv.max_active <= 3
+    assert srv.max_active >= 2
+    assert elapsed < 9 * 0.2
+
+
+def test_circuit_breaker_trips_and_stops_calling(fake_server):
+    srv = fake_server(mode='error')
+    pool = LLMClientPool(max_workers=2, rate=1000, burst=1000, failure_threshold=3, reset_timeout=60)
+    service = _service(srv)
+    for _ in range(3):
+        assert pool.call(service.analyze_feedback, 'a', 'b') is None
+    assert pool.breaker.state == 'open'
+    calls_before = srv.requests
+    assert pool.call(service.analyze_feedback, 'a', 'b') is None
+    assert srv.requests == calls_before
+
+
+def test_circuit_breaker_half_open_recovers(fake_server):
+    srv = fake_server(mode='error')
+    pool = LLMClientPool(max_workers=1, rate=1000, burst=1000, failure_threshold=1, reset_timeout=0.2)
+    service = _service(srv)
+    assert pool.call(service.analyze_feedback, 'a', 'b') is None
+    assert pool.breaker.state == 'open'
+    srv.mode = 'ok'
+    time.sleep(0.25)
+    assert pool.call(service.analyze_feedback, 'a', 'b') is not None
+    assert pool.breaker.state == 'closed'
+
+
+def test_deadline_bounds_latency(fake_server):
+    srv = fake_server(delay=2.0)
+    pool = LLMClientPool(max_workers=1, rate=1000, burst=1000)
+    started = time.monotonic()
+    assert pool.call(_service(srv).analyze_feedback, 'a', 'b', deadline=0.3) is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_token_bucket_limits_rate(fake_server):
+    srv = fake_server()
+    pool = LLMClientPool(max_workers=4, rate=10, burst=1)
+    started = time.monotonic()
+    results = pool.map(_service(srv).analyze_feedback, [('a', str(i)) for i in range(6)])
+    assert all(results)
+    # 1 token có sẵn + 5 token nạp lại với tốc độ 10/giây
+    assert time.monotonic() - started >= 0.45
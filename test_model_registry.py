@@ -0,0 +1,74 @@
+"""Promote/rollback bundle riêng của một head phải đổi kết quả phân loại đang chạy."""
+import os
+import shutil
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from services.classifier_registry import ClassifierRegistry
+from services.feedback_classifier import MODEL_DIR, MULTIHEAD_BUNDLE, TFIDF_BUNDLE
+from services.model_bundle import export_bundle
+from services.model_registry import ModelRegistry
+
+# Không có từ khóa luật nào: loại do head 'kind' quyết định
+TITLE, DESCRIPTION = 'Cây xanh trước cổng trường', 'Cành cây rậm rạp che khuất biển báo'
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    shutil.copytree(os.path.join(MODEL_DIR, MULTIHEAD_BUNDLE), tmp_path / MULTIHEAD_BUNDLE)
+    return str(tmp_path)
+
+
+def register_kind_bundle(registry, classifier, label):
+    """Đăng ký một tfidf_bundle luôn đoán `label` cho văn bản mẫu"""
+    p_title, p_desc = classifier._preprocess_parts(TITLE, DESCRIPTION)
+    other = 'khieu_nai' if label == 'phan_anh' else 'phan_anh'
+    texts = [f'{p_title} {p_desc}'] * 5 + ['đèn đường hỏng', 'nước sinh hoạt đục'] * 5
+    labels = [label] * 5 + [other] * 10
+    vectorizer = TfidfVectorizer().fit(texts)
+    model = LogisticRegression(C=100.0, max_iter=1000).fit(vectorizer.transform(texts), labels)
+    return registry.register(TFIDF_BUNDLE, lambda path: export_bundle(vectorizer, model, path), source='test')
+
+
+def test_promoting_tfidf_bundle_overrides_multihead_kind(model_dir):
+    classifiers = ClassifierRegistry(model_dir=model_dir, check_interval=0)
+    registry = ModelRegistry(os.path.join(model_dir, 'registry'), model_dir)
+    before = classifiers.get()
+    baseline = before.classify(TITLE, DESCRIPTION, use_llm=False)
+    assert before.tfidf_model is None
+    label = 'phan_anh' if baseline['label'] == 'khieu_nai' else 'khieu_nai'
+
+    registry.promote(TFIDF_BUNDLE, register_kind_bundle(registry, before, label))
+    after = classifiers.get()
+    result = after.classify(TITLE, DESCRIPTION, use_llm=False)
+    assert after is not before and after.tfidf_model is not None
+    assert (result['label'], result['method']) == (label, 'tfidf')
+    assert result['model_version'] != baseline['model_version']
+    # Các head khác vẫn lấy từ multihead_bundle
+    assert result['severity'] == baseline['severity'] and result['category'] == baseline['category']
+
+    assert registry.rollback(TFIDF_BUNDLE) is None
+    restored = classifiers.get().classify(TITLE, DESCRIPTION, use_llm=False)
+    assert restored['label'] == baseline['label']
+    assert restored['model_version'] == baseline['model_version']
+
+
+def test_shadow_candidate_tfidf_bundle_differs_from_active(model_dir, tmp_path):
+    from services.feedback_classifier import FeedbackClassifier
+    from services.shadow import build_evaluator, summarize
+
+    registry = ModelRegistry(os.path.join(model_dir, 'registry'), model_dir)
+    active = FeedbackClassifier(model_dir=model_dir)
+    items = [(TITLE, DESCRIPTION)]
+    results = active.classify_many(items, use_llm=False)
+    label = 'phan_anh' if results[0]['label'] == 'khieu_nai' else 'khieu_nai'
+    version = register_kind_bundle(registry, active, label)
+
+    shadow = build_evaluator(f'{TFIDF_BUNDLE}:{version}', registry=registry)
+    shadow.log_path = str(tmp_path / 'shadow.jsonl')
+    records = shadow.compare(items, results, 0.01)
+    assert records[0]['shadow']['label'] == label
+    assert summarize(records)['disagreement']['label'] == 1.0
+    assert active.tfidf_model is None and shadow.candidate.tfidf_model is not None
@@ -0,0 +1,96 @@
+"""Trang Quản lý Dân cư chạy số câu SQL cố định, không phụ thuộc số hộ/nhân khẩu."""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+PER_PAGE = 20
+# người dùng đăng nhập, trang hộ (kèm số nhân khẩu), đếm phân trang, danh sách thôn,
+# tạm trú/tạm vắng, trẻ em, tổng số hộ, tổng số nhân khẩu
+PAGE_STATEMENTS = 8
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('SEVERITY_WORKER', 'off')
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    yield app
+    from app import db
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    from models import User
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    return client
+
+
+def seed(app, households, per_household=4):
+    """Thêm các hộ (mỗi hộ per_household nhân khẩu, người đầu là 'Chủ hộ')"""
+    from app import db
+    from models import Household, Resident
+    now = datetime.utcnow()
+    with app.app_context():
+        start = (db.session.query(db.func.max(Household.id)).scalar() or 0) + 1
+        ids = range(start, start + households)
+        db.session.execute(db.insert(Household), [
+            {'id': hid, 'household_code': f'HK{hid:05d}', 'address': f'Số {hid}', 'hamlet': f'Thôn {hid % 3}',
+             'head_of_household': f'Chủ hộ {hid}', 'created_at': now, 'updated_at': now} for hid in ids])
+        db.session.execute(db.insert(Resident), [
+            {'full_name': f'Người {hid}-{k}', 'birth_date': date(1950 + (hid * 7 + k * 13) % 70, 6, 1),
+             'gender': 'Nam', 'household_id': hid, 'relationship': 'Chủ hộ' if k == 0 else 'Con',
+             'created_at': now, 'updated_at': now}
+            for hid in ids for k in range(per_household)])
+        db.session.commit()
+
+
+def statements(app, client, url):
+    """Số câu SQL thực thi khi tải url"""
+    from app import db
+    count = 0
+
+    def on_execute(*args):
+        nonlocal count
+        count += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    assert response.status_code == 200
+    return count, response.get_data(as_text=True)
+
+
+def test_statement_count_independent_of_population(app, client):
+    seed(app, 3)
+    small, _ = statements(app, client, '/admin/population')
+    seed(app, PER_PAGE * 3, per_household=6)
+    large, _ = statements(app, client, '/admin/population')
+    second_page, _ = statements(app, client, '/admin/population?page=2')
+    filtered, _ = statements(app, client, '/admin/population?hamlet=Th%C3%B4n%201')
+    assert small == large == second_page == filtered == PAGE_STATEMENTS
+
+
+def test_resident_and_children_counts(app, client):
+    from models import Resident
+    seed(app, 5, per_household=3)
+    with app.app_context():
+        year = date.today().year
+        children = sum(1 for r in Resident.query.all() if year - r.birth_date.year < 18)
+    _, html = statements(app, client, '/admin/population')
+    assert html.count('3 người') == 5
+    assert f'<h3 class="mb-0">{children}</h3>' in html
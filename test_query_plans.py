@@ -0,0 +1,119 @@
+"""EXPLAIN QUERY PLAN cho các truy vấn thường dùng trong blueprints: không được quét toàn bảng."""
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+# "SCAN feedback" là quét toàn bảng; "SCAN feedback USING INDEX ..." (duyệt theo chỉ mục) thì được
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('SEVERITY_WORKER', 'off')
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        yield app
+        from app import db
+        db.session.remove()
+        db.engine.dispose()
+
+
+def hot_queries():
+    """Các truy vấn nóng, viết giống hệt trong blueprints"""
+    from app import db
+    from models import (Announcement, BenefitCategory, BenefitPayment, Beneficiary, DocumentRequest, DocumentType,
+                        Feedback, Household, Resident, TemporaryResidence, User)
+    from services.population_stats import household_residents
+    per_household = household_residents()
+    return {
+        # admin.population
+        'population_by_hamlet': lambda: Household.query.filter(Household.hamlet == 'Thôn 1').limit(20).all(),
+        'population_children': lambda: Resident.query.filter(Resident.birth_date >= date(2010, 1, 1)).count(),
+        'population_resident_counts': lambda: db.session.query(Household, db.func.coalesce(per_household.c.n, 0))
+        .outerjoin(per_household, per_household.c.household_id == Household.id)
+        .filter(Household.hamlet == 'Thôn 1').all(),
+        'household_residents': lambda: Resident.query.filter_by(household_id=1).order_by(Resident.full_name).all(),
+        # admin.dashboard / feedback_management
+        'feedback_pending_count': lambda: Feedback.query.filter_by(status='pending').count(),
+        'feedback_by_status': lambda: Feedback.query.filter(Feedback.status == 'pending')
+        .order_by(Feedback.created_at.desc()).limit(20).all(),
+        'feedback_recent': lambda: Feedback.query.order_by(Feedback.created_at.desc()).limit(5).all(),
+        # citizen.dashboard / feedback_history
+        'citizen_feedbacks': lambda: Feedback.query.filter_by(user_id=1).order_by(Feedback.created_at.desc())
+        .limit(10).all(),
+        'citizen_feedback_status_count': lambda: Feedback.query.filter_by(user_id=1, status='resolved').count(),
+        # admin.temporary_residence_* và thống kê tạm trú/tạm vắng
+        'temporary_active_count': lambda: TemporaryResidence.query.filter(TemporaryResidence.is_active.is_(True))
+        .count(),
+        'temporary_active_by_type': lambda: TemporaryResidence.query.filter(
+            TemporaryResidence.is_active.is_(True), TemporaryResidence.type == 'tam_tru')
+        .order_by(TemporaryResidence.start_date.desc()).limit(20).all(),
+        'temporary_by_resident': lambda: TemporaryResidence.query.filter_by(resident_id=1)
+        .order_by(TemporaryResidence.start_date.desc()).all(),
+        'temporary_by_head': lambda: TemporaryResidence.query.filter_by(head_household_id=1)
+        .order_by(TemporaryResidence.start_date.desc()).all(),
+        # admin.benefits / benefits_by_category
+        'benefits_by_category': lambda: db.session.query(Beneficiary, BenefitCategory)
+        .join(BenefitCategory, Beneficiary.category_id == BenefitCategory.id)
+        .filter(Beneficiary.category_id == 1, Beneficiary.is_active.is_(True)).all(),
+        'beneficiaries_of_household': lambda: Beneficiary.query.filter(Beneficiary.household_id == 1).all(),
+        'beneficiaries_of_resident': lambda: Beneficiary.query.filter_by(resident_id=1).all(),
+        'benefit_payments': lambda: BenefitPayment.query.filter_by(beneficiary_id=1).all(),
+        # admin.document_requests_admin / citizen.document_requests_list
+        'document_requests_by_status': lambda: db.session.query(DocumentRequest, User, DocumentType)
+        .join(User, DocumentRequest.user_id == User.id)
+        .join(DocumentType, DocumentRequest.type_id == DocumentType.id)
+        .filter(DocumentRequest.status == 'pending')
+        .order_by(DocumentRequest.submitted_at.desc()).limit(20).all(),
+        'citizen_document_requests': lambda: DocumentRequest.query.filter_by(user_id=1)
+        .order_by(DocumentRequest.submitted_at.desc()).limit(10).all(),
+        # citizen.dashboard / bulletin.index
+        'announcements_recent': lambda: Announcement.query.filter_by(is_published=True)
+        .order_by(Announcement.publish_date.desc()).limit(5).all(),
+        'bulletin_index': lambda: Announcement.query.filter_by(is_published=True)
+        .order_by(Announcement.priority.desc(), Announcement.publish_date.desc()).limit(10).all(),
+    }
+
+
+def query_plan(app, run):
+    """Chạy truy vấn, ghi lại câu SQL thực tế rồi lấy EXPLAIN QUERY PLAN với cùng tham số"""
+    from app import db
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert captured, 'truy vấn không chạy câu SELECT nào'
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        details = []
+        for statement, parameters in captured:
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            details.extend(row[3] for row in cursor.fetchall())
+        return details
+    finally:
+        raw.close()
+
+
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_hot_query_uses_index(app, name):
+    details = query_plan(app, hot_queries()[name])
+    scans = [d for d in details if FULL_SCAN.match(d)]
+    assert not scans, f'{name}: quét toàn bảng {scans} (kế hoạch: {details})'
+
+
+def test_partial_index_for_published_announcements(app):
+    details = query_plan(app, hot_queries()['announcements_recent'])
+    assert any('ix_announcement_published_date' in d for d in details), details
